@@ -0,0 +1,355 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Hashable, MutableMapping, Optional, Sequence
+
+import numpy as np
+from fsspec import FSMap
+from zarr.storage import BaseStore, Store
+
+logger = logging.getLogger(__name__)
+
+# environment variable giving the maximum size in bytes of the process-wide cache
+chunk_cache_max_bytes_env = "PHYSRISK_CHUNK_CACHE_MAX_BYTES"
+default_chunk_cache_max_bytes = 256 * 1024 * 1024
+
+default_disk_cache_max_bytes = 10 * 1024 * 1024 * 1024
+
+_default_cache: list[Optional["ChunkCache"]] = [None]
+_default_cache_lock = threading.Lock()
+
+
+@dataclass
+class ChunkCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    items: int
+    bytes: int
+    max_bytes: int
+
+
+class ChunkCache:
+    """Thread-safe least-recently-used cache of decoded Zarr chunks, bounded by the total
+    number of bytes of the cached arrays. Keys are typically (store namespace, array path, chunk index).
+    Cached arrays are made read-only, as they are shared between callers.
+    """
+
+    def __init__(self, max_bytes: int = default_chunk_cache_max_bytes):
+        """Create ChunkCache.
+
+        Args:
+            max_bytes (int, optional): Maximum total size of cached chunks in bytes; 0 disables caching.
+                Defaults to 256 MiB.
+        """
+        self._chunks: OrderedDict[Hashable, np.ndarray] = OrderedDict()
+        self._lock = threading.Lock()
+        self._max_bytes = max_bytes
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def max_bytes(self) -> int:
+        return self._max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, value: int):
+        with self._lock:
+            self._max_bytes = value
+            self._evict()
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        with self._lock:
+            chunk = self._chunks.get(key)
+            if chunk is None:
+                self._misses += 1
+                return None
+            self._chunks.move_to_end(key)
+            self._hits += 1
+            return chunk
+
+    def put(self, key: Hashable, chunk: np.ndarray):
+        if chunk.nbytes > self._max_bytes:
+            return
+        chunk.flags.writeable = False
+        with self._lock:
+            existing = self._chunks.pop(key, None)
+            if existing is not None:
+                self._bytes -= existing.nbytes
+            self._chunks[key] = chunk
+            self._bytes += chunk.nbytes
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._chunks.clear()
+            self._bytes = 0
+
+    def stats(self) -> ChunkCacheStats:
+        with self._lock:
+            return ChunkCacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                items=len(self._chunks),
+                bytes=self._bytes,
+                max_bytes=self._max_bytes,
+            )
+
+    def _evict(self):
+        # lock must be held by caller
+        while self._bytes > self._max_bytes and len(self._chunks) > 0:
+            _, chunk = self._chunks.popitem(last=False)
+            self._bytes -= chunk.nbytes
+            self._evictions += 1
+
+
+def default_chunk_cache(
+    get_env: Optional[Callable[[str, Optional[str]], str]] = None,
+) -> ChunkCache:
+    """Create or return the process-wide ChunkCache. On creation, the maximum size in bytes
+    is taken from environment variable PHYSRISK_CHUNK_CACHE_MAX_BYTES if present.
+
+    Args:
+        get_env (Optional[Callable[[str, Optional[str]], str]], optional): Allows override obtaining of
+            environment variables. Defaults to None, in which case the default size is used.
+    """
+    cache = _default_cache[0]
+    if cache is None:
+        with _default_cache_lock:
+            # repeat the check in case the cache was created by another thread
+            cache = _default_cache[0]
+            if cache is None:
+                max_bytes = (
+                    int(
+                        get_env(
+                            chunk_cache_max_bytes_env,
+                            str(default_chunk_cache_max_bytes),
+                        )
+                    )
+                    if get_env is not None
+                    else default_chunk_cache_max_bytes
+                )
+                cache = ChunkCache(max_bytes=max_bytes)
+                _default_cache[0] = cache
+    return cache
+
+
+class DiskCacheStore(Store):
+    """Read-through Zarr store that keeps a local, size-capped copy of the items of another store,
+    for example an S3 store. Items are evicted from disk in least-recently-used order.
+    Files are written atomically and carry a SHA-256 digest of their contents, which is checked
+    on read: an invalid file is discarded and the item fetched again from the underlying store.
+    Zarr metadata items (.zarray, .zattrs, .zgroup, .zmetadata) are not cached, so that changes
+    to array attributes are always seen.
+
+    The directory may be shared by several processes. The least-recently-used index is held per process
+    and is built from the directory contents on creation; files removed by another process are treated
+    as cache misses.
+    """
+
+    _magic = b"PRDC1"
+    _metadata_keys = (".zarray", ".zattrs", ".zgroup", ".zmetadata")
+
+    def __init__(
+        self,
+        store: MutableMapping,
+        directory: str,
+        max_bytes: int = default_disk_cache_max_bytes,
+        namespace: Optional[str] = None,
+    ):
+        """Create DiskCacheStore.
+
+        Args:
+            store (MutableMapping): Underlying store.
+            directory (str): Local directory in which to cache items.
+            max_bytes (int, optional): Maximum total size of cached files in bytes. Defaults to 10 GiB.
+            namespace (Optional[str], optional): Distinguishes the items of different underlying stores
+                cached in the same directory. Defaults to None, in which case the root of an FSMap store is used.
+        """
+        self.store = store
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        if namespace is None:
+            namespace = store.root if isinstance(store, FSMap) else ""
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._files: OrderedDict[Path, int] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._load_index()
+
+    def __getitem__(self, key: str):
+        if not self._is_cached_key(key):
+            return self.store[key]
+        value = self._read(key)
+        if value is None:
+            value = self.store[key]
+            self._write(key, value)
+        return value
+
+    def __setitem__(self, key: str, value):
+        self.store[key] = value
+        self._remove(self._file(key))
+
+    def __delitem__(self, key: str):
+        del self.store[key]
+        self._remove(self._file(key))
+
+    def __contains__(self, key):
+        return key in self.store
+
+    def __iter__(self):
+        return iter(self.store)
+
+    def __len__(self):
+        return len(self.store)
+
+    def getitems(
+        self, keys: Sequence[str], *, contexts: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Any]:
+        result: Dict[str, Any] = {}
+        missing = []
+        for key in keys:
+            value = self._read(key) if self._is_cached_key(key) else None
+            if value is None:
+                missing.append(key)
+            else:
+                result[key] = value
+        if len(missing) > 0:
+            fetched = self._getitems_from_store(missing)
+            for key, value in fetched.items():
+                if self._is_cached_key(key):
+                    self._write(key, value)
+            result.update(fetched)
+        return result
+
+    def clear_cache(self):
+        """Remove all cached files (the underlying store is unaffected)."""
+        with self._lock:
+            files = list(self._files.keys())
+        for file in files:
+            self._remove(file)
+
+    def _getitems_from_store(self, keys: Sequence[str]) -> Dict[str, Any]:
+        if isinstance(self.store, BaseStore):
+            return dict(self.store.getitems(keys, contexts={}))
+        elif isinstance(self.store, FSMap):
+            # fetched concurrently
+            return self.store.getitems(keys, on_error="omit")
+        else:
+            return {k: self.store[k] for k in keys if k in self.store}
+
+    def _is_cached_key(self, key: str):
+        return not key.endswith(self._metadata_keys)
+
+    def _file(self, key: str) -> Path:
+        digest = hashlib.sha256(f"{self.namespace}/{key}".encode()).hexdigest()
+        return self.directory / digest[0:2] / digest
+
+    def _read(self, key: str) -> Optional[bytes]:
+        file = self._file(key)
+        try:
+            with open(file, "rb") as f:
+                contents = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self._forget(file)
+                self.misses += 1
+            return None
+        header_len = len(self._magic) + 32
+        value = contents[header_len:]
+        if (
+            contents[0 : len(self._magic)] != self._magic
+            or hashlib.sha256(value).digest() != contents[len(self._magic) : header_len]
+        ):
+            logger.warning(f"discarding invalid cache file {file} for key {key}")
+            self._remove(file)
+            with self._lock:
+                self.misses += 1
+            return None
+        try:
+            os.utime(file)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            if file in self._files:
+                self._files.move_to_end(file)
+            self.hits += 1
+        return value
+
+    def _write(self, key: str, value):
+        value = bytes(value)
+        size = len(self._magic) + 32 + len(value)
+        if size > self.max_bytes:
+            return
+        file = self._file(key)
+        try:
+            file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=file.parent, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(self._magic)
+                    f.write(hashlib.sha256(value).digest())
+                    f.write(value)
+                os.replace(tmp, file)
+            except BaseException:
+                Path(tmp).unlink(missing_ok=True)
+                raise
+        except OSError as e:
+            # the cache is optional: a failure to write (e.g. disk full) must not fail the read
+            logger.warning(f"unable to write cache file {file} for key {key}: {e}")
+            return
+        with self._lock:
+            self._forget(file)
+            self._files[file] = size
+            self._bytes += size
+            to_evict = self._evict()
+        for evict_file in to_evict:
+            evict_file.unlink(missing_ok=True)
+
+    def _remove(self, file: Path):
+        file.unlink(missing_ok=True)
+        with self._lock:
+            self._forget(file)
+
+    def _evict(self):
+        # lock must be held by caller; returns the files to delete
+        to_evict = []
+        while self._bytes > self.max_bytes and len(self._files) > 0:
+            file, size = self._files.popitem(last=False)
+            self._bytes -= size
+            to_evict.append(file)
+        return to_evict
+
+    def _forget(self, file: Path):
+        # lock must be held by caller
+        size = self._files.pop(file, None)
+        if size is not None:
+            self._bytes -= size
+
+    def _load_index(self):
+        files = []
+        for file in self.directory.glob("*/*"):
+            if file.suffix == ".tmp":
+                # being written, possibly by another process
+                continue
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, file, stat.st_size))
+        for _, file, size in sorted(files):
+            self._files[file] = size
+            self._bytes += size
+        for file in self._evict():
+            file.unlink(missing_ok=True)
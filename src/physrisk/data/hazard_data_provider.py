@@ -16,12 +16,12 @@ from typing import (
 )
 
 import numpy as np
-from shapely import Point
+import shapely
 from typing_extensions import Protocol
 
 from physrisk.kernel.hazards import Hazard
 
-from .zarr_reader import ZarrReader
+from .zarr_reader import ImageCoordinates, ZarrReader
 
 
 logger = logging.getLogger(__name__)
@@ -241,12 +241,14 @@ class HazardDataProvider(ABC):
             if p is None or y is None:
                 continue
             set_id = p.path(y)
-            mask_in_bounds = await asyncio.to_thread(
-                self._reader.in_bounds,
+            # the projection onto the grid is calculated once and re-used for all scenarios and years
+            image_coordinates = await asyncio.to_thread(
+                self._reader.get_image_coordinates,
                 set_id,
                 longitudes[mask_unprocessed],
                 latitudes[mask_unprocessed],
             )
+            mask_in_bounds = image_coordinates.in_bounds(pixel_is_area=True)
             coverage = mask_unprocessed.copy()
             coverage[mask_unprocessed] = coverage[mask_unprocessed] & mask_in_bounds
             mask_unprocessed[mask_unprocessed] = (
@@ -263,6 +265,7 @@ class HazardDataProvider(ABC):
                 years,
                 buffer,
                 interpolate_years,
+                image_coordinates=image_coordinates.subset(mask_in_bounds),
             )
             if len(resource_result) > 0:
                 results.update(resource_result)
@@ -309,10 +312,13 @@ class HazardDataProvider(ABC):
         years: Sequence[int],
         buffer: Optional[int],
         interpolate_years: bool,
+        image_coordinates: Optional[ImageCoordinates] = None,
     ):
         """Get data for all scenarios and years using just a single HazardResource as the source.
         The importance of this is that interpolation of years is assumed to be feasible within the same resource as this
         is a single model (with consistent meaning of the values).
+        If provided, image_coordinates (the projection of the latitudes and longitudes onto the grid
+        of the resource) is re-used for all scenarios and years.
         """
         result: Dict[ScenarioYear, ScenarioYearResult] = {}
         # Retrieve the data for all available years for the path in question.
@@ -342,6 +348,14 @@ class HazardDataProvider(ABC):
             return empty
         masks_in_bounds = {}
         targets: Dict[ScenarioYear, ScenarioYearResult] = {}
+        # as for the image coordinates, buffered geometries are created once and re-used for all scenarios and years
+        shapes = (
+            await asyncio.to_thread(
+                HazardDataProvider._buffered_shapes, longitudes, latitudes, buffer
+            )
+            if buffer is not None
+            else None
+        )
         try:
             # Any errors should propagate up.
             res = await asyncio.gather(
@@ -352,6 +366,8 @@ class HazardDataProvider(ABC):
                         longitudes,
                         buffer,
                         resource_paths.scenarios[item.scenario].path(item.year),
+                        image_coordinates,
+                        shapes,
                     )
                     for item in all_items
                 )
@@ -426,6 +442,8 @@ class HazardDataProvider(ABC):
         longitudes: np.ndarray,
         buffer: Optional[int],
         path: str,
+        image_coordinates: Optional[ImageCoordinates] = None,
+        shapes: Optional[np.ndarray] = None,
     ):
         indices, units = [], ""
         mask_in_bounds = None
@@ -436,31 +454,45 @@ class HazardDataProvider(ABC):
                 longitudes,
                 latitudes,
                 self._interpolation,
+                image_coordinates,
             )
         else:
-            if buffer < 0 or 1000 < buffer:
-                raise Exception(
-                    "The buffer must be an integer between 0 and 1000 metres."
+            buffered_shapes = (
+                shapes
+                if shapes is not None
+                else await asyncio.to_thread(
+                    HazardDataProvider._buffered_shapes, longitudes, latitudes, buffer
                 )
+            )
             values, indices, units = await asyncio.to_thread(
                 self._reader.get_max_curves,
                 path,
-                [
-                    (
-                        Point(longitude, latitude)
-                        if buffer == 0
-                        else Point(longitude, latitude).buffer(
-                            ZarrReader._get_equivalent_buffer_in_arc_degrees(
-                                latitude, buffer
-                            )
-                        )
-                    )
-                    for longitude, latitude in zip(longitudes, latitudes)
-                ],
+                buffered_shapes,
                 self._interpolation,
             )  # type: ignore
         return item, values, mask_in_bounds, indices, units, path
 
+    @staticmethod
+    def _buffered_shapes(
+        longitudes: np.ndarray, latitudes: np.ndarray, buffer: int
+    ) -> np.ndarray:
+        """Array of shapely geometries: Points if buffer is zero, otherwise Points buffered
+        by the equivalent of buffer metres in arc degrees at each latitude."""
+        if buffer < 0 or 1000 < buffer:
+            raise Exception("The buffer must be an integer between 0 and 1000 metres.")
+        points = shapely.points(
+            np.asarray(longitudes, dtype=float), np.asarray(latitudes, dtype=float)
+        )
+        if buffer == 0:
+            return points
+        return shapely.buffer(
+            points,
+            ZarrReader._get_equivalent_buffer_in_arc_degrees(
+                np.asarray(latitudes, dtype=float), buffer
+            ),
+            quad_segs=16,  # as for BaseGeometry.buffer
+        )
+
     @staticmethod
     def _weights(
         scenario: str,
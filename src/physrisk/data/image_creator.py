@@ -227,14 +227,15 @@ class ImageCreator(HazardImageCreator):
                 )
                 if tile is None:
                     # return whole array
-                    return data[index, :, :]  # .squeeze(axis=0)
+                    return self.reader.get_region(data, index, slice(None), slice(None))
                 else:
-                    # (from zarr 2.16.0 we can also use block indexing)
-                    return data[
+                    # read via the reader so that decoded chunks are cached
+                    return self.reader.get_region(
+                        data,
                         index,
-                        tile_size * tile.y : tile_size * (tile.y + 1),
-                        tile_size * tile.x : tile_size * (tile.x + 1),
-                    ]
+                        slice(tile_size * tile.y, tile_size * (tile.y + 1)),
+                        slice(tile_size * tile.x, tile_size * (tile.x + 1)),
+                    )
 
         data = sum(
             weight
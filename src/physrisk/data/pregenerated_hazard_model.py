@@ -3,7 +3,7 @@ import concurrent.futures
 from collections import defaultdict
 import logging
 import threading
-from typing import Dict, List, Mapping, MutableMapping, Optional, Sequence, Tuple, Type
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Type
 
 import numpy as np
 
@@ -18,14 +18,14 @@ from physrisk.kernel.hazards import (
     Subsidence,
     indicator_data,
 )
+from physrisk.utils import event_loop
 
 from ..kernel.hazard_model import (
+    HazardDataBatch,
     HazardDataFailedResponse,
     HazardDataRequest,
     HazardDataResponse,
-    HazardEventDataResponse,
     HazardModel,
-    HazardParameterDataResponse,
 )
 from .hazard_data_provider import (
     HazardDataHint,
@@ -36,6 +36,46 @@ from .hazard_data_provider import (
 
 logger = logging.getLogger(__name__)
 
+_executor: Optional[concurrent.futures.ThreadPoolExecutor] = None
+_executor_loop: Optional[asyncio.AbstractEventLoop] = None
+_executor_max_workers = 0
+_executor_lock = threading.Lock()
+
+
+def _set_default_executor(loop: asyncio.AbstractEventLoop, max_workers: int) -> int:
+    """Create on first use the thread pool shared by all hazard models, sized by the
+    zarr_max_workers of the first model to use it, and set it as the loop's default executor.
+    A new pool is only created after shutdown() or if the IO loop itself is replaced
+    (see event_loop.reset_lock).
+
+    Returns:
+        int: Maximum number of threads of the pool.
+    """
+    global _executor, _executor_loop, _executor_max_workers
+    if _executor_loop is loop:
+        return _executor_max_workers
+    with _executor_lock:
+        if _executor_loop is not loop:
+            _executor = concurrent.futures.ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="physrisk-hazard"
+            )
+            loop.set_default_executor(_executor)
+            _executor_loop, _executor_max_workers = loop, max_workers
+        return _executor_max_workers
+
+
+def shutdown():
+    """Shut down the thread pool shared by hazard models, waiting for its threads to finish, e.g.
+    at the end of a long-running process or test. This should not be called while hazard data
+    is being retrieved. A new pool is created if a model is used afterwards.
+    """
+    global _executor, _executor_loop, _executor_max_workers
+    with _executor_lock:
+        executor = _executor
+        _executor, _executor_loop, _executor_max_workers = None, None, 0
+    if executor is not None:
+        executor.shutdown(wait=True)
+
 
 class PregeneratedHazardModel(HazardModel):
     """Hazard event model that processes requests using EventProviders."""
@@ -52,13 +92,16 @@ class PregeneratedHazardModel(HazardModel):
         Args:
             hazard_data_providers: Map from hazard type to its data provider.
             interpolate_years: Whether to interpolate hazard data between available years.
-            zarr_max_workers: Max threads for concurrent Zarr chunk reads.
+            zarr_max_workers: Max threads for concurrent Zarr chunk reads. The thread pool is shared
+                by all models and sized by the first model to retrieve data; a warning is logged if
+                this differs for a later model. See shutdown().
             nan_is_zero: (hazard_type, indicator_id) pairs where NaN is treated as 0. Defaults to common indicators (fire, drought, hail, subsidence, landslide).
             nan_is_no_data: (hazard_type, indicator_id) pairs where NaN causes a failed response. Mutually exclusive with nan_is_zero.
         """
         self.hazard_data_providers = hazard_data_providers
         self.interpolate_years = interpolate_years
         self.zarr_max_workers = zarr_max_workers
+        self._max_workers_warned = False
         self._nan_is_zero: set[tuple[type[Hazard], str]] = (
             nan_is_zero
             if nan_is_zero is not None
@@ -72,9 +115,47 @@ class PregeneratedHazardModel(HazardModel):
                 f"element {next(iter(self._nan_is_zero & self._nan_is_no_data))} appears in nan_is_zero and nan_is_no_data"
             )
 
-    def get_hazard_data(  # noqa: C901
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """The shared IO loop, with the shared thread pool as its default executor (used by
+        asyncio.to_thread). Both are process-wide so that models created per request do
+        not each hold threads.
+        """
+        loop = event_loop.get_loop()
+        max_workers = _set_default_executor(loop, self.zarr_max_workers)
+        if max_workers != self.zarr_max_workers and not self._max_workers_warned:
+            logger.warning(
+                f"zarr_max_workers of {self.zarr_max_workers} ignored: the thread pool shared by "
+                f"hazard models already has {max_workers} threads; call shutdown() to resize it"
+            )
+            self._max_workers_warned = True
+        return loop
+
+    def get_hazard_data(
         self, requests: Sequence[HazardDataRequest]
     ) -> Mapping[HazardDataRequest, HazardDataResponse]:
+        # the HazardDataBatch is itself a Mapping: response objects are only created when accessed
+        return self.get_hazard_data_batch(requests)
+
+    async def aget_hazard_data(
+        self, requests: Sequence[HazardDataRequest]
+    ) -> HazardDataBatch:
+        """Asynchronous version of get_hazard_data for callers already running inside
+        an event loop. The retrieval runs on the shared IO loop and thread pool, so the
+        caller's loop is not blocked.
+        """
+        logger.info(f"Retrieving data for {len(requests)} hazard data requests")
+        responses = await asyncio.wrap_future(
+            asyncio.run_coroutine_threadsafe(
+                self._aget_cascading_hazard_data_batches(requests), self._get_loop()
+            )
+        )
+        logger.info("Data retrieval complete")
+        self.log_response_issues(responses)
+        return responses
+
+    def get_hazard_data_batch(
+        self, requests: Sequence[HazardDataRequest]
+    ) -> HazardDataBatch:
         # A note on concurrency.
         # The requests will be batched up with batches accessing the same data set
         # (e.g. same Zarr array in case of Zarr data).
@@ -87,9 +168,22 @@ class PregeneratedHazardModel(HazardModel):
         self.log_response_issues(responses)
         return responses
 
-    def _get_cascading_hazard_data_batches(self, requests: Sequence[HazardDataRequest]):
-        responses: MutableMapping[HazardDataRequest, HazardDataResponse] = {}
-        batches: Dict[Tuple[str, str], List[HazardDataRequest]] = defaultdict(list)
+    def _get_cascading_hazard_data_batches(
+        self, requests: Sequence[HazardDataRequest]
+    ) -> HazardDataBatch:
+        responses = event_loop.run(
+            self._aget_cascading_hazard_data_batches(requests), self._get_loop()
+        )
+        if isinstance(responses, Exception):
+            raise responses
+        return responses
+
+    async def _aget_cascading_hazard_data_batches(
+        self, requests: Sequence[HazardDataRequest]
+    ) -> HazardDataBatch:
+        responses = HazardDataBatch(requests)
+        # rows (i.e. positions in requests) of each batch
+        batches: Dict[Tuple[str, str], List[int]] = defaultdict(list)
         # find the requests for the same indicator, but different scenarios and years
 
         async def all_requests():
@@ -97,7 +191,7 @@ class PregeneratedHazardModel(HazardModel):
                 hazard_type: Type[Hazard],
                 indicator_id: str,
                 hint: Optional[HazardDataHint],
-                batch: List[HazardDataRequest],
+                batch: List[int],
             ):
                 lat_lon_index: Dict[Tuple[float, float, Optional[int]], int] = {}
                 is_event = (
@@ -110,15 +204,32 @@ class PregeneratedHazardModel(HazardModel):
                 # Add check that indicators are non-negative. This can occur in cases
                 # of extrapolation, even if underlying hazard data is well-behaved.
                 non_negative = nan_is_zero
-                for req in batch:
-                    lat_lon_index.setdefault(
+                # index the requests by scenario and year and by latitude/longitude
+                batch_lat_lon_indices = np.empty(len(batch), dtype=np.int64)
+                scenario_year_positions: Dict[ScenarioYear, List[int]] = defaultdict(
+                    list
+                )
+                for i, row in enumerate(batch):
+                    req = requests[row]
+                    batch_lat_lon_indices[i] = lat_lon_index.setdefault(
                         (req.latitude, req.longitude, req.buffer), len(lat_lon_index)
                     )
+                    scenario_year_positions[
+                        ScenarioYear(
+                            req.scenario,
+                            -1 if req.scenario == "historical" else req.year,
+                        )
+                    ].append(i)
+                batch_rows = np.array(batch)
                 # get the list of scenarios and years needed
-                scenarios = list(set(req.scenario for req in batch))
+                scenarios = list(set(sy.scenario for sy in scenario_year_positions))
                 years = list(
                     sorted(
-                        set(req.year for req in batch if req.scenario != "historical")
+                        set(
+                            sy.year
+                            for sy in scenario_year_positions
+                            if sy.scenario != "historical"
+                        )
                     )
                 )
 
@@ -133,8 +244,9 @@ class PregeneratedHazardModel(HazardModel):
                     no_provider_err = Exception(
                         f"no hazard data provider for hazard type {hazard_type.__name__}"
                     )
-                    for req in batch:
-                        responses[req] = HazardDataFailedResponse(err=no_provider_err)
+                    responses.set_failed(
+                        batch_rows, HazardDataFailedResponse(err=no_provider_err)
+                    )
                     return
 
                 results = await hazard_data_provider.get_data_cascading(
@@ -148,124 +260,115 @@ class PregeneratedHazardModel(HazardModel):
                     interpolate_years=self.interpolate_years,
                 )
 
-                # finally, unpack
-                for scenario in scenarios:
-                    for year in [-1] if scenario == "historical" else years:
-                        res = results.get(ScenarioYear(scenario, year), None)
-                        for req in batch:
-                            if req.scenario != scenario or (
-                                scenario != "historical" and req.year != year
-                            ):
-                                continue
-                            if res is None:
-                                responses[req] = HazardDataFailedResponse(
-                                    reason="no match"
-                                )
-                                continue
-                            index = lat_lon_index[
-                                (req.latitude, req.longitude, req.buffer)
-                            ]
-                            if ~res.coverage_mask[index]:
-                                # item remains unprocessed, presumably because out of bounds of all paths
-                                responses[req] = HazardDataFailedResponse(
-                                    reason="out of bounds"
-                                )
-                                continue
-                            indices_length = res.indices_length[index]
-                            values = res.values[index, :indices_length]
-                            indices = res.indices[index, :indices_length]
-                            if is_event:
-                                # if event data contains NaNs, this is taken to be zero
-                                valid = ~np.isnan(values)
-                                valid_periods, valid_intensities = (
-                                    indices[valid],
-                                    values[valid],
+                # finally, unpack each scenario and year as a whole
+                for scenario_year, positions in scenario_year_positions.items():
+                    rows = batch_rows[positions]
+                    res = results.get(scenario_year, None)
+                    if res is None:
+                        responses.set_failed(
+                            rows, HazardDataFailedResponse(reason="no match")
+                        )
+                        continue
+                    lat_lon_indices = batch_lat_lon_indices[positions]
+                    covered = res.coverage_mask[lat_lon_indices]
+                    if not np.all(covered):
+                        # items remain unprocessed, presumably because out of bounds of all paths
+                        responses.set_failed(
+                            rows[~covered],
+                            HazardDataFailedResponse(reason="out of bounds"),
+                        )
+                        rows, lat_lon_indices = rows[covered], lat_lon_indices[covered]
+                    if len(rows) == 0:
+                        continue
+                    values = res.values[lat_lon_indices, :]
+                    indices = res.indices[lat_lon_indices, :]
+                    lengths = res.indices_length[lat_lon_indices]
+                    in_length = np.arange(values.shape[1])[None, :] < lengths[:, None]
+                    if is_event:
+                        # if event data contains NaNs, this is taken to be zero:
+                        # valid values are moved to the start of each row
+                        valid = in_length & ~np.isnan(values)
+                        order = np.argsort(~valid, axis=1, kind="stable")
+                        values = np.take_along_axis(values, order, axis=1)
+                        indices = np.take_along_axis(indices, order, axis=1)
+                        lengths = np.count_nonzero(valid, axis=1)
+                        no_valid = lengths == 0
+                        values[no_valid, 0], indices[no_valid, 0] = 0.0, 100
+                        lengths[no_valid] = 1
+                        in_length = (
+                            np.arange(values.shape[1])[None, :] < lengths[:, None]
+                        )
+                    else:
+                        if nan_is_no_data:
+                            unexpected = np.any(np.isnan(values) & in_length, axis=1)
+                            if np.any(unexpected):
+                                responses.set_failed(
+                                    rows[unexpected],
+                                    HazardDataFailedResponse(reason="unexpected nan"),
                                 )
-                                if len(valid_periods) == 0:
-                                    valid_periods, valid_intensities = (
-                                        np.array([100]),
-                                        np.array([0]),
-                                    )
-                                responses[req] = HazardEventDataResponse(
-                                    valid_periods,
-                                    valid_intensities.astype(dtype="float64"),
-                                    res.units,
-                                    res.paths[index],
-                                )
-                            else:
-                                if nan_is_no_data and np.any(np.isnan(values)):
-                                    responses[req] = HazardDataFailedResponse(
-                                        reason="unexpected nan"
-                                    )
-                                    continue
-                                if nan_is_zero:
-                                    values[np.isnan(values)] = 0.0
-                                if non_negative:
-                                    values[values < 0] = 0.0
-                                responses[req] = HazardParameterDataResponse(
-                                    values.astype(dtype="float64"),
-                                    indices,
-                                    res.units,
-                                    res.paths[index],
+                                keep = ~unexpected
+                                rows, lat_lon_indices = (
+                                    rows[keep],
+                                    lat_lon_indices[keep],
                                 )
+                                values, indices = values[keep], indices[keep]
+                                lengths, in_length = lengths[keep], in_length[keep]
+                        if nan_is_zero:
+                            values[np.isnan(values)] = 0.0
+                        if non_negative:
+                            values[values < 0] = 0.0
+                    values[~in_length] = np.nan
+                    responses.set_rows(
+                        rows,
+                        HazardDataBatch.EVENT
+                        if is_event
+                        else HazardDataBatch.PARAMETER,
+                        values,
+                        indices,
+                        lengths,
+                        res.units,
+                        res.paths[lat_lon_indices],
+                    )
 
-            asyncio.get_event_loop().set_default_executor(
-                concurrent.futures.ThreadPoolExecutor(max_workers=self.zarr_max_workers)
-            )  # 1
-            for request in requests:
+            for row, request in enumerate(requests):
                 batches[
                     (
                         request.hazard_type,
                         request.indicator_id,
                         request.hint.group_key() if request.hint is not None else None,
                     )
-                ].append(request)
+                ].append(row)
 
             await asyncio.gather(
                 *(
-                    single_indicator(hazard_type, indicator_id, batch[0].hint, batch)
+                    single_indicator(
+                        hazard_type, indicator_id, requests[batch[0]].hint, batch
+                    )
                     for (hazard_type, indicator_id, _), batch in batches.items()
                 )
             )
 
-        def is_event_loop_running():
-            try:
-                asyncio.get_running_loop()
-                return True
-            except RuntimeError:
-                return False
-
-        if not is_event_loop_running():
-            asyncio.run(all_requests())
-        else:
-
-            def run_all_requests():
-                asyncio.run(all_requests())
-
-            t = threading.Thread(target=run_all_requests)
-            t.start()
-            t.join()
-
+        await all_requests()
         return responses
 
-    def log_response_issues(
-        self, responses: Dict[HazardDataRequest, HazardDataResponse]
-    ):
+    def log_response_issues(self, responses: HazardDataBatch):
         # in some cases requested data cannot be retrieved, leading to a HazardDataFailedResponse
         # this may be handled by the vulnerability model or might result in missing results.
-        grouped_failures: Dict[
-            str, List[Tuple[HazardDataRequest, HazardDataFailedResponse]]
-        ] = defaultdict(list)
-        for req, resp in responses.items():
-            if isinstance(resp, HazardDataFailedResponse):
-                key = resp.reason if resp.reason else str(resp.error)
-                grouped_failures[key].append((req, resp))
-        for key, values in grouped_failures.items():
+        grouped_failures: Dict[str, List[int]] = defaultdict(list)
+        failed_rows = np.nonzero(responses.kinds == HazardDataBatch.FAILED)[0]
+        codes, inverse = np.unique(
+            responses.failure_codes[failed_rows], return_inverse=True
+        )
+        for i, code in enumerate(codes):
+            resp = responses.failures[code]
+            key = resp.reason if resp.reason else str(resp.error)
+            grouped_failures[key].extend(failed_rows[inverse.ravel() == i])
+        for key, rows in grouped_failures.items():
             logger.info(
-                f"{len(values)} {'failures' if len(values) > 1 else 'failure'}: {key}. Limited to first 5:"
+                f"{len(rows)} {'failures' if len(rows) > 1 else 'failure'}: {key}. Limited to first 5:"
             )
-            for v in values[0:5]:
-                logger.info(str(v[0]))
+            for row in sorted(rows)[0:5]:
+                logger.info(str(responses.requests[row]))
 
     @staticmethod
     def _default_nan_is_zero():
@@ -301,7 +404,9 @@ class ZarrHazardModel(PregeneratedHazardModel):
             store: Zarr store (local, remote, or in-memory); used when reader is None.
             interpolation: Spatial interpolation method ("floor" or "linear").
             interpolate_years: Whether to interpolate hazard data between available years.
-            zarr_max_workers: Max threads for concurrent Zarr chunk reads.
+            zarr_max_workers: Max threads for concurrent Zarr chunk reads. The thread pool is shared
+                by all models and sized by the first model to retrieve data; a warning is logged if
+                this differs for a later model. See shutdown().
             nan_is_zero: (hazard_type, indicator_id) pairs where NaN is treated as 0. Defaults to common indicators (fire, drought, hail, subsidence, landslide).
             nan_is_no_data: (hazard_type, indicator_id) pairs where NaN causes a failed response. Mutually exclusive with nan_is_zero.
         """
@@ -1,16 +1,36 @@
+import itertools
 import logging
 import os
+import threading
 from pathlib import PurePosixPath
-from typing import Any, Callable, List, MutableMapping, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    MutableMapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 
 from fsspec import FSMap
 import numpy as np
 import s3fs
-import shapely.ops
+import shapely
 import zarr
 from affine import Affine
 from pyproj import Transformer
-from shapely import MultiPoint, Point, affinity, Polygon
+from shapely import Polygon
+
+from physrisk.data.chunk_cache import (
+    ChunkCache,
+    DiskCacheStore,
+    default_chunk_cache,
+    default_disk_cache_max_bytes,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -25,6 +45,116 @@ def get_env(key: str, default: Optional[str] = None) -> str:
         return value
 
 
+# maximum number of spatial chunks fetched from the store in a single call
+_chunk_fetch_batch_size = 64
+# used to give stores other than FSMaps a unique chunk cache namespace
+_store_ids = itertools.count()
+
+
+class ChunkReadPlan(NamedTuple):
+    """Plan for reading a set of pixels from an array with dimensions (index, y, x): pixels
+    are grouped by the chunk in which they lie so that each chunk need be read only once."""
+
+    # (chunk y, chunk x) of each distinct chunk, shape (no. chunks, 2)
+    chunk_coords: np.ndarray
+    # pixel positions sorted by chunk: the pixels of chunk i are order[offsets[i]:offsets[i + 1]]
+    order: np.ndarray
+    offsets: np.ndarray
+    # row and column indices of each pixel within its chunk
+    local_iy: np.ndarray
+    local_ix: np.ndarray
+
+    @staticmethod
+    def create(
+        shape: Tuple[int, ...],
+        chunks: Tuple[int, ...],
+        iy: Union[np.ndarray, Sequence[int]],
+        ix: Union[np.ndarray, Sequence[int]],
+    ) -> "ChunkReadPlan":
+        _, chunk_y, chunk_x = (int(c) for c in chunks)
+        rows = ChunkReadPlan._normalize(np.asarray(iy, dtype=np.int64), shape[1])
+        cols = ChunkReadPlan._normalize(np.asarray(ix, dtype=np.int64), shape[2])
+        cy, cx = rows // chunk_y, cols // chunk_x
+        n_chunks_x = -(-int(shape[2]) // chunk_x)
+        chunk_ids, inverse = np.unique(cy * n_chunks_x + cx, return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        offsets = np.zeros(len(chunk_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(inverse, minlength=len(chunk_ids)), out=offsets[1:])
+        return ChunkReadPlan(
+            chunk_coords=np.stack(
+                [chunk_ids // n_chunks_x, chunk_ids % n_chunks_x], axis=1
+            ),
+            order=order,
+            offsets=offsets,
+            local_iy=rows - cy * chunk_y,
+            local_ix=cols - cx * chunk_x,
+        )
+
+    @staticmethod
+    def _normalize(indices: np.ndarray, dim_len: int) -> np.ndarray:
+        # consistent with Zarr coordinate selection: negative indices count from the end
+        indices = np.where(indices < 0, indices + dim_len, indices)
+        if np.any((indices < 0) | (indices >= dim_len)):
+            raise IndexError(f"index out of bounds for dimension with length {dim_len}")
+        return indices
+
+
+class ArrayInfo(NamedTuple):
+    """Array handle and the OSC-format-specific attributes needed to read from the array. Obtaining these
+    may require several round-trips to the store and so they are cached by ZarrReader for each path."""
+
+    array: zarr.Array
+    crs: str
+    units: str
+    # in the case of acute risks, index_values will contain the return periods
+    index_values: List[Any]
+    # inverse affine transform: from CRS coordinates to fractional image coordinates
+    inv_transform: Affine
+    inv_matrix: np.ndarray
+    # transformer from EPSG:4326 to the CRS, or None if the CRS is EPSG:4326
+    transformer: Optional[Transformer]
+    # special legacy case: transform convention expects longitude in range [0, 360]
+    longitude_0_360: bool
+
+
+class ImageCoordinates(NamedTuple):
+    """Fractional image coordinates of a set of locations on the spatial grid of an array. The projection
+    can be re-used for other arrays on the same grid, e.g. for the different scenarios and years of a
+    HazardResource, which share spatial coverage."""
+
+    # shape (2, no. locations): column (x) and row (y), taking the pixel to be a point
+    coords: np.ndarray
+    crs: str
+    inv_matrix: np.ndarray
+    # (no. rows, no. columns)
+    shape: Tuple[int, int]
+
+    def matches(self, info: ArrayInfo) -> bool:
+        """True if the array has the same spatial grid."""
+        return (
+            self.crs == info.crs
+            and self.shape == tuple(info.array.shape[1:3])
+            and np.array_equal(self.inv_matrix, info.inv_matrix)
+        )
+
+    def image_coords(self, pixel_is_area: bool) -> np.ndarray:
+        return self.coords - 0.5 if pixel_is_area else self.coords
+
+    def in_bounds(self, pixel_is_area: bool) -> np.ndarray:
+        image_coords = self.image_coords(pixel_is_area)
+        in_bounds = (image_coords[0, :] < self.shape[1]) & (
+            image_coords[0, :] >= -0.5
+        )  # x/lon coords
+        return (
+            in_bounds
+            & (image_coords[1, :] < self.shape[0])
+            & (image_coords[1, :] >= -0.5)
+        )  # y/lat coords
+
+    def subset(self, mask: np.ndarray) -> "ImageCoordinates":
+        return self._replace(coords=self.coords[:, mask])
+
+
 class ZarrReader:
     """Reads hazard event data from Zarr files, including OSC-format-specific attributes."""
 
@@ -33,12 +163,15 @@ class ZarrReader:
     __secret_key = "OSC_S3_SECRET_KEY"
     __S3_bucket = "OSC_S3_BUCKET"  # e.g. os-climate-physical-risk
     __zarr_path = "OSC_S3_HAZARD_PATH"  # hazard-indicators/hazard.zarr")
+    __disk_cache_dir = "PHYSRISK_DISK_CACHE_DIR"  # if present, cache chunks locally
+    __disk_cache_max_bytes = "PHYSRISK_DISK_CACHE_MAX_BYTES"
 
     def __init__(
         self,
         store: Optional[MutableMapping] = None,
         path_provider: Optional[Callable[..., str]] = None,
         get_env: Callable[[str, Optional[str]], str] = get_env,
+        chunk_cache: Optional[ChunkCache] = None,
     ):
         """Create a ZarrReader.
 
@@ -46,6 +179,7 @@ class ZarrReader:
             store: if not supplied, create S3Map store.
             path_provider: function that provides path to the data set based on a set ID.
             get_env: allows override obtaining of environment variables.
+            chunk_cache: cache of decoded chunks; if not supplied the process-wide cache is used.
         """
         if store is None:
             # if no store is provided, attempt to connect to an S3 bucket
@@ -59,7 +193,16 @@ class ZarrReader:
         self._root = zarr.open(store, mode="r")
         self._store = store
         self._path_provider = path_provider
-        pass
+        self._chunk_cache = (
+            chunk_cache if chunk_cache is not None else default_chunk_cache(get_env)
+        )
+        self._cache_namespace = ZarrReader._store_namespace(store)
+        self._array_infos: Dict[str, ArrayInfo] = {}
+        self._array_infos_lock = threading.Lock()
+
+    @property
+    def chunk_cache(self) -> ChunkCache:
+        return self._chunk_cache
 
     def all_data(self, set_id: str):
         path = (
@@ -68,12 +211,31 @@ class ZarrReader:
         z = self._root[path]  # e.g. inundation/wri/v2/<filename>
         return z
 
+    def array_info(self, path: str) -> ArrayInfo:
+        """Get the array handle and attributes for the path, from cache if available.
+
+        Args:
+            path (str): Path to the array.
+
+        Returns:
+            ArrayInfo: Array handle and attributes.
+        """
+        info = self._array_infos.get(path)
+        if info is None:
+            info = ZarrReader._create_array_info(
+                self._root[path], self.get_index_values
+            )
+            with self._array_infos_lock:
+                info = self._array_infos.setdefault(path, info)
+        return info
+
     def ls(self, path: str):
-        if not isinstance(self._store, FSMap):
+        store = ZarrReader._underlying_store(self._store)
+        if not isinstance(store, FSMap):
             raise NotImplementedError(
                 f"cannot list for store of type {type(self._store)}"
             )
-        return self._store.fs.ls(PurePosixPath(self._store.root) / path)
+        return store.fs.ls(PurePosixPath(store.root) / path)
 
     @classmethod
     def create_s3_zarr_store(
@@ -95,6 +257,12 @@ class ZarrReader:
             s3=s3,
             check=False,
         )
+        disk_cache_dir = get_env(cls.__disk_cache_dir, "")
+        if disk_cache_dir != "":
+            max_bytes = int(
+                get_env(cls.__disk_cache_max_bytes, str(default_disk_cache_max_bytes))
+            )
+            return DiskCacheStore(store, disk_cache_dir, max_bytes=max_bytes)
         return store
 
     def get_curves(
@@ -103,6 +271,7 @@ class ZarrReader:
         longitudes: Union[np.ndarray, Sequence[float]],
         latitudes: Union[np.ndarray, Sequence[float]],
         interpolation="floor",
+        image_coordinates: Optional[ImageCoordinates] = None,
     ):
         """Get intensity curve for each latitude and longitude coordinate pair.
 
@@ -111,6 +280,8 @@ class ZarrReader:
             longitudes: list of longitudes.
             latitudes: list of latitudes.
             interpolation: interpolation method, "floor", "linear", "max" or "min".
+            image_coordinates: projection of the coordinate pairs, e.g. from get_image_coordinates for
+                another array of the same resource; re-calculated if the spatial grid does not match.
 
         Returns:
             curves: numpy array of intensity (no. coordinate pairs, no. return periods).
@@ -122,45 +293,31 @@ class ZarrReader:
         path = (
             self._path_provider(set_id) if self._path_provider is not None else set_id
         )
-        z = self._root[path]  # e.g. inundation/wri/v2/<filename>
-
+        # e.g. inundation/wri/v2/<filename>
         # OSC-specific attributes contain transform and return periods
-        t = z.attrs["transform_mat3x3"]  # type: ignore
-        transform = Affine(t[0], t[1], t[2], t[3], t[4], t[5])
-        crs = z.attrs.get("crs", "epsg:4326")
-        units: str = z.attrs.get("units", "default")
-
-        # in the case of acute risks, index_values will contain the return periods
-        index_values, _ = self.get_index_values(z)
-        image_coords = self._get_coordinates(
-            longitudes,
-            latitudes,
-            crs,
-            transform,
-            pixel_is_area=interpolation != "floor",
-            shape=z.shape,
-        )
-        in_bounds = (image_coords[0, :] < z.shape[2]) & (
-            image_coords[0, :] >= -0.5
-        )  # x/lon coords
-        in_bounds = (
-            in_bounds & (image_coords[1, :] < z.shape[1]) & (image_coords[1, :] >= -0.5)
-        )  # y/lat coords
-        image_coords = image_coords[:, in_bounds]
+        info = self.array_info(path)
+        z, units, index_values = info.array, info.units, info.index_values
+        if image_coordinates is None or not image_coordinates.matches(info):
+            image_coordinates = self._get_image_coordinates(info, longitudes, latitudes)
+        elif image_coordinates.coords.shape[1] != len(longitudes):
+            raise ValueError("image coordinates do not match longitudes and latitudes")
+        pixel_is_area = interpolation != "floor"
+        in_bounds = image_coordinates.in_bounds(pixel_is_area)
+        image_coords = image_coordinates.image_coords(pixel_is_area)[:, in_bounds]
         res = np.zeros((len(longitudes), len(index_values)))
         res[~in_bounds] = np.nan
         if interpolation == "floor":
             image_coords = np.floor(image_coords).astype(int)
             image_coords[0, :] %= z.shape[2]
-            iz = np.tile(np.arange(z.shape[0]), image_coords.shape[1])  # type: ignore
-            iy = np.repeat(image_coords[1, :], len(index_values))
-            ix = np.repeat(image_coords[0, :], len(index_values))
-
-            data = z.get_coordinate_selection((iz, iy, ix))  # type: ignore
-            data = ZarrReader._handle_legacy_nans(data)
-            res[in_bounds] = data.reshape(
-                [len(longitudes[in_bounds]), len(index_values)]
+            data = ZarrReader._get_pixel_values(
+                z,
+                image_coords[1, :],
+                image_coords[0, :],
+                self._chunk_cache,
+                self._cache_namespace,
             )
+            data = ZarrReader._handle_legacy_nans(data)
+            res[in_bounds] = data[:, : len(index_values)]
             return (
                 res,
                 in_bounds,
@@ -170,7 +327,12 @@ class ZarrReader:
 
         elif interpolation in ["linear", "max", "min"]:
             data = ZarrReader._linear_interp_frac_coordinates(
-                z, image_coords, index_values, interpolation=interpolation
+                z,
+                image_coords,
+                index_values,
+                interpolation=interpolation,
+                chunk_cache=self._chunk_cache,
+                cache_namespace=self._cache_namespace,
             )
             res[in_bounds, :] = data
             return res, in_bounds, np.array(index_values), units
@@ -186,23 +348,32 @@ class ZarrReader:
         longitudes: Union[np.ndarray, Sequence[float]],
         latitudes: Union[np.ndarray, Sequence[float]],
     ):
+        return self.get_image_coordinates(set_id, longitudes, latitudes).in_bounds(
+            pixel_is_area=True
+        )
+
+    def get_image_coordinates(
+        self,
+        set_id: str,
+        longitudes: Union[np.ndarray, Sequence[float]],
+        latitudes: Union[np.ndarray, Sequence[float]],
+    ) -> ImageCoordinates:
+        """Project latitude and longitude coordinate pairs onto the spatial grid of the array.
+
+        Args:
+            set_id: string or tuple representing data set, converted into path by path_provider.
+            longitudes: list of longitudes.
+            latitudes: list of latitudes.
+
+        Returns:
+            ImageCoordinates: Fractional image coordinates.
+        """
         if len(longitudes) != len(latitudes):
             raise ValueError("length of longitudes and latitudes not equal")
-
-        z = self._root[set_id]
-        t = z.attrs["transform_mat3x3"]  # type: ignore
-        transform = Affine(t[0], t[1], t[2], t[3], t[4], t[5])
-        crs = z.attrs.get("crs", "epsg:4326")
-        image_coords = self._get_coordinates(
-            longitudes, latitudes, crs, transform, pixel_is_area=True, shape=z.shape
+        path = (
+            self._path_provider(set_id) if self._path_provider is not None else set_id
         )
-        in_bounds = (image_coords[0, :] < z.shape[2]) & (
-            image_coords[0, :] >= -0.5
-        )  # x/lon coords
-        in_bounds = (
-            in_bounds & (image_coords[1, :] < z.shape[1]) & (image_coords[1, :] >= -0.5)
-        )  # y/lat coords
-        return in_bounds
+        return self._get_image_coordinates(self.array_info(path), longitudes, latitudes)
 
     def get_index_values(self, z: zarr.Array) -> Tuple[List[Any], str]:
         # if dimensions attribute is present, assume that the first index
@@ -215,13 +386,16 @@ class ZarrReader:
         return index_values, index_units
 
     def get_max_curves(
-        self, set_id: str, shapes: Sequence[Polygon], interpolation: str = "floor"
+        self,
+        set_id: str,
+        shapes: Union[np.ndarray, Sequence[Polygon]],
+        interpolation: str = "floor",
     ):
         """Get maximal intensity curve for a given geometry.
 
         Args:
             set_id: string or tuple representing data set, converted into path by path_provider.
-            shapes: list of shapely.Polygon.
+            shapes: list or array of shapely geometries (typically Polygons).
             interpolation: interpolation method, "floor", "linear", "max" or "min".
 
         Returns:
@@ -233,99 +407,48 @@ class ZarrReader:
         path = (
             self._path_provider(set_id) if self._path_provider is not None else set_id
         )
-        z = self._root[path]  # e.g. inundation/wri/v2/<filename>
-
-        # in the case of acute risks, index_values will contain the return periods
-        index_values, _ = self.get_index_values(z)
-
-        t = z.attrs["transform_mat3x3"]  # type: ignore
-        transform = Affine(t[0], t[1], t[2], t[3], t[4], t[5])
-        crs = z.attrs.get("crs", "epsg:4326")
-        units: str = z.attrs.get("units", "default")
-
-        if crs.lower() != "epsg:4326":
-            transproj = Transformer.from_crs("epsg:4326", crs, always_xy=True).transform
-            shapes = [shapely.ops.transform(transproj, shape) for shape in shapes]
-
-        matrix = np.array(~transform).reshape(3, 3).transpose()[:, :-1].reshape(6)
-
-        transformed_shapes = [
-            affinity.affine_transform(shape, matrix) for shape in shapes
-        ]
-
-        pixel_offset = 0.5 if interpolation != "floor" else 0.0
-        multipoints = [
-            MultiPoint(
-                [
-                    (x - pixel_offset, y - pixel_offset)
-                    for x in range(
-                        int(np.floor(shape.bounds[0])),
-                        int(np.ceil(shape.bounds[2])) + 1,
-                    )
-                    for y in range(
-                        int(np.floor(shape.bounds[1])),
-                        int(np.ceil(shape.bounds[3])) + 1,
-                    )
-                ]
-            ).intersection(shape)
-            for shape in transformed_shapes
-        ]
-        multipoints = [
-            (
-                Point(
-                    0.5 * (shape.bounds[0] + shape.bounds[2]),
-                    0.5 * (shape.bounds[1] + shape.bounds[3]),
-                )
-                if multipoint.is_empty
-                else multipoint
+        info = self.array_info(path)  # e.g. inundation/wri/v2/<filename>
+        z, units, index_values = info.array, info.units, info.index_values
+
+        geoms = np.empty(len(shapes), dtype=object)
+        geoms[:] = shapes
+        if info.transformer is not None:
+            transformer = info.transformer
+            geoms = shapely.transform(
+                geoms,
+                lambda c: np.column_stack(transformer.transform(c[:, 0], c[:, 1])),
             )
-            for shape, multipoint in zip(transformed_shapes, multipoints)
-        ]
-        multipoints = [
-            MultiPoint([(point.x, point.y)]) if isinstance(point, Point) else point
-            for point in multipoints
-        ]
+        inv_matrix = info.inv_matrix
+        transformed_shapes = shapely.transform(
+            geoms, lambda c: c @ inv_matrix[:2, :2].T + inv_matrix[:2, 2]
+        )
+
+        shape_index, x, y = ZarrReader._rasterize(
+            transformed_shapes,
+            pixel_offset=0.5 if interpolation != "floor" else 0.0,
+            include_vertices=interpolation != "floor",
+        )
 
         if interpolation == "floor":
-            image_coords = np.floor(
-                np.array(
-                    [
-                        [point.x, point.y]
-                        for multipoint in multipoints
-                        for point in multipoint.geoms
-                    ]
-                ).transpose()
-            ).astype(int)
+            image_coords = np.floor(np.stack([x, y])).astype(int)
             image_coords[0, :] %= z.shape[2]
 
-            iz = np.tile(np.arange(z.shape[0]), image_coords.shape[1])  # type: ignore
-            iy = np.repeat(image_coords[1, :], len(index_values))
-            ix = np.repeat(image_coords[0, :], len(index_values))
-
-            curves = z.get_coordinate_selection((iz, iy, ix))
-            curves = curves.reshape(image_coords.shape[1], len(index_values))
+            curves = ZarrReader._get_pixel_values(
+                z,
+                image_coords[1, :],
+                image_coords[0, :],
+                self._chunk_cache,
+                self._cache_namespace,
+            )[:, : len(index_values)]
 
         elif interpolation in ["linear", "max", "min"]:
-            multipoints = [
-                multipoint.union(
-                    transformed_shape
-                    if isinstance(transformed_shape, Point)
-                    else MultiPoint(transformed_shape.exterior.coords)
-                )
-                for transformed_shape, multipoint in zip(
-                    transformed_shapes, multipoints
-                )
-            ]
-            image_coords = np.array(
-                [
-                    [point.x, point.y]
-                    for multipoint in multipoints
-                    for point in multipoint.geoms
-                ]
-            ).transpose()
-
             curves = ZarrReader._linear_interp_frac_coordinates(
-                z, image_coords, index_values, interpolation=interpolation
+                z,
+                np.stack([x, y]),
+                index_values,
+                interpolation=interpolation,
+                chunk_cache=self._chunk_cache,
+                cache_namespace=self._cache_namespace,
             )
 
         else:
@@ -333,20 +456,61 @@ class ZarrReader:
                 "interpolation must have value 'floor', 'linear', 'max' or 'min"
             )
 
-        numbers_of_points_per_shape = [
-            len(multipoint.geoms) for multipoint in multipoints
-        ]
-        numbers_of_points_per_shape_cumulated = np.cumsum(numbers_of_points_per_shape)
-        curves_max = np.array(
-            [
-                np.nanmax(curves[index - number_of_points_per_shape : index, :], axis=0)
-                for number_of_points_per_shape, index in zip(
-                    numbers_of_points_per_shape, numbers_of_points_per_shape_cumulated
-                )
-            ]
-        )
+        # points are sorted by shape and each shape has at least one point
+        offsets = np.searchsorted(shape_index, np.arange(len(transformed_shapes)))
+        # fmax ignores NaNs, as nanmax
+        curves_max = np.fmax.reduceat(curves, offsets, axis=0)
         return curves_max, np.array(index_values), units
 
+    @staticmethod
+    def _rasterize(shapes: np.ndarray, pixel_offset: float, include_vertices: bool):
+        """Find the pixel points (x - pixel_offset, y - pixel_offset) for integer x, y that intersect
+        each shape (in image coordinates). A shape containing no such points is represented by the centre of its
+        bounding box. Optionally, the vertices of the shapes (the exterior of polygons) are also included.
+
+        Args:
+            shapes (np.ndarray): Array of shapely geometries in image coordinates.
+            pixel_offset (float): Offset of the pixel point.
+            include_vertices (bool): If True, include the vertices of each shape.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Index of the shape, x and y of each point; points are
+            sorted by shape.
+        """
+        n_shapes = len(shapes)
+        bounds = shapely.bounds(shapes)
+        x0 = np.floor(bounds[:, 0]).astype(np.int64)
+        y0 = np.floor(bounds[:, 1]).astype(np.int64)
+        ny = np.ceil(bounds[:, 3]).astype(np.int64) - y0 + 1
+        counts = (np.ceil(bounds[:, 2]).astype(np.int64) - x0 + 1) * ny
+        # candidate points are the pixel points of each bounding box
+        shape_index = np.repeat(np.arange(n_shapes), counts)
+        k = np.arange(len(shape_index)) - np.repeat(np.cumsum(counts) - counts, counts)
+        x = (x0[shape_index] + k // ny[shape_index]) - pixel_offset
+        y = (y0[shape_index] + k % ny[shape_index]) - pixel_offset
+        shapely.prepare(shapes)
+        intersects = shapely.intersects_xy(shapes[shape_index], x, y)
+        shape_index, x, y = shape_index[intersects], x[intersects], y[intersects]
+
+        empty = np.nonzero(np.bincount(shape_index, minlength=n_shapes) == 0)[0]
+        indices, xs, ys = (
+            [shape_index, empty],
+            [x, 0.5 * (bounds[empty, 0] + bounds[empty, 2])],
+            [y, 0.5 * (bounds[empty, 1] + bounds[empty, 3])],
+        )
+        if include_vertices:
+            is_polygon = shapely.get_type_id(shapes) == shapely.GeometryType.POLYGON
+            vertices, vertex_index = shapely.get_coordinates(
+                np.where(is_polygon, shapely.get_exterior_ring(shapes), shapes),
+                return_index=True,
+            )
+            indices.append(vertex_index)
+            xs.append(vertices[:, 0])
+            ys.append(vertices[:, 1])
+        shape_index = np.concatenate(indices)
+        order = np.argsort(shape_index, kind="stable")
+        return shape_index[order], np.concatenate(xs)[order], np.concatenate(ys)[order]
+
     def get_max_curves_on_grid(
         self,
         set_id,
@@ -426,7 +590,12 @@ class ZarrReader:
 
     @staticmethod
     def _linear_interp_frac_coordinates(
-        z, image_coords, return_periods, interpolation="linear"
+        z,
+        image_coords,
+        return_periods,
+        interpolation="linear",
+        chunk_cache: Optional[ChunkCache] = None,
+        cache_namespace: str = "",
     ):
         """Return linear interpolated data from fractional row and column coordinates."""
         icx = np.floor(image_coords[0, :]).astype(int)[..., None]
@@ -439,20 +608,17 @@ class ZarrReader:
                 (icx + 1) % z.shape[2],
             ],
             axis=1,
-        )[..., None].repeat(len(return_periods), axis=2)  # points, 4, return_periods
+        )  # points, 4
 
         icy = np.floor(image_coords[1, :]).astype(int)[..., None]
-        iy = np.concatenate([icy, icy + 1, icy, icy + 1], axis=1)[..., None].repeat(
-            len(return_periods), axis=2
-        )
+        iy = np.concatenate([icy, icy + 1, icy, icy + 1], axis=1)
 
-        iz = (
-            np.arange(len(return_periods), dtype=int)[None, ...]
-            .repeat(4, axis=0)[None, ...]
-            .repeat(image_coords.shape[1], axis=0)
+        data = ZarrReader._get_pixel_values(
+            z, iy.reshape(-1), ix.reshape(-1), chunk_cache, cache_namespace
         )
-
-        data = z.get_coordinate_selection((iz, iy, ix))  # type: ignore # index, row, column
+        data = data.reshape(image_coords.shape[1], 4, -1)[
+            :, :, : len(return_periods)
+        ]  # points, 4, return_periods
 
         data = ZarrReader._handle_legacy_nans(data)
 
@@ -469,7 +635,7 @@ class ZarrReader:
             w3 = yf * xf
             w = np.transpose(np.array([w0, w1, w2, w3]), (1, 0, 2))
             mask = 1 - np.isnan(data)
-            data = np.nan_to_num(data, 0)
+            data = np.nan_to_num(data, copy=False)
             w_good = w * mask
             w_good_sum = np.transpose(
                 np.sum(w_good, axis=1).reshape(
@@ -503,34 +669,229 @@ class ZarrReader:
         else:
             raise ValueError("interpolation must have value 'linear', 'max' or 'min")
 
+    def get_region(
+        self, z: zarr.Array, index: int, rows: slice, columns: slice
+    ) -> np.ndarray:
+        """Read a two-dimensional region of the array for a single value of the non-spatial (index)
+        dimension. Equivalent to z[index, rows, columns], but making use of the chunk cache.
+
+        Args:
+            z (zarr.Array): Array with dimensions (index, y, x).
+            index (int): Index of the non-spatial dimension.
+            rows (slice): Rows (y) to read; step must be 1.
+            columns (slice): Columns (x) to read; step must be 1.
+
+        Returns:
+            np.ndarray: Values with shape (no. rows, no. columns).
+        """
+        y0, y1, y_step = rows.indices(z.shape[1])
+        x0, x1, x_step = columns.indices(z.shape[2])
+        if y_step != 1 or x_step != 1:
+            raise ValueError("only slices with step 1 are supported")
+        y1, x1 = max(y0, y1), max(x0, x1)
+        result = np.empty((y1 - y0, x1 - x0), dtype=z.dtype)
+        if result.size == 0:
+            return result
+        ci, i_local = divmod(index, z.chunks[0])
+        ch_y, ch_x = z.chunks[1], z.chunks[2]
+        chunk_coords = [
+            (ci, cy, cx)
+            for cy in range(y0 // ch_y, (y1 - 1) // ch_y + 1)
+            for cx in range(x0 // ch_x, (x1 - 1) // ch_x + 1)
+        ]
+        chunks = ZarrReader._get_chunks(
+            z, chunk_coords, self._chunk_cache, self._cache_namespace
+        )
+        for (_, cy, cx), chunk in zip(chunk_coords, chunks):
+            cy0, cx0 = max(y0, cy * ch_y), max(x0, cx * ch_x)
+            cy1, cx1 = min(y1, (cy + 1) * ch_y), min(x1, (cx + 1) * ch_x)
+            result[cy0 - y0 : cy1 - y0, cx0 - x0 : cx1 - x0] = chunk[
+                i_local,
+                cy0 - cy * ch_y : cy1 - cy * ch_y,
+                cx0 - cx * ch_x : cx1 - cx * ch_x,
+            ]
+        return result
+
+    @staticmethod
+    def _get_pixel_values(
+        z: zarr.Array,
+        iy: np.ndarray,
+        ix: np.ndarray,
+        chunk_cache: Optional[ChunkCache] = None,
+        cache_namespace: str = "",
+    ) -> np.ndarray:
+        """Read the values of the non-spatial (index) dimension for each pixel.
+
+        Args:
+            z (zarr.Array): Array with dimensions (index, y, x).
+            iy (np.ndarray): Row (y) index of each pixel.
+            ix (np.ndarray): Column (x) index of each pixel.
+            chunk_cache (Optional[ChunkCache], optional): Cache of decoded chunks. Defaults to None.
+            cache_namespace (str, optional): Namespace of the store within the cache. Defaults to "".
+
+        Returns:
+            np.ndarray: Values with shape (no. pixels, no. index values).
+        """
+        plan = ChunkReadPlan.create(z.shape, z.chunks, iy, ix)
+        result = np.empty((len(plan.order), z.shape[0]), dtype=z.dtype)
+        blocks = ZarrReader._iter_blocks(
+            z, plan.chunk_coords, chunk_cache, cache_namespace
+        )
+        for i, block in enumerate(blocks):
+            sel = plan.order[plan.offsets[i] : plan.offsets[i + 1]]
+            result[sel, :] = block[
+                : z.shape[0], plan.local_iy[sel], plan.local_ix[sel]
+            ].T
+        return result
+
+    @staticmethod
+    def _iter_blocks(
+        z: zarr.Array,
+        chunk_coords: np.ndarray,
+        chunk_cache: Optional[ChunkCache] = None,
+        cache_namespace: str = "",
+    ):
+        """Yield, for each (chunk y, chunk x) pair, the decoded block comprising all chunks
+        of the non-spatial dimension. Chunks are fetched from the store in batches so that
+        stores supporting concurrent reads (e.g. FSStore) can make use of this."""
+        n_index_chunks = z.cdata_shape[0]
+        for start in range(0, len(chunk_coords), _chunk_fetch_batch_size):
+            batch = chunk_coords[start : start + _chunk_fetch_batch_size]
+            chunks = ZarrReader._get_chunks(
+                z,
+                [
+                    (ci, int(cy), int(cx))
+                    for cy, cx in batch
+                    for ci in range(n_index_chunks)
+                ],
+                chunk_cache,
+                cache_namespace,
+            )
+            for i in range(len(batch)):
+                block = chunks[i * n_index_chunks : (i + 1) * n_index_chunks]
+                yield block[0] if len(block) == 1 else np.concatenate(block, axis=0)
+
+    @staticmethod
+    def _get_chunks(
+        z: zarr.Array,
+        chunk_coords: Sequence[Tuple[int, ...]],
+        chunk_cache: Optional[ChunkCache] = None,
+        cache_namespace: str = "",
+    ) -> List[np.ndarray]:
+        """Get decoded chunks. Those not present in the cache are fetched from the store in a single call."""
+        chunks: List[Optional[np.ndarray]] = (
+            [chunk_cache.get((cache_namespace, z.path, c)) for c in chunk_coords]
+            if chunk_cache is not None
+            else [None] * len(chunk_coords)
+        )
+        missing = [i for i, chunk in enumerate(chunks) if chunk is None]
+        if len(missing) > 0:
+            fetched = ZarrReader._fetch_chunks(z, [chunk_coords[i] for i in missing])
+            for i, chunk in zip(missing, fetched):
+                if chunk_cache is not None:
+                    chunk_cache.put((cache_namespace, z.path, chunk_coords[i]), chunk)
+                chunks[i] = chunk
+        return chunks  # type: ignore
+
+    @staticmethod
+    def _fetch_chunks(
+        z: zarr.Array, chunk_coords: Sequence[Tuple[int, ...]]
+    ) -> List[np.ndarray]:
+        """Fetch chunks from the store in a single call and decode them.
+        This is the only use of Zarr internals: the private zarr.Array._chunk_key and _decode_chunk and the
+        contexts argument of the store getitems are Zarr v2 APIs, hence the zarr<3 pin in pyproject.toml;
+        this needs to be revisited to support Zarr v3."""
+        keys = [z._chunk_key(coords) for coords in chunk_coords]
+        cdatas = z.chunk_store.getitems(keys, contexts={})
+        chunks: List[np.ndarray] = []
+        for key in keys:
+            cdata = cdatas.get(key)
+            if cdata is None:
+                # chunk not initialized: as for Zarr, use the fill value
+                fill_value = z.fill_value if z.fill_value is not None else 0
+                chunks.append(np.full(z.chunks, fill_value, dtype=z.dtype))
+            else:
+                chunks.append(z._decode_chunk(cdata))
+        return chunks
+
+    @staticmethod
+    def _underlying_store(store: MutableMapping) -> MutableMapping:
+        return store.store if isinstance(store, DiskCacheStore) else store
+
+    @staticmethod
+    def _store_namespace(store: MutableMapping) -> str:
+        """Namespace of the store in the chunk cache. Readers of the same S3 (or other fsspec) location
+        share cached chunks; for other stores the namespace is unique to the reader."""
+        store = ZarrReader._underlying_store(store)
+        if isinstance(store, FSMap):
+            protocol = store.fs.protocol
+            protocol = protocol[0] if isinstance(protocol, (tuple, list)) else protocol
+            return f"{protocol}://{store.root}"
+        return f"{type(store).__name__}:{next(_store_ids)}"
+
+    @staticmethod
+    def _create_array_info(
+        z: zarr.Array, get_index_values: Callable[[zarr.Array], Tuple[List[Any], str]]
+    ) -> ArrayInfo:
+        t = z.attrs["transform_mat3x3"]  # type: ignore
+        transform = Affine(t[0], t[1], t[2], t[3], t[4], t[5])
+        crs: str = z.attrs.get("crs", "epsg:4326")
+        units: str = z.attrs.get("units", "default")
+        index_values, _ = get_index_values(z)
+        inv_transform = ~transform
+        is_4326 = crs.lower() == "epsg:4326"
+        # check a special legacy case:
+        # detect if transform convention expects longitude in range [0, 360]
+        longitude_0_360 = (
+            is_4326
+            and len(z.shape) == 3
+            and ((transform * (z.shape[2], z.shape[1]))[0] > 180)
+            and ((transform * (0, 0))[0] >= 0.0)
+        )
+        if longitude_0_360:
+            logger.warning(
+                f"Detected transform convention with longitude in range [0, 360] for array {z.path}. "
+                "Input longitudes will be adjusted accordingly."
+            )
+        return ArrayInfo(
+            array=z,
+            crs=crs,
+            units=units,
+            index_values=index_values,
+            inv_transform=inv_transform,
+            inv_matrix=np.array(inv_transform).reshape(3, 3),
+            transformer=None
+            if is_4326
+            else Transformer.from_crs("epsg:4326", crs, always_xy=True),
+            longitude_0_360=longitude_0_360,
+        )
+
+    @staticmethod
+    def _get_image_coordinates(info: ArrayInfo, longitudes, latitudes):
+        return ImageCoordinates(
+            coords=ZarrReader._get_coordinates(
+                longitudes, latitudes, info, pixel_is_area=False
+            )[:2, :],
+            crs=info.crs,
+            inv_matrix=info.inv_matrix,
+            shape=(info.array.shape[1], info.array.shape[2]),
+        )
+
     @staticmethod
     def _get_coordinates(
         longitudes,
         latitudes,
-        crs: str,
-        transform: Affine,
+        info: ArrayInfo,
         pixel_is_area: bool,
-        shape: Optional[Tuple[int, int, int]] = None,
     ):
-        if crs.lower() != "epsg:4326":
-            transproj = Transformer.from_crs("epsg:4326", crs, always_xy=True)
-            x, y = transproj.transform(longitudes, latitudes)
+        if info.transformer is not None:
+            x, y = info.transformer.transform(longitudes, latitudes)
         else:
             x, y = longitudes, latitudes
+        if info.longitude_0_360:
+            x = np.asarray(x) % 360.0
         coords = np.vstack((x, y, np.ones(len(longitudes))))  # type: ignore
-        # check a special legacy case:
-        if shape is not None and crs.lower() == "epsg:4326":
-            if ((transform * (shape[2], shape[1]))[0] > 180) and (
-                (transform * (0, 0))[0] >= 0.0
-            ):
-                # detect if transform convention expects longitude in range [0, 360]
-                coords = np.vstack((x % 360.0, y, np.ones(len(longitudes))))
-                logger.warning(
-                    "Detected transform convention with longitude in range [0, 360]. Adjusting input longitudes accordingly."
-                )
-        inv_trans = ~transform
-        mat = np.array(inv_trans).reshape(3, 3)
-        frac_image_coords = mat @ coords
+        frac_image_coords = info.inv_matrix @ coords
         if pixel_is_area:
             frac_image_coords[:2, :] -= 0.5
         return frac_image_coords
@@ -539,6 +900,7 @@ class ZarrReader:
     def _get_equivalent_buffer_in_arc_degrees(latitude, buffer_in_metres):
         """
         area = radius * radius * cos(p) * dp * dq = buffer_in_metres * buffer_in_metres
+        latitude and buffer_in_metres may be scalars or arrays.
         """
         semi_major_axis = 6378137
         semi_minor_axis = 6356752.314245
@@ -551,9 +913,11 @@ class ZarrReader:
             * np.sqrt((cosinus / semi_major_axis) ** 2 + (sinus / semi_minor_axis) ** 2)
             / degrees_to_radians
         )
-        if 0.0 < cosinus:
-            buffer_in_arc_degrees /= np.sqrt(cosinus)
-        return buffer_in_arc_degrees
+        return np.where(
+            0.0 < cosinus,
+            buffer_in_arc_degrees / np.sqrt(np.where(0.0 < cosinus, cosinus, 1.0)),
+            buffer_in_arc_degrees,
+        )
 
     @staticmethod
     def _handle_legacy_nans(data: np.ndarray):
@@ -33,6 +33,24 @@ def add_x_value_to_curve(x, curve_x, curve_y):
     return curve_x, curve_y, i
 
 
+def interp_rows(x: np.ndarray, xp: np.ndarray, fp: np.ndarray) -> np.ndarray:
+    """Row-wise equivalent of np.interp: for each row, r, the result is np.interp(x[r], xp[r, :], fp[r, :]).
+    Each row of xp must be sorted non-decreasing.
+    """
+    n = xp.shape[1]
+    # j is the last index where xp <= x, as for np.interp
+    j = np.count_nonzero(xp <= x[:, None], axis=1) - 1
+    jl = np.clip(j, 0, n - 1)
+    ju = np.clip(j + 1, 0, n - 1)
+    rows = np.arange(xp.shape[0])
+    xl, xu = xp[rows, jl], xp[rows, ju]
+    fl, fu = fp[rows, jl], fp[rows, ju]
+    interior = (j >= 0) & (j < n - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.where(interior, fl + (x - xl) * (fu - fl) / (xu - xl), fl)
+    return np.where(j < 0, fp[:, 0], result)
+
+
 def to_exceedance_curve(bin_edges, probs):
     """An exceedance curve gives the probability that the random variable is greater than the value,
     a type of cumulative probability.
@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 from typing import (
     Any,
     Dict,
+    Iterator,
+    List,
     Mapping,
     NamedTuple,
     Optional,
@@ -203,6 +205,247 @@ class HazardParameterDataResponse(HazardDataResponse):
         )
 
 
+class HazardDataBatch(Mapping[HazardDataRequest, HazardDataResponse]):
+    """Columnar responses to a sequence of HazardDataRequests: row i of each array corresponds to
+    the ith request. For each row, values_2d[i, :lengths[i]] are the hazard indicator values (intensities
+    for event responses, parameters otherwise) and indices[i, :lengths[i]] the index values (return
+    periods or parameter definitions); rows are padded with NaN (values) to a common width.
+    If rows have index values of different types, indices has a common (possibly object) type; the type
+    of each row is restored in its response. Units, paths and failures are stored as codes into the lists
+    units, paths and failures.
+
+    The batch is also a Mapping from request to HazardDataResponse; response objects are created
+    only when accessed.
+    """
+
+    FAILED = 0
+    EVENT = 1
+    PARAMETER = 2
+
+    def __init__(self, requests: Sequence[HazardDataRequest]):
+        """Create HazardDataBatch, initially with all rows failed with reason "no response".
+
+        Args:
+            requests (Sequence[HazardDataRequest]): Hazard indicator data requests.
+        """
+        n = len(requests)
+        self.requests = requests
+        self.kinds = np.zeros(n, dtype=np.int8)
+        self.values_2d = np.full((n, 0), np.nan)
+        self.indices = np.zeros((n, 0))
+        self.lengths = np.zeros(n, dtype=np.int32)
+        self.units_codes = np.full(n, -1, dtype=np.int32)
+        self.index_dtype_codes = np.full(n, -1, dtype=np.int32)
+        self.path_codes = np.full(n, -1, dtype=np.int32)
+        self.failure_codes = np.zeros(n, dtype=np.int32)
+        self.units: List[str] = []
+        self.paths: List[str] = []
+        self.index_dtypes: List[np.dtype] = []
+        self.failures: List[HazardDataFailedResponse] = [
+            HazardDataFailedResponse(reason="no response")
+        ]
+        self._codes: Dict[Tuple[str, Any], int] = {}
+        self._row_index: Optional[Dict[HazardDataRequest, int]] = None
+        self._responses: Dict[int, HazardDataResponse] = {}
+
+    @property
+    def coverage_mask(self) -> np.ndarray:
+        """Mask of rows for which data was successfully retrieved."""
+        return self.kinds != HazardDataBatch.FAILED
+
+    def set_rows(
+        self,
+        rows: np.ndarray,
+        kind: int,
+        values: np.ndarray,
+        indices: np.ndarray,
+        lengths: np.ndarray,
+        units: str,
+        paths: np.ndarray,
+    ):
+        """Set the successful responses for a number of rows.
+
+        Args:
+            rows (np.ndarray): Row numbers, i.e. positions of the requests.
+            kind (int): HazardDataBatch.EVENT or HazardDataBatch.PARAMETER.
+            values (np.ndarray): Values, of shape (len(rows), width).
+            indices (np.ndarray): Index values, of shape (len(rows), width) or (width,) if common to all rows.
+            lengths (np.ndarray): Number of valid values for each row.
+            units (str): Units of the values.
+            paths (np.ndarray): Path of the hazard indicator data source for each row.
+        """
+        width = values.shape[1]
+        self._ensure_capacity(width, indices.dtype)
+        self.kinds[rows] = kind
+        self.values_2d[rows, :width] = values
+        self.values_2d[rows, width:] = np.nan
+        self.indices[rows, :width] = indices
+        self.lengths[rows] = lengths
+        self.units_codes[rows] = self._code("units", units, self.units)
+        self.index_dtype_codes[rows] = self._code(
+            "index_dtypes", indices.dtype, self.index_dtypes
+        )
+        unique_paths, inverse = np.unique(paths.astype(str), return_inverse=True)
+        path_codes = np.array(
+            [self._code("paths", str(p), self.paths) for p in unique_paths],
+            dtype=np.int32,
+        )
+        self.path_codes[rows] = path_codes[inverse.ravel()]
+        self.failure_codes[rows] = -1
+        self._invalidate(rows)
+
+    def set_failed(self, rows: np.ndarray, failure: HazardDataFailedResponse):
+        """Set the rows to the failed response given.
+
+        Args:
+            rows (np.ndarray): Row numbers, i.e. positions of the requests.
+            failure (HazardDataFailedResponse): Failed response, shared by the rows.
+        """
+        self.failures.append(failure)
+        self.kinds[rows] = HazardDataBatch.FAILED
+        self.lengths[rows] = 0
+        self.units_codes[rows] = -1
+        self.index_dtype_codes[rows] = -1
+        self.path_codes[rows] = -1
+        self.failure_codes[rows] = len(self.failures) - 1
+        self._invalidate(rows)
+
+    def response(self, row: int) -> HazardDataResponse:
+        """HazardDataResponse for the request at the row given; created on first access."""
+        response = self._responses.get(row, None)
+        if response is not None:
+            return response
+        kind = self.kinds[row]
+        if kind == HazardDataBatch.FAILED:
+            response = self.failures[self.failure_codes[row]]
+        else:
+            length = self.lengths[row]
+            units = self.units[self.units_codes[row]]
+            path = self.paths[self.path_codes[row]]
+            indices = self.indices[row, :length]
+            index_dtype = self.index_dtypes[self.index_dtype_codes[row]]
+            if indices.dtype != index_dtype:
+                indices = indices.astype(index_dtype)
+            if kind == HazardDataBatch.EVENT:
+                response = HazardEventDataResponse(
+                    indices,
+                    self.values_2d[row, :length],
+                    units,
+                    path,
+                )
+            else:
+                response = HazardParameterDataResponse(
+                    self.values_2d[row, :length],
+                    indices,
+                    units,
+                    path,
+                )
+        self._responses[row] = response
+        return response
+
+    def row_index(self) -> Dict[HazardDataRequest, int]:
+        """Map from request to row; created on first access."""
+        if self._row_index is None:
+            self._row_index = {req: i for i, req in enumerate(self.requests)}
+        return self._row_index
+
+    @staticmethod
+    def from_responses(
+        requests: Sequence[HazardDataRequest],
+        responses: Mapping[HazardDataRequest, HazardDataResponse],
+    ) -> "HazardDataBatch":
+        """Create HazardDataBatch from responses to the requests.
+
+        Args:
+            requests (Sequence[HazardDataRequest]): Hazard indicator data requests.
+            responses (Mapping[HazardDataRequest, HazardDataResponse]): Responses for the requests.
+
+        Returns:
+            HazardDataBatch: Columnar responses.
+        """
+        if isinstance(responses, HazardDataBatch) and responses.requests is requests:
+            return responses
+        batch = HazardDataBatch(requests)
+        for i, req in enumerate(requests):
+            resp = responses.get(req, None)
+            rows = np.array([i])
+            if isinstance(resp, HazardEventDataResponse):
+                values, indices, kind = (
+                    resp.intensities,
+                    resp.return_periods,
+                    HazardDataBatch.EVENT,
+                )
+            elif isinstance(resp, HazardParameterDataResponse):
+                values, indices, kind = (
+                    resp.parameters,
+                    resp.param_defns,
+                    HazardDataBatch.PARAMETER,
+                )
+            else:
+                if isinstance(resp, HazardDataFailedResponse):
+                    batch.set_failed(rows, resp)
+                continue
+            values = np.atleast_1d(np.asarray(values, dtype=np.float64))
+            indices = np.atleast_1d(np.asarray(indices))
+            if indices.shape != values.shape:
+                indices = np.full(values.shape, np.nan)
+            batch.set_rows(
+                rows,
+                kind,
+                values[None, :],
+                indices[None, :],
+                np.array([len(values)]),
+                resp.units,
+                np.array([resp.path], dtype=object),
+            )
+            batch._responses[i] = resp
+        return batch
+
+    def __getitem__(self, request: HazardDataRequest) -> HazardDataResponse:
+        return self.response(self.row_index()[request])
+
+    def __iter__(self) -> Iterator[HazardDataRequest]:
+        return iter(self.row_index())
+
+    def __len__(self) -> int:
+        return len(self.row_index())
+
+    def _code(self, kind: str, value: Any, values: List[Any]):
+        code = self._codes.get((kind, value), None)
+        if code is None:
+            code = len(values)
+            values.append(sys.intern(value) if isinstance(value, str) else value)
+            self._codes[(kind, value)] = code
+        return code
+
+    def _ensure_capacity(self, width: int, indices_dtype: np.dtype):
+        current_width = self.values_2d.shape[1]
+        dtype: np.dtype = self.indices.dtype
+        if current_width == 0:
+            dtype = indices_dtype
+        elif indices_dtype != dtype:
+            dtype = (
+                np.promote_types(dtype, indices_dtype)
+                if np.issubdtype(dtype, np.number)
+                and np.issubdtype(indices_dtype, np.number)
+                else np.dtype(object)
+            )
+        if width <= current_width and dtype == self.indices.dtype:
+            return
+        width = max(width, current_width)
+        n = len(self.kinds)
+        values = np.full((n, width), np.nan)
+        values[:, :current_width] = self.values_2d
+        indices = np.zeros((n, width), dtype=dtype)
+        indices[:, :current_width] = self.indices
+        self.values_2d, self.indices = values, indices
+
+    def _invalidate(self, rows: np.ndarray):
+        if len(self._responses) > 0:
+            for row in np.atleast_1d(rows):
+                self._responses.pop(int(row), None)
+
+
 class HazardModel(ABC):
     """Hazard model. The model accepts a set of HazardDataRequests and returns the corresponding
     HazardDataResponses."""
@@ -221,6 +464,20 @@ class HazardModel(ABC):
         """
         ...
 
+    def get_hazard_data_batch(
+        self, requests: Sequence[HazardDataRequest]
+    ) -> HazardDataBatch:
+        """Process the hazard indicator data requests and return the responses in columnar form.
+        Models able to do so should override this to avoid creating a response object per request.
+
+        Args:
+            requests (Sequence[HazardDataRequest]): Hazard indicator data requests.
+
+        Returns:
+            HazardDataBatch: Responses for all hazard indicator data requests.
+        """
+        return HazardDataBatch.from_responses(requests, self.get_hazard_data(requests))
+
     def get_hazard_events(
         self, requests: Sequence[HazardDataRequest]
     ) -> Mapping[HazardDataRequest, HazardDataResponse]:
@@ -1,7 +1,22 @@
+import concurrent.futures
 import logging
+import math
+import multiprocessing
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import numpy as np
 
 from physrisk.kernel.assets import Asset
 from physrisk.kernel.hazard_event_distrib import HazardEventDistrib
@@ -9,7 +24,9 @@ from physrisk.kernel.hazard_model import (
     HazardDataFailedResponse,
     HazardDataRequest,
     HazardDataResponse,
+    HazardEventDataResponse,
     HazardModel,
+    HazardParameterDataResponse,
 )
 from physrisk.kernel.hazards import Hazard
 from physrisk.kernel.impact_distrib import (
@@ -63,8 +80,27 @@ def calculate_impacts(  # noqa: C901
     *,
     scenarios: Sequence[str],
     years: Sequence[int],
+    max_workers: Optional[int] = None,
+    chunk_size: Optional[int] = None,
 ) -> Dict[ImpactKey, List[AssetImpactResult]]:
-    """Calculate asset level impacts."""
+    """Calculate asset level impacts.
+
+    Args:
+        assets (Iterable[Asset]): Assets.
+        hazard_model (HazardModel): Model providing the hazard data.
+        vulnerability_models (VulnerabilityModels): Vulnerability models for each asset type.
+        scenarios (Sequence[str]): Scenario identifiers.
+        years (Sequence[int]): Years.
+        max_workers (Optional[int], optional): If greater than 1, once hazard data is retrieved the
+            vulnerability models are applied in a pool of this number of worker processes. Defaults to None,
+            in which case the calculation is in-process.
+        chunk_size (Optional[int], optional): Number of assets in each task sent to a worker process.
+            Defaults to None, in which case the assets of each model, scenario and year are split
+            into about 4 tasks per worker.
+
+    Returns:
+        Dict[ImpactKey, List[AssetImpactResult]]: Impact results.
+    """
 
     model_assets: Dict[DataRequester, List[Asset]] = defaultdict(
         list
@@ -81,32 +117,6 @@ def calculate_impacts(  # noqa: C901
         hazard_model, model_assets, scenarios, years
     )
 
-    # with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
-    #     # with concurrent.futures.ProcessPoolExecutor(max_workers=8) as executor:
-    #     tagged_futures = {
-    #         executor.submit(
-    #             self._calculate_single_impact, assets, scenario, year
-    #         ): BatchId(scenario, None if scenario == "historical" else year)
-    #         for scenario in scenarios
-    #         for year in years
-    #     }
-    #     for future in concurrent.futures.as_completed(tagged_futures):
-    #         tag = tagged_futures[future]
-    #         try:
-    #             res = future.result()
-    #             # flatten to use single key
-    #             for temp_key, value in res.items():
-    #                 key = ImpactKey(
-    #                     asset=temp_key.asset,
-    #                     hazard_type=temp_key.hazard_type,
-    #                     scenario=tag.scenario,
-    #                     key_year=tag.key_year,
-    #                 )
-    #                 impact_results[key] = value
-
-    #         except Exception as exc:
-    #             print("%r generated an exception: %s" % (tag, exc))
-
     logging.info("Calculating impacts")
     summary: Dict[str, List[Tuple[str, int, str]]] = defaultdict(list)
     for model, assets in model_assets.items():
@@ -119,75 +129,151 @@ def calculate_impacts(  # noqa: C901
         logging.info(f"{k}:")
         for v in vl:
             logging.info(f"{v[1]} {v[2]}{'s' if v[1] > 1 else ''}: {v[0]}")
+
+    # the work to be done, in order: for each scenario, year and model, the assets and their hazard data
+    work: List[_ModelWork] = []
     for scenario in scenarios:
-        logging.info(f"Scenario {scenario}")
         for year in [-1] if scenario == "historical" else years:
-            if scenario != "historical":
-                logging.info(f"Year {year}")
             asset_requests = scen_year_asset_requests[ScenarioYear(scenario, year)]
+            key_year = None if year == -1 else year
             for model, assets in model_assets.items():
                 assert isinstance(model, VulnerabilityModelBase)
-                for asset in assets:
-                    requests = asset_requests[(model, asset)]
-                    hazard_data = [responses[req] for req in get_iterable(requests)]
-
-                    results.setdefault(
-                        ImpactKey(
-                            asset=asset,
-                            hazard_type=model.hazard_type,
-                            scenario=scenario,
-                            key_year=None if year == -1 else year,
-                        ),
-                        [],
+                hazard_data_matrix = [
+                    [
+                        responses[req]
+                        for req in get_iterable(asset_requests[(model, asset)])
+                    ]
+                    for asset in assets
+                ]
+                # some hazard indicator data may be missing; perhaps unavailable location for a certain requested SSP
+                has_data = [
+                    not any(
+                        isinstance(hd, HazardDataFailedResponse) for hd in hazard_data
                     )
-
-                    impact_key = ImpactKey(
-                        asset=asset,
-                        hazard_type=model.hazard_type,
-                        scenario=scenario,
-                        key_year=None if year == -1 else year,
+                    for hazard_data in hazard_data_matrix
+                ]
+                work.append(
+                    _ModelWork(
+                        scenario, key_year, model, assets, hazard_data_matrix, has_data
                     )
+                )
 
-                    try:
-                        if any(
-                            isinstance(hd, HazardDataFailedResponse)
-                            for hd in hazard_data
-                        ):
-                            # some hazard indicator data is missing; perhaps unavailable location for a certain requested SSP
-                            asset_impact_result = AssetImpactResult(
-                                EmptyImpactDistrib(empty_reason=EmptyReason.NO_DATA),
-                                hazard_data=hazard_data,
-                            )
-                        elif isinstance(model, VulnerabilityModelAcuteBase):
-                            impact, vul, event = model.get_impact_details(
-                                asset, hazard_data
-                            )
-                            asset_impact_result = AssetImpactResult(
-                                impact,
-                                vulnerability=vul,
-                                event=event,
-                                hazard_data=hazard_data,
-                            )
-                        elif isinstance(model, VulnerabilityModelBase):
-                            impact = model.get_impact(asset, hazard_data)
-                            asset_impact_result = AssetImpactResult(
-                                impact, hazard_data=hazard_data
-                            )
-                        else:
-                            raise ValueError(
-                                f"Unsupported vulnerability model type: {type(model)}"
-                            )
-                    except Exception as e:
-                        asset_impact_result = AssetImpactResult(
-                            EmptyImpactDistrib(empty_reason=EmptyReason.EXCEPTION),
-                            hazard_data=hazard_data,
-                        )
-                        logger.exception(e)
-                    finally:
-                        results[impact_key].append(asset_impact_result)
+    calculator = (
+        _ParallelImpactCalculator(list(model_assets.keys()), max_workers, chunk_size)
+        if max_workers is not None and max_workers > 1
+        else None
+    )
+    try:
+        if calculator is not None:
+            for item in work:
+                calculator.submit(item.model, *item.with_data())
+        for index, item in enumerate(work):
+            if index == 0 or item.scenario != work[index - 1].scenario:
+                logging.info(f"Scenario {item.scenario}")
+            if item.key_year is not None and (
+                index == 0 or item.key_year != work[index - 1].key_year
+            ):
+                logging.info(f"Year {item.key_year}")
+            batch_results = iter(
+                calculator.results(index)
+                if calculator is not None
+                else _calculate_model_impacts(item.model, *item.with_data())
+            )
+            for asset, hazard_data, ok in zip(
+                item.assets, item.hazard_data_matrix, item.has_data
+            ):
+                if ok:
+                    asset_impact_result = next(batch_results)
+                    asset_impact_result.hazard_data = hazard_data
+                else:
+                    asset_impact_result = AssetImpactResult(
+                        EmptyImpactDistrib(empty_reason=EmptyReason.NO_DATA),
+                        hazard_data=hazard_data,
+                    )
+                results.setdefault(
+                    ImpactKey(
+                        asset=asset,
+                        hazard_type=item.model.hazard_type,
+                        scenario=item.scenario,
+                        key_year=item.key_year,
+                    ),
+                    [],
+                ).append(asset_impact_result)
+    finally:
+        if calculator is not None:
+            calculator.shutdown()
     return results
 
 
+class _ModelWork(NamedTuple):
+    scenario: str
+    key_year: Optional[int]
+    model: VulnerabilityModelBase
+    assets: List[Asset]
+    hazard_data_matrix: List[List[HazardDataResponse]]
+    has_data: List[bool]
+
+    def with_data(self) -> Tuple[List[Asset], List[List[HazardDataResponse]]]:
+        """Assets for which all hazard data is present, with their hazard data."""
+        return (
+            [asset for asset, ok in zip(self.assets, self.has_data) if ok],
+            [hd for hd, ok in zip(self.hazard_data_matrix, self.has_data) if ok],
+        )
+
+
+def _calculate_model_impacts(
+    model: VulnerabilityModelBase,
+    assets: Sequence[Asset],
+    hazard_data_matrix: Sequence[Sequence[HazardDataResponse]],
+) -> List[AssetImpactResult]:
+    """Apply the vulnerability model to assets for which all hazard data is present."""
+    try:
+        return [
+            AssetImpactResult(
+                impact, vulnerability=vul, event=event, hazard_data=hazard_data
+            )
+            for (impact, vul, event), hazard_data in zip(
+                model.get_impacts_batch(assets, hazard_data_matrix),
+                hazard_data_matrix,
+                strict=True,
+            )
+        ]
+    except Exception:
+        # fall back to the per-asset calculation, so that only the assets causing
+        # the exception fail
+        logger.exception(
+            "batch impact calculation failed for %s; falling back to per-asset", model
+        )
+        return [
+            _calculate_single_impact(model, asset, hazard_data)
+            for asset, hazard_data in zip(assets, hazard_data_matrix)
+        ]
+
+
+def _calculate_single_impact(
+    model: VulnerabilityModelBase,
+    asset: Asset,
+    hazard_data: Sequence[HazardDataResponse],
+) -> AssetImpactResult:
+    try:
+        if isinstance(model, VulnerabilityModelAcuteBase):
+            impact, vul, event = model.get_impact_details(asset, hazard_data)
+            return AssetImpactResult(
+                impact, vulnerability=vul, event=event, hazard_data=hazard_data
+            )
+        elif isinstance(model, VulnerabilityModelBase):
+            impact = model.get_impact(asset, hazard_data)
+            return AssetImpactResult(impact, hazard_data=hazard_data)
+        else:
+            raise ValueError(f"Unsupported vulnerability model type: {type(model)}")
+    except Exception as e:
+        logger.exception(e)
+        return AssetImpactResult(
+            EmptyImpactDistrib(empty_reason=EmptyReason.EXCEPTION),
+            hazard_data=hazard_data,
+        )
+
+
 class ScenarioYear(NamedTuple):
     scenario: str
     key_year: Optional[int] = None
@@ -233,3 +319,196 @@ def _download_data_consolidated(
     ]
     responses = hazard_model.get_hazard_data(flattened_requests)
     return scen_year_asset_requests, responses
+
+
+class _HazardDataPacket:
+    """Hazard data responses of a number of assets packed into flat numpy arrays, so that these
+    can be sent efficiently to worker processes."""
+
+    _EVENT, _PARAMETER = 0, 1
+
+    def __init__(self, hazard_data_matrix: Sequence[Sequence[HazardDataResponse]]):
+        responses = [resp for hazard_data in hazard_data_matrix for resp in hazard_data]
+        self.counts = np.array([len(hd) for hd in hazard_data_matrix], dtype=np.int32)
+        self.kinds = np.array(
+            [
+                self._EVENT
+                if isinstance(resp, HazardEventDataResponse)
+                else self._PARAMETER
+                for resp in responses
+            ],
+            dtype=np.int8,
+        )
+        xs = [
+            resp.return_periods
+            if isinstance(resp, HazardEventDataResponse)
+            else resp.param_defns  # type: ignore
+            for resp in responses
+        ]
+        ys = [
+            resp.intensities
+            if isinstance(resp, HazardEventDataResponse)
+            else resp.parameters  # type: ignore
+            for resp in responses
+        ]
+        # 0-dimensional arrays are stored as single values
+        self.x_scalar = np.array([np.ndim(x) == 0 for x in xs], dtype=bool)
+        self.x, self.x_offsets = self._flatten(xs)
+        self.y, self.y_offsets = self._flatten(ys)
+        strings: Dict[str, int] = {}
+        self.units = np.array(
+            [strings.setdefault(resp.units, len(strings)) for resp in responses],  # type: ignore
+            dtype=np.int32,
+        )
+        self.paths = np.array(
+            [strings.setdefault(resp.path, len(strings)) for resp in responses],  # type: ignore
+            dtype=np.int32,
+        )
+        self.strings = list(strings.keys())
+
+    @staticmethod
+    def can_pack(hazard_data_matrix: Sequence[Sequence[HazardDataResponse]]) -> bool:
+        """True if all responses are of supported type and the arrays of each field have consistent dtype
+        and are at most 1-dimensional."""
+        x_dtypes, y_dtypes = set(), set()
+        for hazard_data in hazard_data_matrix:
+            for resp in hazard_data:
+                if type(resp) is HazardEventDataResponse:
+                    x, y = resp.return_periods, resp.intensities
+                elif type(resp) is HazardParameterDataResponse:
+                    x, y = resp.param_defns, resp.parameters
+                else:
+                    return False
+                if x.ndim > 1 or y.ndim != 1:
+                    return False
+                x_dtypes.add(x.dtype)
+                y_dtypes.add(y.dtype)
+        return len(x_dtypes) <= 1 and len(y_dtypes) <= 1
+
+    @staticmethod
+    def _flatten(arrays: Sequence[np.ndarray]):
+        offsets = np.zeros(len(arrays) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([np.size(a) for a in arrays])
+        flat = (
+            np.concatenate([np.ravel(a) for a in arrays])
+            if len(arrays) > 0
+            else np.empty(0)
+        )
+        return flat, offsets
+
+    def unpack(self) -> List[List[HazardDataResponse]]:
+        responses: List[HazardDataResponse] = []
+        for i, kind in enumerate(self.kinds):
+            x = self.x[self.x_offsets[i] : self.x_offsets[i + 1]]
+            if self.x_scalar[i]:
+                x = x.reshape(())
+            y = self.y[self.y_offsets[i] : self.y_offsets[i + 1]]
+            units, path = self.strings[self.units[i]], self.strings[self.paths[i]]
+            if kind == self._EVENT:
+                responses.append(HazardEventDataResponse(x, y, units, path))
+            else:
+                responses.append(HazardParameterDataResponse(y, x, units, path))
+        ends = np.cumsum(self.counts)
+        return [responses[end - count : end] for count, end in zip(self.counts, ends)]
+
+
+# vulnerability models of a worker process, set once on start-up rather than being sent with each task
+_worker_models: List[DataRequester] = []
+
+
+def _initialize_worker(models: List[DataRequester]):
+    global _worker_models
+    _worker_models = models
+
+
+def _calculate_model_impacts_in_worker(
+    model_index: int, assets: Sequence[Asset], hazard_data: Any
+) -> List[AssetImpactResult]:
+    model = _worker_models[model_index]
+    assert isinstance(model, VulnerabilityModelBase)
+    hazard_data_matrix = (
+        hazard_data.unpack()
+        if isinstance(hazard_data, _HazardDataPacket)
+        else hazard_data
+    )
+    results = _calculate_model_impacts(model, assets, hazard_data_matrix)
+    for result in results:
+        # the caller already has the hazard data
+        result.hazard_data = None
+    return results
+
+
+class _ParallelImpactCalculator:
+    """Applies vulnerability models to chunks of assets in a pool of worker processes. Results are
+    gathered in the order of submission, so are independent of the order in which tasks complete."""
+
+    def __init__(
+        self,
+        models: List[DataRequester],
+        max_workers: int,
+        chunk_size: Optional[int] = None,
+    ):
+        self._model_index = {id(model): i for i, model in enumerate(models)}
+        self._max_workers = max_workers
+        self._chunk_size = chunk_size
+        # spawn rather than fork: forking a process with running threads (e.g. the hazard
+        # data IO loop) is unsafe
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_initialize_worker,
+            initargs=(models,),
+        )
+        self._tasks: List[
+            List[
+                Tuple[
+                    concurrent.futures.Future,
+                    VulnerabilityModelBase,
+                    Sequence[Asset],
+                    Sequence[Sequence[HazardDataResponse]],
+                ]
+            ]
+        ] = []
+
+    def submit(
+        self,
+        model: VulnerabilityModelBase,
+        assets: Sequence[Asset],
+        hazard_data_matrix: Sequence[Sequence[HazardDataResponse]],
+    ):
+        """Submit the calculation of impacts of the assets using the model, split into chunks."""
+        chunk_size = self._chunk_size or max(
+            1, math.ceil(len(assets) / (4 * self._max_workers))
+        )
+        tasks = []
+        for start in range(0, len(assets), chunk_size):
+            chunk_assets = assets[start : start + chunk_size]
+            chunk_hazard_data = hazard_data_matrix[start : start + chunk_size]
+            future = self._executor.submit(
+                _calculate_model_impacts_in_worker,
+                self._model_index[id(model)],
+                chunk_assets,
+                _HazardDataPacket(chunk_hazard_data)
+                if _HazardDataPacket.can_pack(chunk_hazard_data)
+                else chunk_hazard_data,
+            )
+            tasks.append((future, model, chunk_assets, chunk_hazard_data))
+        self._tasks.append(tasks)
+
+    def results(self, index: int) -> List[AssetImpactResult]:
+        results: List[AssetImpactResult] = []
+        for future, model, assets, hazard_data_matrix in self._tasks[index]:
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                # e.g. the model or assets cannot be sent to the worker; calculate in-process instead
+                logger.warning(
+                    f"Parallel impact calculation failed ({e}); calculating in-process."
+                )
+                results.extend(
+                    _calculate_model_impacts(model, assets, hazard_data_matrix)
+                )
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
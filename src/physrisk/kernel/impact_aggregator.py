@@ -1,19 +1,30 @@
 from collections import defaultdict
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
+from enum import Enum
+import json
 import logging
-from typing import Generator, NamedTuple, Optional
+import os
+from typing import Any, Generator, Literal, Mapping, NamedTuple, Optional, Sequence
 from typing_extensions import Protocol
 
+import h3
 import numpy as np
+from numba import njit
+import scipy.fft
+from scipy.stats import qmc
 
 from physrisk.kernel.hazards import Hazard
 from physrisk.kernel.impact_distrib import EmptyImpactDistrib, ImpactDistrib
 from physrisk.kernel.risk import Quantity, QuantityType, RiskQuantityKey
 from physrisk.kernel.assets import Asset
 from physrisk.kernel.curve import ExceedanceCurve
-from physrisk.kernel.financial_model import FinancialModel
-from physrisk.kernel.hazards import HazardKind
+from physrisk.kernel.financial_model import DefaultFinancialModel, FinancialModel
+from physrisk.kernel.hazards import HazardKind, hazard_class
 from physrisk.kernel.impact import AssetImpactResult, ImpactKey
+from physrisk.kernel.quantile_sketch import QuantileSketch
+from physrisk.vulnerability_models.downtime import ConfigBasedDowntimeModel
 
 
 logger = logging.getLogger(__name__)
@@ -128,6 +139,101 @@ class _SimulationInputs:
     chronic_hazards_in_scope: set[type[Hazard]]
 
 
+@dataclass(frozen=True)
+class ConvergenceCriteria:
+    """Criteria for stopping the Monte Carlo simulation of aggregate_impacts adaptively: batches of events are
+    simulated until, for the portfolio damage and revenue loss, the standard errors of the mean and of the
+    losses at the given return periods are within the relative tolerances, subject to the minimum and maximum
+    number of events.
+    """
+
+    mean_rtol: float = 0.01
+    quantile_rtol: float = 0.02
+    return_periods: tuple[float, ...] = (200.0,)
+    min_events: int = 10000
+    max_events: int = 1000000
+
+    def converged(
+        self, values: np.ndarray, weights: Optional[np.ndarray] = None
+    ) -> bool:
+        quantiles = 1.0 - 1.0 / np.array(self.return_periods)
+        mean_error, quantile_errors = _standard_errors(values, quantiles, weights)
+        return self._within_tolerance(
+            float(np.average(values, weights=weights)),
+            mean_error,
+            weighted_quantile(values, quantiles, weights),
+            quantile_errors,
+        )
+
+    def converged_sketch(self, sketch: QuantileSketch) -> bool:
+        quantiles = 1.0 - 1.0 / np.array(self.return_periods)
+        return self._within_tolerance(
+            sketch.mean,
+            sketch.mean_standard_error(),
+            sketch.quantile(quantiles),
+            sketch.quantile_standard_errors(quantiles),
+        )
+
+    def _within_tolerance(
+        self,
+        mean: float,
+        mean_error: float,
+        quantile_values: np.ndarray,
+        quantile_errors: np.ndarray,
+    ) -> bool:
+        return bool(
+            mean_error <= self.mean_rtol * abs(mean)
+            and np.all(quantile_errors <= self.quantile_rtol * np.abs(quantile_values))
+        )
+
+
+def weighted_quantile(
+    values: np.ndarray, quantiles: np.ndarray, weights: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """Quantiles of sampled values. If weights are given, the quantiles of the weighted samples: for each
+    quantile, the smallest value for which the normalised cumulative weight reaches the quantile."""
+    if weights is None:
+        return np.quantile(values, quantiles)
+    order = np.argsort(values, kind="stable")
+    cum_weights = np.cumsum(weights[order])
+    indices = np.searchsorted(cum_weights / cum_weights[-1], quantiles)
+    return values[order][np.minimum(indices, len(values) - 1)]
+
+
+def _standard_errors(
+    values: np.ndarray, quantiles: np.ndarray, weights: Optional[np.ndarray] = None
+) -> tuple[float, np.ndarray]:
+    """Standard errors of the mean and of the quantiles of sampled values, optionally weighted. The latter is
+    estimated as half the spread of the order statistics within one standard deviation of the rank of each
+    quantile."""
+    if len(values) < 2:
+        return np.inf, np.full(len(quantiles), np.inf)
+    if weights is None:
+        n = len(values)
+        mean_error = float(np.std(values, ddof=1) / np.sqrt(n))
+    else:
+        w = weights / np.sum(weights)
+        n = 1.0 / np.sum(np.square(w))  # effective sample size
+        mean_error = float(
+            np.sqrt(np.sum(np.square(w * (values - np.sum(w * values)))))
+        )
+    rank_error = np.sqrt(quantiles * (1.0 - quantiles) / n)
+    lower, upper = np.split(
+        weighted_quantile(
+            values,
+            np.concatenate(
+                [
+                    np.maximum(quantiles - rank_error, 0.0),
+                    np.minimum(quantiles + rank_error, 1.0),
+                ]
+            ),
+            weights,
+        ),
+        2,
+    )
+    return mean_error, (upper - lower) / 2.0
+
+
 def _classify_impacts(
     impacts: dict[ImpactKey, list[AssetImpactResult]],
     scenario: str,
@@ -281,6 +387,334 @@ def _build_chronic_arrays(
     return chronic_impacts_sorted
 
 
+class SeveritySampling(str, Enum):
+    """Sampling of the severities of events by aggregate_impacts."""
+
+    PSEUDO_RANDOM = "pseudo_random"
+    SOBOL = "sobol"
+    LATIN_HYPERCUBE = "latin_hypercube"
+    IMPORTANCE = "importance"
+
+
+class _PackedExceedanceCurves:
+    """Exceedance curves of a number of assets packed into flat arrays, so that all may be
+    sampled in a single call."""
+
+    def __init__(self, curves: list[ExceedanceCurve]):
+        self.offsets = np.zeros(len(curves) + 1, dtype=np.int64)
+        self.offsets[1:] = np.cumsum([len(c.probs) for c in curves])
+        # as ExceedanceCurve.get_samples
+        self.cum_probs = (
+            np.concatenate([1.0 - c.probs for c in curves])
+            if len(curves) > 0
+            else np.empty(0)
+        )
+        self.values = (
+            np.concatenate([c.values for c in curves])
+            if len(curves) > 0
+            else np.empty(0)
+        )
+        self.thresholds = np.array([1.0 - c.probs[0] for c in curves])
+
+    def get_samples(
+        self, uniforms: np.ndarray, zones: np.ndarray, curve_indices: np.ndarray
+    ) -> np.ndarray:
+        """Samples for each row, r, from curve curve_indices[r] using the uniforms of severity zone zones[r].
+        Equivalent to ExceedanceCurve.get_samples for each row.
+
+        Args:
+            uniforms (np.ndarray): Uniforms of shape (number of severity zones, number of events).
+            zones (np.ndarray): Severity zone for each row.
+            curve_indices (np.ndarray): Curve for each row.
+
+        Returns:
+            np.ndarray: Samples of shape (number of rows, number of events).
+        """
+        return _sample_exceedance_curves(
+            uniforms,
+            zones,
+            curve_indices,
+            self.offsets,
+            self.cum_probs,
+            self.values,
+            self.thresholds,
+        )
+
+
+@njit(cache=True, nogil=True)
+def _sample_exceedance_curves(
+    uniforms, zones, curve_indices, offsets, cum_probs, values, thresholds
+):
+    samples = np.zeros((len(zones), uniforms.shape[1]))
+    for r in range(len(zones)):
+        c = curve_indices[r]
+        first, last = offsets[c], offsets[c + 1] - 1
+        for e in range(uniforms.shape[1]):
+            u = np.float64(uniforms[zones[r], e])
+            if u <= thresholds[c]:
+                continue
+            if u >= cum_probs[last]:
+                samples[r, e] = values[last]
+                continue
+            # linear interpolation as np.interp: find j such that cum_probs[j] <= u < cum_probs[j + 1]
+            lower, upper = first, last
+            while upper - lower > 1:
+                mid = (lower + upper) // 2
+                if cum_probs[mid] <= u:
+                    lower = mid
+                else:
+                    upper = mid
+            slope = (values[upper] - values[lower]) / (
+                cum_probs[upper] - cum_probs[lower]
+            )
+            samples[r, e] = slope * (u - cum_probs[lower]) + values[lower]
+    return samples
+
+
+class _LossConverter:
+    """Converts sampled damage of a number of assets (rows) into restoration cost and revenue loss.
+    For the DefaultFinancialModel (but not its subclasses) this is done for all rows using array
+    operations; otherwise the financial model is called for each asset."""
+
+    def __init__(
+        self,
+        financial_model: FinancialModel,
+        assets: list[Asset],
+        asset_tiv: dict[Asset, float],
+        asset_revenue: dict[Asset, float],
+    ):
+        self.financial_model = financial_model
+        self.assets = assets
+        # exact type: a subclass may override the conversion
+        self.vectorised = type(financial_model) is DefaultFinancialModel
+        if type(financial_model) is not DefaultFinancialModel:
+            return
+        self.tiv = np.array([asset_tiv[asset] for asset in assets])[:, None]
+        self.revenue = np.array([asset_revenue[asset] for asset in assets])[:, None]
+        # downtime curves, with the rows to which each applies; other downtime models are applied by row
+        self.downtime_curves: dict[int, tuple[np.ndarray, np.ndarray, list[int]]] = {}
+        self.downtime_rows: list[tuple[int, Asset, Any]] = []
+        for row, asset in enumerate(assets):
+            downtime_model = (
+                financial_model.downtime_config.downtime_model_for_asset_of_type(
+                    type(asset)
+                )
+            )
+            if not downtime_model or len(downtime_model) != 1:
+                continue
+            if isinstance(downtime_model[0], ConfigBasedDowntimeModel):
+                curve = downtime_model[0].curve_for_asset(asset)
+                self.downtime_curves.setdefault(
+                    id(curve),
+                    (np.array(curve.points_x), np.array(curve.points_y), []),
+                )[2].append(row)
+            else:
+                self.downtime_rows.append((row, asset, downtime_model[0]))
+
+    def convert(self, impact: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        if not self.vectorised:
+            damage = np.empty_like(impact)
+            revenue_loss = np.empty_like(impact)
+            for row, asset in enumerate(self.assets):
+                damage[row, :], revenue_loss[row, :] = (
+                    self.financial_model.frac_damage_to_restoration_cost_and_revenue_loss(
+                        asset, impact[row, :], "EUR"
+                    )
+                )
+            return damage, revenue_loss
+        damage = self.tiv * impact
+        revenue_loss = np.zeros_like(impact)
+        for points_x, points_y, rows in self.downtime_curves.values():
+            revenue_loss[rows, :] = np.interp(impact[rows, :], points_x, points_y)
+        for row, asset, model in self.downtime_rows:
+            revenue_loss[row, :] = model.get_impact(asset, impact[row, :])
+        return damage, revenue_loss * self.revenue
+
+
+class _BatchSimulator:
+    """Structures shared by all event batches of the Monte Carlo simulation. A batch depends only
+    on its own generator, so that batches may be simulated in any order and on any thread."""
+
+    def __init__(
+        self,
+        inputs: _SimulationInputs,
+        financial_model: FinancialModel,
+        asset_tiv: dict[Asset, float],
+        asset_revenue: dict[Asset, float],
+        sampling: SeveritySampling = SeveritySampling.PSEUDO_RANDOM,
+        severity_zone_resolution: Optional[int] = None,
+        event_set: Optional["EventSet"] = None,
+    ):
+        self.inputs = inputs
+        assets_by_hazard = {
+            h: [inputs.all_acute_impacted_assets[i] for i in indices]
+            for h, indices in inputs.acute_impacted_asset_indices.items()
+        }
+        self.severity_provider: EventSeverityProvider
+        if event_set is not None:
+            self.severity_provider = EventSetSeverityProvider(
+                event_set, assets_by_hazard
+            )
+        elif severity_zone_resolution is not None:
+            self.severity_provider = H3EventSeverityProvider(
+                assets_by_hazard, severity_zone_resolution, sampling
+            )
+        else:
+            self.severity_provider = _SEVERITY_PROVIDERS[sampling](
+                {h: len(v) for h, v in assets_by_hazard.items()}
+            )
+        # rows of the (assets × events) arrays are the assets in inputs.all_assets_list
+        asset_row = {asset: i for i, asset in enumerate(inputs.all_assets_list)}
+        self.n_assets = len(inputs.all_assets_list)
+
+        # for each acute hazard, the severity zone, curve and asset row of each sampled row
+        self.curves: dict[type[Hazard], _PackedExceedanceCurves] = {}
+        self.sampled_rows: dict[
+            type[Hazard], tuple[np.ndarray, np.ndarray, np.ndarray]
+        ] = {}
+        self.converters: dict[type[Hazard], _LossConverter] = {}
+        # if an asset is sampled only once for a hazard, rows can be accumulated without np.add.at
+        self.unique_rows: dict[type[Hazard], bool] = {}
+        for hazard_type, impacts_ec in inputs.impacts_exceed_curves_sorted.items():
+            non_zero_indices = inputs.acute_impacted_asset_indices[hazard_type]
+            zones, curve_indices = self.severity_provider.severity_zone_asset_pairs(
+                hazard_type
+            )
+            assets = [
+                inputs.all_acute_impacted_assets[non_zero_indices[i]]
+                for i in curve_indices
+            ]
+            self.curves[hazard_type] = _PackedExceedanceCurves(
+                [ec for _, ec in impacts_ec]
+            )
+            self.sampled_rows[hazard_type] = (
+                zones,
+                curve_indices,
+                np.array([asset_row[asset] for asset in assets], dtype=np.int64),
+            )
+            self.unique_rows[hazard_type] = len(
+                np.unique(self.sampled_rows[hazard_type][2])
+            ) == len(assets)
+            self.converters[hazard_type] = _LossConverter(
+                financial_model, assets, asset_tiv, asset_revenue
+            )
+
+        self.caps = {
+            QuantityType.DAMAGE: np.array(
+                [asset_tiv[asset] for asset in inputs.all_assets_list]
+            )[:, None],
+            QuantityType.REVENUE_LOSS: np.array(
+                [asset_revenue[asset] for asset in inputs.all_assets_list]
+            )[:, None],
+        }
+
+    def simulate(
+        self, n_events: int, seed: np.random.SeedSequence, first_event: int = 0
+    ) -> tuple[
+        dict[RiskQuantityKey, np.ndarray],
+        dict[QuantityType, np.ndarray],
+        Optional[np.ndarray],
+    ]:
+        """Simulate a batch of events.
+
+        Args:
+            n_events (int): Number of events in the batch.
+            seed (np.random.SeedSequence): Seed of the batch.
+            first_event (int, optional): Index of the first event of the batch. Defaults to 0.
+
+        Returns:
+            tuple[dict[RiskQuantityKey, np.ndarray], dict[QuantityType, np.ndarray], Optional[np.ndarray]]: Impacts
+            of the events aggregated over assets for (hazard, quantity) combinations and, after applying the
+            per-asset caps, aggregated over assets and hazards for each quantity; the weights of the events, if
+            not equally likely.
+        """
+        generator = np.random.default_rng(seed)
+        by_hazard: dict[RiskQuantityKey, np.ndarray] = {}
+        weights: Optional[np.ndarray] = None
+        # aggregated impacts for batch of events for (asset, quantity) combinations
+        by_asset = {
+            qt: np.zeros((self.n_assets, n_events))
+            for qt in [QuantityType.DAMAGE, QuantityType.REVENUE_LOSS]
+        }
+
+        for (
+            hazard_type,
+            inv_severities,
+        ) in self.severity_provider.next_inv_severities_in_batch(
+            n_events, generator, first_event
+        ):
+            zones, curve_indices, rows = self.sampled_rows[hazard_type]
+            impact_samples = self.curves[hazard_type].get_samples(
+                1.0 - inv_severities, zones, curve_indices
+            )
+            damage, revenue_loss = self.converters[hazard_type].convert(impact_samples)
+            for val, qt in [
+                (damage, QuantityType.DAMAGE),
+                (revenue_loss, QuantityType.REVENUE_LOSS),
+            ]:
+                by_hazard[RiskQuantityKey(quantity=qt, hazard_type=hazard_type)] = (
+                    val.sum(axis=0)
+                )
+                if self.unique_rows[hazard_type]:
+                    by_asset[qt][rows, :] += val
+                else:
+                    np.add.at(by_asset[qt], rows, val)
+            hazard_weights = self.severity_provider.event_weights(
+                hazard_type, inv_severities
+            )
+            if hazard_weights is not None:
+                weights = (
+                    hazard_weights if weights is None else weights * hazard_weights
+                )
+
+        # chronic impacts applies to revenue loss:
+        for hazard_type in self.inputs.chronic_hazards_in_scope:
+            chronic_impacts = self.inputs.chronic_impacts_sorted[hazard_type]
+            key = RiskQuantityKey(
+                quantity=QuantityType.REVENUE_LOSS, hazard_type=hazard_type
+            )
+            by_hazard[key] = by_hazard.get(key, 0.0) + np.full(
+                n_events, chronic_impacts.sum()
+            )
+            by_asset[QuantityType.REVENUE_LOSS] += chronic_impacts[:, None]
+
+        # cap per-asset totals (aggregated over hazards) at TIV / revenue
+        totals = {
+            qt: np.minimum(by_asset[qt], cap).sum(axis=0)
+            for qt, cap in self.caps.items()
+        }
+        return by_hazard, totals, weights
+
+
+def _ordered_batches(
+    task, max_events: int, event_batch_sz: int, seed: int, max_workers: Optional[int]
+) -> Generator[Any, None, None]:
+    """Run task(batch_sz, seed, first_event) for successive batches of events, on max_workers threads, yielding the results
+    in batch order. Each batch has its own seed, spawned from seed, so that the results do not depend on the
+    number of threads. Batches are submitted ahead of the results being consumed; those still pending are
+    cancelled if the consumer stops early."""
+    seed_sequence = np.random.SeedSequence(seed)
+    n_workers = max_workers or 1
+    n_submitted = n_done = 0
+    with ThreadPoolExecutor(max_workers=n_workers) as executor:
+        pending: deque[Future] = deque()
+        try:
+            while n_done < max_events:
+                while n_submitted < max_events and len(pending) < n_workers:
+                    batch_sz = min(event_batch_sz, max_events - n_submitted)
+                    pending.append(
+                        executor.submit(
+                            task, batch_sz, seed_sequence.spawn(1)[0], n_submitted
+                        )
+                    )
+                    n_submitted += batch_sz
+                n_done += min(event_batch_sz, max_events - n_done)
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
 def _run_simulation(
     inputs: _SimulationInputs,
     financial_model: FinancialModel,
@@ -288,111 +722,418 @@ def _run_simulation(
     asset_revenue: dict[Asset, float],
     n_events: int = 50000,
     event_batch_sz: int = 1000,
-) -> dict[RiskQuantityKey, np.ndarray]:
-    """Run Monte Carlo simulation; return per-event impact arrays keyed by RiskQuantityKey."""
+    seed: int = 111,
+    max_workers: Optional[int] = None,
+    convergence: Optional[ConvergenceCriteria] = None,
+    sampling: SeveritySampling = SeveritySampling.PSEUDO_RANDOM,
+    severity_zone_resolution: Optional[int] = None,
+    event_set: Optional["EventSet"] = None,
+) -> tuple[dict[RiskQuantityKey, np.ndarray], Optional[np.ndarray]]:
+    """Run Monte Carlo simulation; return per-event impact arrays keyed by RiskQuantityKey and, if the events
+    are not equally likely (importance sampling), the per-event weights.
+    For each batch of events, the impacts of all assets impacted by a hazard are sampled together
+    and accumulated in (assets × events) arrays, before applying the per-asset caps.
+    Each batch has its own generator, spawned from the seed, so that the result for a given seed
+    is the same whether batches are run serially or by max_workers threads.
+    If convergence criteria are given, n_events is ignored: batches are run until the criteria are met,
+    checked in batch order so that the number of events also does not depend on max_workers.
+    If an event set is given, the severities are read from it rather than sampled and n_events is that of
+    the event set.
+    """
     quantity_types = [
         QuantityType.DAMAGE,
         QuantityType.REVENUE_LOSS,
         QuantityType.COSTS_INCREASE,
     ]
-
-    severity_provider = UncorrelatedEventSeverityProvider(
-        {h: len(v) for h, v in inputs.acute_impacted_asset_indices.items()}
+    simulator = _BatchSimulator(
+        inputs,
+        financial_model,
+        asset_tiv,
+        asset_revenue,
+        sampling,
+        severity_zone_resolution,
+        event_set,
     )
-    generator = np.random.default_rng(seed=111)
 
-    by_asset_batch_agg = Aggregator(key_provider=ByAssetAggregationKeys())
-    by_hazard_agg = Aggregator(
-        key_provider=HazardQuantityAggregationKeys(), size=(n_events,)
-    )
-    all_impacts: dict[QuantityType, np.ndarray] = {
-        qt: np.zeros(shape=(n_events)) for qt in quantity_types
+    if event_set is not None:
+        max_events = event_set.n_events
+    else:
+        max_events = n_events if convergence is None else convergence.max_events
+
+    # aggregated impacts of each batch for (hazard, quantity) combinations - not asset, important to reduce memory use
+    by_hazard_batches: list[dict[RiskQuantityKey, np.ndarray]] = []
+    all_impacts_batches: dict[QuantityType, list[np.ndarray]] = {
+        qt: [] for qt in quantity_types
     }
+    weights_batches: list[np.ndarray] = []
 
     logger.info(
-        f"Starting to aggregate impacts for {n_events} events, in batches of {event_batch_sz}, "
-        f"for {len(inputs.all_acute_impacted_assets)} assets."
+        f"Starting to aggregate impacts for {'up to ' if convergence else ''}{max_events} events, "
+        f"in batches of {event_batch_sz}, for {len(inputs.all_acute_impacted_assets)} assets."
     )
 
-    for event_start in range(0, n_events, event_batch_sz):
-        by_asset_batch_agg.zero()
-        event_end = min(event_start + event_batch_sz, n_events)
+    n_done = 0
+    next_check = 0 if convergence is None else convergence.min_events
+    for batch_by_hazard, batch_totals, batch_weights in _ordered_batches(
+        simulator.simulate, max_events, event_batch_sz, seed, max_workers
+    ):
+        batch_sz = len(batch_totals[QuantityType.DAMAGE])
+        by_hazard_batches.append(batch_by_hazard)
+        if batch_weights is not None:
+            weights_batches.append(batch_weights)
+        for qt in quantity_types:
+            all_impacts_batches[qt].append(batch_totals.get(qt, np.zeros(batch_sz)))
+        n_done += batch_sz
+        if (len(by_hazard_batches) % 20) == 0:
+            logger.info(f"Processed {n_done} events out of {max_events}.")
+        if convergence is not None and n_done >= next_check:
+            weights = np.concatenate(weights_batches) if weights_batches else None
+            if all(
+                convergence.converged(np.concatenate(all_impacts_batches[qt]), weights)
+                for qt in [QuantityType.DAMAGE, QuantityType.REVENUE_LOSS]
+            ):
+                logger.info(f"Converged after {n_done} events.")
+                break
+            # check at intervals of 10% of the events so far
+            next_check = int(n_done * 1.1)
+
+    by_hazard: dict[RiskQuantityKey, np.ndarray] = {}
+    for key in dict.fromkeys(k for batch in by_hazard_batches for k in batch):
+        by_hazard[key] = np.concatenate(
+            [
+                batch.get(key, np.zeros(len(totals)))
+                for batch, totals in zip(
+                    by_hazard_batches, all_impacts_batches[QuantityType.DAMAGE]
+                )
+            ]
+        )
+    all_impacts = {qt: np.concatenate(v) for qt, v in all_impacts_batches.items()}
 
-        for (
-            hazard_type,
-            inv_severities,
-        ) in severity_provider.next_inv_severities_in_batch(
-            event_end - event_start, generator
-        ):
-            impacts_ec = inputs.impacts_exceed_curves_sorted[hazard_type]
-            non_zero_indices = inputs.acute_impacted_asset_indices[hazard_type]
-            sz_to_assets = severity_provider.severity_zone_to_asset_indices(hazard_type)
-            for sz_idx in range(inv_severities.shape[0]):
-                for asset_idx in sz_to_assets[sz_idx]:
-                    _, exceed_curve = impacts_ec[asset_idx]
-                    impact_samples = exceed_curve.get_samples(
-                        1.0 - inv_severities[sz_idx, :]
-                    )
-                    asset = inputs.all_acute_impacted_assets[
-                        non_zero_indices[asset_idx]
-                    ]
-                    damage, revenue_loss = (
-                        financial_model.frac_damage_to_restoration_cost_and_revenue_loss(
-                            asset, impact_samples, "EUR"
-                        )
-                    )
-                    for val, qt in [
-                        (damage, QuantityType.DAMAGE),
-                        (revenue_loss, QuantityType.REVENUE_LOSS),
-                    ]:
-                        # aggregated impacts for all events for (hazard, quantity) combinations - not asset, important to reduce memory use
-                        by_hazard_agg.aggregate(
-                            asset,
-                            hazard_type,
-                            qt,
-                            val,
-                            slice=(slice(event_start, event_end),),
-                        )
-                        # aggregated impacts for batch of events for (asset, quantity) combinations - more combinations, but only for the batch
-                        by_asset_batch_agg.aggregate(asset, hazard_type, qt, val)
+    # return both by hazard and
+    all_results = by_hazard
+    for qt in quantity_types:
+        all_results[RiskQuantityKey(quantity=qt)] = all_impacts[qt]
+    return all_results, np.concatenate(weights_batches) if weights_batches else None
 
-        # chronic impacts applies to revenue loss:
-        for hazard_type in inputs.chronic_hazards_in_scope:
-            chronic_impacts = inputs.chronic_impacts_sorted[hazard_type]
-            for idx, asset in enumerate(inputs.all_assets_list):
-                by_hazard_agg.aggregate(
-                    asset,
-                    hazard_type,
-                    QuantityType.REVENUE_LOSS,
-                    chronic_impacts[idx],
-                    slice=(slice(event_start, event_end),),
-                )
-                by_asset_batch_agg.aggregate(
-                    asset, hazard_type, QuantityType.REVENUE_LOSS, chronic_impacts[idx]
-                )
 
-        # cap per-asset totals (aggregated over hazards) at TIV / revenue
-        for qt, cap in [
-            (QuantityType.DAMAGE, asset_tiv),
-            (QuantityType.REVENUE_LOSS, asset_revenue),
-            (QuantityType.COSTS_INCREASE, asset_revenue),
+def _run_streaming_simulation(
+    inputs: _SimulationInputs,
+    financial_model: FinancialModel,
+    asset_tiv: dict[Asset, float],
+    asset_revenue: dict[Asset, float],
+    n_events: int = 50000,
+    event_batch_sz: int = 1000,
+    seed: int = 111,
+    max_workers: Optional[int] = None,
+    convergence: Optional[ConvergenceCriteria] = None,
+    sampling: SeveritySampling = SeveritySampling.PSEUDO_RANDOM,
+    severity_zone_resolution: Optional[int] = None,
+    event_set: Optional["EventSet"] = None,
+    compression: float = 1000.0,
+) -> dict[RiskQuantityKey, QuantileSketch]:
+    """As _run_simulation, but rather than keeping the per-event impacts, each batch of events is summarised
+    by a QuantileSketch for each RiskQuantityKey, on the thread simulating the batch. Sketches are merged in
+    batch order, so that memory use does not depend on the number of events and the result for a given seed
+    does not depend on max_workers.
+    """
+    simulator = _BatchSimulator(
+        inputs,
+        financial_model,
+        asset_tiv,
+        asset_revenue,
+        sampling,
+        severity_zone_resolution,
+        event_set,
+    )
+
+    def sketch_batch(
+        batch_sz: int, batch_seed: np.random.SeedSequence, first_event: int
+    ):
+        by_hazard, totals, weights = simulator.simulate(
+            batch_sz, batch_seed, first_event
+        )
+        for qt in [
+            QuantityType.DAMAGE,
+            QuantityType.REVENUE_LOSS,
+            QuantityType.COSTS_INCREASE,
         ]:
-            for asset in inputs.all_assets:
-                all_impacts[qt][event_start:event_end] += np.minimum(
-                    by_asset_batch_agg.aggregation_pools.get(
-                        RiskQuantityKey(quantity=qt, asset=asset), np.array(0.0)
-                    ),
-                    cap[asset],
-                )
+            by_hazard[RiskQuantityKey(quantity=qt)] = totals.get(qt, np.zeros(batch_sz))
+        return {
+            k: QuantileSketch.from_values(v, weights, compression)
+            for k, v in by_hazard.items()
+        }
+
+    if event_set is not None:
+        max_events = event_set.n_events
+    else:
+        max_events = n_events if convergence is None else convergence.max_events
+    logger.info(
+        f"Starting to aggregate impacts for {'up to ' if convergence else ''}{max_events} events, "
+        f"in batches of {event_batch_sz}, for {len(inputs.all_acute_impacted_assets)} assets, "
+        "summarising batches by quantile sketches."
+    )
+    # every batch has the same (hazard, quantity) keys: those of the hazards in the inputs
+    sketches: dict[RiskQuantityKey, QuantileSketch] = {}
+    next_check = 0 if convergence is None else convergence.min_events
+    for n_batches, batch_sketches in enumerate(
+        _ordered_batches(sketch_batch, max_events, event_batch_sz, seed, max_workers),
+        start=1,
+    ):
+        for k, batch_sketch in batch_sketches.items():
+            sketches.setdefault(k, QuantileSketch(compression)).merge(batch_sketch)
+        n_done = sketches[RiskQuantityKey(quantity=QuantityType.DAMAGE)].count
+        if (n_batches % 20) == 0:
+            logger.info(f"Processed {n_done} events out of {max_events}.")
+        if convergence is not None and n_done >= next_check:
+            if all(
+                convergence.converged_sketch(sketches[RiskQuantityKey(quantity=qt)])
+                for qt in [QuantityType.DAMAGE, QuantityType.REVENUE_LOSS]
+            ):
+                logger.info(f"Converged after {n_done} events.")
+                break
+            next_check = int(n_done * 1.1)
+    # totals after the (hazard, quantity) keys, as for _run_simulation
+    return {
+        **{k: v for k, v in sketches.items() if k.hazard_type is not None},
+        **{k: v for k, v in sketches.items() if k.hazard_type is None},
+    }
 
-        if (event_end // event_batch_sz) % 20 == 0:
-            logger.info(f"Processed {event_end} events out of {n_events}.")
 
-    # return both by hazard and
-    all_results = by_hazard_agg.aggregation_pools
-    for qt in quantity_types:
-        all_results[RiskQuantityKey(quantity=qt)] = all_impacts[qt]
-    return all_results
+class AggregationMethod(str, Enum):
+    """Method used by aggregate_impacts to aggregate impacts over assets and hazards."""
+
+    MONTE_CARLO = "monte_carlo"
+    # exact up to discretisation, but only when assets and hazards are uncorrelated
+    CONVOLUTION = "convolution"
+
+
+def _disperse(values: np.ndarray, probs: np.ndarray, step: float) -> np.ndarray:
+    """Discretises point masses with non-negative values onto the grid 0, step, 2 step, ...
+    Each mass is split between its two neighbouring grid points such that the mean is preserved.
+    """
+    x = values.ravel() / step
+    lower = np.floor(x).astype(np.int64)
+    weight = x - lower
+    p = probs.ravel()
+    return np.bincount(
+        np.concatenate([lower, lower + 1]),
+        weights=np.concatenate([p * (1.0 - weight), p * weight]),
+    )
+
+
+def _convolve_distributions(distribs: list[np.ndarray], n: int) -> np.ndarray:
+    """Distribution of the sum of independent losses, each given as probabilities on the same grid,
+    calculated as the product of the discrete Fourier transforms. The sum is given on at least n grid
+    points; any probability beyond these wraps around.
+    """
+    n_fft = scipy.fft.next_fast_len(
+        max([n] + [len(distrib) for distrib in distribs]), real=True
+    )
+    spectrum = np.ones(n_fft // 2 + 1, dtype=np.complex128)
+    chunk_sz = 256
+    for start in range(0, len(distribs), chunk_sz):
+        chunk = distribs[start : start + chunk_sz]
+        block = np.zeros((len(chunk), n_fft))
+        for i, distrib in enumerate(chunk):
+            block[i, : len(distrib)] = distrib
+        spectrum *= np.prod(scipy.fft.rfft(block, axis=1), axis=0)
+    return np.maximum(scipy.fft.irfft(spectrum, n_fft), 0.0)
+
+
+def _grid_for_sum(
+    means: np.ndarray, variances: np.ndarray, maxima: np.ndarray, n_grid_points: int
+) -> tuple[float, int]:
+    """Grid step and number of grid points for the sum of independent, non-negative losses.
+    The grid extends to the largest possible sum or, if smaller, to a level that the sum exceeds with probability
+    below 1e-12, from Bernstein's inequality.
+    """
+    total_max = float(np.sum(maxima))
+    if total_max <= 0.0:
+        return 1.0, 1
+    log_inv_tol = np.log(1e12)
+    b = 2.0 * log_inv_tol * float(np.max(maxima)) / 3.0
+    tail = (b + np.sqrt(b**2 + 8.0 * log_inv_tol * float(np.sum(variances)))) / 2.0
+    upper = float(np.sum(means)) + tail
+    if upper < total_max:
+        return upper / (n_grid_points - 1), n_grid_points
+    step = total_max / (n_grid_points - 1)
+    # the discretised losses may extend one grid point beyond the maxima
+    return step, int(np.sum(np.floor(maxima / step) + 1)) + 1
+
+
+def _quantity_from_distribution(
+    values: np.ndarray, probs: np.ndarray, normalisation: float
+) -> Quantity:
+    """Summarise a discrete distribution of losses as the summary statistics of _summarise_results."""
+    values = values / normalisation
+    probs = probs / np.sum(probs)
+    mean = float(np.sum(values * probs))
+    cdf = np.cumsum(probs)
+    quantiles = 1.0 - 1.0 / _DRILLDOWN_RETURN_PERIODS
+    indices = np.minimum(np.searchsorted(cdf, quantiles), len(values) - 1)
+    above = values > mean
+    weight_above = np.sum(probs[above])
+    semi_var = (
+        np.sum(np.square(values[above] - mean) * probs[above]) / weight_above
+        if weight_above > 0.0
+        else 0.0
+    )
+    return Quantity(
+        values=None,
+        exceedance_curve=ExceedanceCurve(_DRILLDOWN_EXCEEDANCE_PROBS, values[indices]),
+        mean=mean,
+        semi_standard_deviation=float(np.sqrt(semi_var)),
+    )
+
+
+def _run_convolution(
+    inputs: _SimulationInputs,
+    financial_model: FinancialModel,
+    asset_tiv: dict[Asset, float],
+    asset_revenue: dict[Asset, float],
+    n_grid_points: int = 16384,
+    n_bin_points: int = 32,
+) -> dict[RiskQuantityKey, Quantity]:
+    """Aggregate impacts analytically, as an alternative to _run_simulation followed by _summarise_results,
+    for the case that the impacts of all assets and hazards are independent.
+    The impact distribution of each asset is represented by n_bin_points points per impact bin, converted into
+    losses by the financial model. For each pool, the losses are discretised onto a common grid and the
+    distribution of the sum obtained by FFT-based convolution. For the totals over hazards, the losses of
+    each asset are first combined over hazards and capped, as in _run_simulation.
+    """
+    row_offsets = (np.arange(n_bin_points) + 0.5) / n_bin_points
+    # for each acute hazard: rows in inputs.all_assets_list, then damage, revenue loss and probabilities
+    # of the points of each asset
+    points: dict[
+        type[Hazard], tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]
+    ] = {}
+    asset_row = {asset: i for i, asset in enumerate(inputs.all_assets_list)}
+    for hazard_type, impacts_ec in inputs.impacts_exceed_curves_sorted.items():
+        assets = [
+            inputs.all_acute_impacted_assets[i]
+            for i in inputs.acute_impacted_asset_indices[hazard_type]
+        ]
+        n_points = (
+            max(len(impact_distrib.probabilities) for impact_distrib, _ in impacts_ec)
+            * n_bin_points
+            + 1
+        )
+        fracs = np.zeros((len(assets), n_points))
+        probs = np.zeros((len(assets), n_points))
+        for row, (impact_distrib, _) in enumerate(impacts_ec):
+            edges, bin_probs = (
+                impact_distrib.impact_bin_edges,
+                impact_distrib.probabilities,
+            )
+            n = len(bin_probs) * n_bin_points
+            fracs[row, 1 : n + 1] = (
+                edges[:-1, None] + (edges[1:] - edges[:-1])[:, None] * row_offsets
+            ).ravel()
+            probs[row, 1 : n + 1] = np.repeat(bin_probs / n_bin_points, n_bin_points)
+            probs[row, 0] = max(1.0 - np.sum(bin_probs), 0.0)
+        damage, revenue_loss = _LossConverter(
+            financial_model, assets, asset_tiv, asset_revenue
+        ).convert(fracs)
+        points[hazard_type] = (
+            np.array([asset_row[asset] for asset in assets], dtype=np.int64),
+            damage,
+            revenue_loss,
+            probs,
+        )
+
+    n_assets = len(inputs.all_assets_list)
+    chronic = sum(
+        (inputs.chronic_impacts_sorted[h] for h in inputs.chronic_hazards_in_scope),
+        np.zeros(n_assets),
+    )
+    quantities = {
+        QuantityType.DAMAGE: (
+            1,
+            np.zeros(n_assets),
+            np.array([asset_tiv[asset] for asset in inputs.all_assets_list]),
+            sum(asset_tiv.values()),
+        ),
+        QuantityType.REVENUE_LOSS: (
+            2,
+            chronic,
+            np.array([asset_revenue[asset] for asset in inputs.all_assets_list]),
+            sum(asset_revenue.values()),
+        ),
+    }
+
+    def moments(
+        values: np.ndarray, probs: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        means = np.sum(values * probs, axis=1)
+        variances = np.sum(np.square(values - means[:, None]) * probs, axis=1)
+        return means, variances, np.max(values, axis=1)
+
+    results: dict[RiskQuantityKey, Quantity] = {}
+    for hazard_type, hazard_points in points.items():
+        probs = hazard_points[3]
+        for qt, (index, _, _, normalisation) in quantities.items():
+            values = hazard_points[index]
+            step, n = _grid_for_sum(*moments(values, probs), n_grid_points)
+            distrib = _convolve_distributions(
+                [_disperse(v, p, step) for v, p in zip(values, probs)], n
+            )
+            results[RiskQuantityKey(quantity=qt, hazard_type=hazard_type)] = (
+                _quantity_from_distribution(
+                    step * np.arange(len(distrib)), distrib, normalisation
+                )
+            )
+    for hazard_type in inputs.chronic_hazards_in_scope:
+        results[
+            RiskQuantityKey(quantity=QuantityType.REVENUE_LOSS, hazard_type=hazard_type)
+        ] = _quantity_from_distribution(
+            np.array([inputs.chronic_impacts_sorted[hazard_type].sum()]),
+            np.ones(1),
+            quantities[QuantityType.REVENUE_LOSS][3],
+        )
+
+    # the capped total of an asset is offset + min(acute loss, cap - offset)
+    for qt, (index, offsets, caps, normalisation) in quantities.items():
+        means, variances, maxima = (np.zeros(n_assets) for _ in range(3))
+        asset_points: list[list[tuple[np.ndarray, np.ndarray]]] = [
+            [] for _ in range(n_assets)
+        ]
+        for hazard_points in points.values():
+            rows, values, probs = (
+                hazard_points[0],
+                hazard_points[index],
+                hazard_points[3],
+            )
+            hazard_means, hazard_variances, hazard_maxima = moments(values, probs)
+            np.add.at(means, rows, hazard_means)
+            np.add.at(variances, rows, hazard_variances)
+            np.add.at(maxima, rows, hazard_maxima)
+            for row, v, p in zip(rows, values, probs):
+                asset_points[row].append((v, p))
+        acute_caps = np.maximum(caps - offsets, 0.0)
+        offset = float(np.sum(np.minimum(offsets, caps)))
+        step, n = _grid_for_sum(
+            means, variances, np.minimum(maxima, acute_caps), n_grid_points
+        )
+        distribs: list[np.ndarray] = []
+        for row in np.flatnonzero(maxima > 0.0).tolist():
+            distrib = np.ones(1)
+            for v, p in asset_points[row]:
+                distrib = np.convolve(distrib, _disperse(v, p, step))
+            if (len(distrib) - 1) * step > acute_caps[row]:
+                distrib = _disperse(
+                    np.minimum(step * np.arange(len(distrib)), acute_caps[row]),
+                    distrib,
+                    step,
+                )
+            distribs.append(distrib)
+        distrib = _convolve_distributions(distribs, n)
+        results[RiskQuantityKey(quantity=qt)] = _quantity_from_distribution(
+            offset + step * np.arange(len(distrib)), distrib, normalisation
+        )
+    results[RiskQuantityKey(quantity=QuantityType.COSTS_INCREASE)] = (
+        _quantity_from_distribution(np.zeros(1), np.ones(1), 1.0)
+    )
+    return results
 
 
 # Return-period probabilities used by _asset_level_drilldown (shared constant).
@@ -538,8 +1279,10 @@ def _summarise_results(
     all_results: dict[RiskQuantityKey, np.ndarray],
     asset_tiv: dict[Asset, float],
     asset_revenue: dict[Asset, float],
+    weights: Optional[np.ndarray] = None,
 ) -> dict[RiskQuantityKey, Quantity]:
-    """Normalise per-event arrays by portfolio totals and build exceedance-curve summaries."""
+    """Normalise per-event arrays by portfolio totals and build exceedance-curve summaries.
+    If given, the statistics are of the events weighted by weights."""
     sum_asset_tiv = sum(asset_tiv.values())
     sum_asset_revenue = sum(asset_revenue.values())
     for k, v in all_results.items():
@@ -552,14 +1295,62 @@ def _summarise_results(
     quantiles = 1.0 - 1.0 / return_periods
     summary_stats: dict[RiskQuantityKey, Quantity] = {}
     for k, v in all_results.items():
-        exceed = ExceedanceCurve(1.0 / return_periods, np.quantile(v, quantiles))
-        mean = np.mean(v)
-        semi_std = np.sqrt(np.mean(np.square(v[v > mean] - mean)))
+        exceed = ExceedanceCurve(
+            1.0 / return_periods, weighted_quantile(v, quantiles, weights)
+        )
+        if weights is None:
+            mean = np.mean(v)
+            semi_std = np.sqrt(np.mean(np.square(v[v > mean] - mean)))
+        else:
+            mean = np.average(v, weights=weights)
+            above = v > mean
+            semi_std = (
+                np.sqrt(np.average(np.square(v[above] - mean), weights=weights[above]))
+                if np.any(above)
+                else np.nan
+            )
+        mean_error, quantile_errors = _standard_errors(v, quantiles, weights)
         summary_stats[k] = Quantity(
             values=v if k.hazard_type is None else None,
             exceedance_curve=exceed,
             mean=mean,
             semi_standard_deviation=semi_std,
+            mean_standard_error=mean_error,
+            exceedance_standard_error=quantile_errors,
+            weights=weights if k.hazard_type is None else None,
+        )
+    return summary_stats
+
+
+def _summarise_sketches(
+    sketches: dict[RiskQuantityKey, QuantileSketch],
+    asset_tiv: dict[Asset, float],
+    asset_revenue: dict[Asset, float],
+) -> dict[RiskQuantityKey, Quantity]:
+    """As _summarise_results, but from quantile sketches of the events; the quantities have no per-event
+    values."""
+    sum_asset_tiv = sum(asset_tiv.values())
+    sum_asset_revenue = sum(asset_revenue.values())
+    return_periods = np.array([10.0, 20.0, 50.0, 100.0, 200.0, 500.0, 1000.0])
+    quantiles = 1.0 - 1.0 / return_periods
+    summary_stats: dict[RiskQuantityKey, Quantity] = {}
+    for k, sketch in sketches.items():
+        if k.quantity == QuantityType.DAMAGE:
+            scale = 1.0 / sum_asset_tiv
+        elif k.quantity == QuantityType.REVENUE_LOSS:
+            scale = 1.0 / sum_asset_revenue
+        else:
+            scale = 1.0
+        summary_stats[k] = Quantity(
+            values=None,
+            exceedance_curve=ExceedanceCurve(
+                1.0 / return_periods, sketch.quantile(quantiles) * scale
+            ),
+            mean=sketch.mean * scale,
+            semi_standard_deviation=sketch.semi_standard_deviation() * scale,
+            mean_standard_error=sketch.mean_standard_error() * scale,
+            exceedance_standard_error=sketch.quantile_standard_errors(quantiles)
+            * scale,
         )
     return summary_stats
 
@@ -571,6 +1362,14 @@ def aggregate_impacts(
     key_year: Optional[int],
     n_events: int = 50000,
     event_batch_sz: int = 1000,
+    seed: int = 111,
+    max_workers: Optional[int] = None,
+    method: AggregationMethod = AggregationMethod.MONTE_CARLO,
+    convergence: Optional[ConvergenceCriteria] = None,
+    sampling: SeveritySampling = SeveritySampling.PSEUDO_RANDOM,
+    streaming: bool = False,
+    severity_zone_resolution: Optional[int] = None,
+    event_set: Optional["EventSet"] = None,
 ) -> dict[RiskQuantityKey, Quantity]:
     """Aggregate impacts over assets and hazards for a given scenario and year.
     For acute hazards, i.e. hazards associated with an event, a Monte Carlo approach is used whereby a large number of
@@ -601,7 +1400,42 @@ def aggregate_impacts(
     Args:
         impacts (Dict[ImpactKey, AssetImpactResult]): Impact results for each asset and hazard type.
         financial_model (FinancialModel): Financial model to convert impacts to financial losses.
+        seed (int, optional): Seed of the Monte Carlo simulation. Defaults to 111.
+        max_workers (Optional[int], optional): Number of threads over which batches of events are distributed.
+            Results for a given seed do not depend on the number of threads. Defaults to None (single thread).
+        method (AggregationMethod, optional): If AggregationMethod.CONVOLUTION, the portfolio-level quantities are
+            instead calculated by convolution of the loss distributions of the assets, which is exact up to
+            discretisation for uncorrelated assets and hazards; the quantities then have no per-event values.
+            Defaults to AggregationMethod.MONTE_CARLO.
+        convergence (Optional[ConvergenceCriteria], optional): If given, instead of simulating n_events, batches of
+            events are simulated until the criteria are met. The standard errors achieved are reported in the
+            mean_standard_error and exceedance_standard_error of the returned quantities. Defaults to None.
+        sampling (SeveritySampling, optional): Sampling of the severities of events: pseudo-random, quasi-random
+            (scrambled Sobol), stratified (Latin hypercube) or importance sampling of rare severities, in which case
+            the returned quantities carry the weights of the events. Defaults to SeveritySampling.PSEUDO_RANDOM.
+        streaming (bool, optional): If True, rather than keeping the impacts of every event, each batch of events
+            is summarised by mergeable quantile sketches and running moments, so that memory use does not depend
+            on the number of events. Means and their standard errors are unchanged; exceedance curves are
+            approximate (typically within 1-2%) and the quantities have no per-event values. Defaults to False.
+        severity_zone_resolution (Optional[int], optional): If given, the severity zones are the H3 cells at this
+            resolution containing the assets, so that the severities of assets within a cell are fully correlated
+            (see H3EventSeverityProvider). Not supported by AggregationMethod.CONVOLUTION. Defaults to None (each
+            asset is its own severity zone).
+        event_set (Optional[EventSet], optional): If given, the severities of the events are read from the event
+            set, which may be memory-mapped and is read a batch at a time, rather than sampled; n_events is then
+            the number of events of the event set. Not supported with convergence, sampling other than
+            SeveritySampling.PSEUDO_RANDOM, severity_zone_resolution or AggregationMethod.CONVOLUTION.
+            Defaults to None.
     """
+    if event_set is not None and (
+        method != AggregationMethod.MONTE_CARLO
+        or convergence is not None
+        or sampling != SeveritySampling.PSEUDO_RANDOM
+        or severity_zone_resolution is not None
+    ):
+        raise ValueError(
+            "event_set requires Monte Carlo aggregation without convergence, sampling or severity_zone_resolution."
+        )
     # acute_impacted_assets: just those assets with non-zero acute impact for a given hazard type
     (
         all_assets,
@@ -651,15 +1485,48 @@ def aggregate_impacts(
         )
         for asset in all_assets
     }
-    all_results = _run_simulation(
-        sim_inputs,
-        financial_model,
-        asset_tiv,
-        asset_revenue,
-        n_events=n_events,
-        event_batch_sz=event_batch_sz,
-    )
-    portfolio_results = _summarise_results(all_results, asset_tiv, asset_revenue)
+    if method == AggregationMethod.CONVOLUTION:
+        if severity_zone_resolution is not None:
+            raise ValueError(
+                "convolution requires uncorrelated impacts: severity_zone_resolution must be None."
+            )
+        portfolio_results = _run_convolution(
+            sim_inputs, financial_model, asset_tiv, asset_revenue
+        )
+    elif streaming:
+        sketches = _run_streaming_simulation(
+            sim_inputs,
+            financial_model,
+            asset_tiv,
+            asset_revenue,
+            n_events=n_events,
+            event_batch_sz=event_batch_sz,
+            seed=seed,
+            max_workers=max_workers,
+            convergence=convergence,
+            sampling=sampling,
+            severity_zone_resolution=severity_zone_resolution,
+            event_set=event_set,
+        )
+        portfolio_results = _summarise_sketches(sketches, asset_tiv, asset_revenue)
+    else:
+        all_results, weights = _run_simulation(
+            sim_inputs,
+            financial_model,
+            asset_tiv,
+            asset_revenue,
+            n_events=n_events,
+            event_batch_sz=event_batch_sz,
+            seed=seed,
+            max_workers=max_workers,
+            convergence=convergence,
+            sampling=sampling,
+            severity_zone_resolution=severity_zone_resolution,
+            event_set=event_set,
+        )
+        portfolio_results = _summarise_results(
+            all_results, asset_tiv, asset_revenue, weights
+        )
     asset_results = _asset_level_drilldown(
         sim_inputs, financial_model, asset_tiv, asset_revenue
     )
@@ -669,13 +1536,15 @@ def aggregate_impacts(
 
 class EventSeverityProvider(Protocol):
     def next_inv_severities_in_batch(
-        self, n_events: int, generator: np.random.Generator
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
     ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
         """Returns a generator that gives the inverse severities for each hazard type.
 
         Args:
             n_events (int): Number of events in the batch.
             generator (np.random.Generator): Random number generator.
+            first_event (int, optional): Index of the first event of the batch, used by providers that read
+                the severities of an event set rather than sampling them. Defaults to 0.
 
         Yields:
             Generator[tuple[type[Hazard], np.ndarray], None, None]: The severities for each hazard type.
@@ -688,6 +1557,28 @@ class EventSeverityProvider(Protocol):
         """Returns a mapping from severity zone index to asset indices for a given hazard type."""
         ...
 
+    def severity_zone_asset_pairs(
+        self, hazard_type: type[Hazard]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Returns the (severity zone index, asset index) pairs for a given hazard type as two arrays, so that
+        the severities of the assets are gathered from those of the zones by a single index operation."""
+        zone_to_assets = self.severity_zone_to_asset_indices(hazard_type)
+        zones = np.repeat(
+            np.arange(len(zone_to_assets), dtype=np.int64),
+            [len(indices) for indices in zone_to_assets],
+        )
+        asset_indices = np.array(
+            [i for indices in zone_to_assets for i in indices], dtype=np.int64
+        )
+        return zones, asset_indices
+
+    def event_weights(
+        self, hazard_type: type[Hazard], inv_severities: np.ndarray
+    ) -> Optional[np.ndarray]:
+        """Returns the weights of the events given the inverse severities for a hazard type, if the events are not
+        equally likely (e.g. importance sampling); None otherwise."""
+        return None
+
 
 class UncorrelatedEventSeverityProvider(EventSeverityProvider):
     def __init__(self, n_non_zero_assets_by_hazard: dict[type[Hazard], int]):
@@ -698,7 +1589,7 @@ class UncorrelatedEventSeverityProvider(EventSeverityProvider):
         }
 
     def next_inv_severities_in_batch(
-        self, n_events: int, generator: np.random.Generator
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
     ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
         for hazard_type in self.n_severity_zones_by_hazard.keys():
             randoms = generator.random(
@@ -713,6 +1604,189 @@ class UncorrelatedEventSeverityProvider(EventSeverityProvider):
         """Here there is one asset per severity zone for every hazard type."""
         return self.severity_zone_to_asset_indices_by_hazard[hazard_type]
 
+    def severity_zone_asset_pairs(
+        self, hazard_type: type[Hazard]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        indices = np.arange(
+            self.n_severity_zones_by_hazard[hazard_type], dtype=np.int64
+        )
+        return indices, indices
+
+
+class SobolEventSeverityProvider(UncorrelatedEventSeverityProvider):
+    """Uncorrelated severities where, for each hazard type, the inverse severities of a batch of events are
+    a scrambled Sobol sequence with one dimension per severity zone, rather than pseudo-random.
+    Hazard types with more severity zones than the Sobol sequence supports (qmc.Sobol.MAXDIM) use Latin
+    hypercube sampling instead; severity_zone_resolution can be used to reduce the number of zones.
+    """
+
+    def __init__(self, n_non_zero_assets_by_hazard: dict[type[Hazard], int]):
+        super().__init__(n_non_zero_assets_by_hazard)
+        for hazard_type, n_zones in n_non_zero_assets_by_hazard.items():
+            if n_zones > qmc.Sobol.MAXDIM:
+                logger.warning(
+                    f"Sobol sampling supports up to {qmc.Sobol.MAXDIM} severity zones; "
+                    f"{hazard_type.__name__} has {n_zones}: using Latin hypercube sampling instead."
+                )
+
+    def next_inv_severities_in_batch(
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
+    ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
+        for hazard_type, n_zones in self.n_severity_zones_by_hazard.items():
+            if n_zones > qmc.Sobol.MAXDIM:
+                lhs = qmc.LatinHypercube(d=n_zones, rng=generator)
+                yield hazard_type, lhs.random(n_events).T
+                continue
+            sobol = qmc.Sobol(d=max(n_zones, 1), scramble=True, rng=generator)
+            # balance properties of the sequence hold for powers of 2
+            points = sobol.random_base2(int(np.ceil(np.log2(max(n_events, 1)))))
+            yield hazard_type, points[:n_events, :n_zones].T
+
+
+class LatinHypercubeEventSeverityProvider(UncorrelatedEventSeverityProvider):
+    """Uncorrelated severities where, for each hazard type and severity zone, the inverse severities of a batch
+    of events are stratified: each of n_events equal-probability strata contains exactly one event.
+    """
+
+    def next_inv_severities_in_batch(
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
+    ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
+        for hazard_type, n_zones in self.n_severity_zones_by_hazard.items():
+            lhs = qmc.LatinHypercube(d=max(n_zones, 1), rng=generator)
+            yield hazard_type, lhs.random(n_events)[:, :n_zones].T
+
+
+class ImportanceSamplingEventSeverityProvider(UncorrelatedEventSeverityProvider):
+    """Uncorrelated severities with rare severities oversampled. For each hazard type, a fraction tail_fraction
+    of events has one severity zone, chosen at random, with an inverse severity below tail_probability
+    (i.e. a return period above 1 / tail_probability). The events are weighted by the likelihood ratio of the
+    uniform and this (defensive mixture) distribution, which is bounded by 1 / (1 - tail_fraction).
+    """
+
+    def __init__(
+        self,
+        n_non_zero_assets_by_hazard: dict[type[Hazard], int],
+        tail_probability: float = 0.01,
+        tail_fraction: float = 0.5,
+    ):
+        super().__init__(n_non_zero_assets_by_hazard)
+        self.tail_probability = tail_probability
+        self.tail_fraction = tail_fraction
+
+    def next_inv_severities_in_batch(
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
+    ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
+        for hazard_type, n_zones in self.n_severity_zones_by_hazard.items():
+            randoms = generator.random(size=(n_zones, n_events))
+            events = np.flatnonzero(generator.random(n_events) < self.tail_fraction)
+            zones = generator.integers(max(n_zones, 1), size=len(events))
+            if n_zones > 0:
+                randoms[zones, events] *= self.tail_probability
+            yield hazard_type, randoms
+
+    def event_weights(
+        self, hazard_type: type[Hazard], inv_severities: np.ndarray
+    ) -> Optional[np.ndarray]:
+        n_zones = inv_severities.shape[0]
+        n_tail = np.count_nonzero(inv_severities < self.tail_probability, axis=0)
+        return 1.0 / (
+            1.0
+            - self.tail_fraction
+            + self.tail_fraction * n_tail / (max(n_zones, 1) * self.tail_probability)
+        )
+
+
+_SEVERITY_PROVIDERS: dict[SeveritySampling, type[UncorrelatedEventSeverityProvider]] = {
+    SeveritySampling.PSEUDO_RANDOM: UncorrelatedEventSeverityProvider,
+    SeveritySampling.SOBOL: SobolEventSeverityProvider,
+    SeveritySampling.LATIN_HYPERCUBE: LatinHypercubeEventSeverityProvider,
+    SeveritySampling.IMPORTANCE: ImportanceSamplingEventSeverityProvider,
+}
+
+
+def _h3_cells(assets: Sequence[Asset], resolution: int) -> np.ndarray:
+    """H3 cells, as integers, at the given resolution containing the assets."""
+    return np.array(
+        [
+            h3.str_to_int(
+                h3.latlng_to_cell(asset.latitude, asset.longitude, resolution)
+            )
+            for asset in assets
+        ],
+        dtype=np.int64,
+    )
+
+
+def _zone_to_asset_indices(asset_zones: np.ndarray, n_zones: int) -> list[list[int]]:
+    """Mapping from severity zone index to asset indices, given the severity zone index of each asset."""
+    if n_zones == 0:
+        return []
+    boundaries = np.cumsum(np.bincount(asset_zones, minlength=n_zones))[:-1]
+    return [
+        indices.tolist()
+        for indices in np.split(np.argsort(asset_zones, kind="stable"), boundaries)
+    ]
+
+
+class H3EventSeverityProvider(EventSeverityProvider):
+    """Spatially correlated severities: for each hazard type, the severity zones are the H3 cells, at the given
+    resolution, containing the assets, so that all assets within a cell experience the same severity for a given
+    event. Severities are drawn once per zone, using sampling, and gathered to assets by zone index.
+    """
+
+    def __init__(
+        self,
+        assets_by_hazard: Mapping[type[Hazard], Sequence[Asset]],
+        resolution: int = 5,
+        sampling: SeveritySampling = SeveritySampling.PSEUDO_RANDOM,
+    ):
+        """Create provider.
+
+        Args:
+            assets_by_hazard (Mapping[type[Hazard], Sequence[Asset]]): For each hazard type, the assets with non-zero
+                impact; asset indices are positions in these sequences.
+            resolution (int, optional): H3 resolution of the severity zones; at resolution 5 cells are
+                around 250 km² and at resolution 7 around 5 km². Defaults to 5.
+            sampling (SeveritySampling, optional): Sampling of the severities of each zone.
+                Defaults to SeveritySampling.PSEUDO_RANDOM.
+        """
+        self.resolution = resolution
+        self.asset_zones: dict[type[Hazard], np.ndarray] = {}
+        n_zones_by_hazard: dict[type[Hazard], int] = {}
+        for hazard_type, assets in assets_by_hazard.items():
+            unique_cells, asset_zones = np.unique(
+                _h3_cells(assets, resolution), return_inverse=True
+            )
+            self.asset_zones[hazard_type] = asset_zones.astype(np.int64)
+            n_zones_by_hazard[hazard_type] = len(unique_cells)
+        self.sampler = _SEVERITY_PROVIDERS[sampling](n_zones_by_hazard)
+
+    def next_inv_severities_in_batch(
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
+    ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
+        return self.sampler.next_inv_severities_in_batch(
+            n_events, generator, first_event
+        )
+
+    def severity_zone_to_asset_indices(
+        self, hazard_type: type[Hazard]
+    ) -> list[list[int]]:
+        return _zone_to_asset_indices(
+            self.asset_zones[hazard_type],
+            self.sampler.n_severity_zones_by_hazard[hazard_type],
+        )
+
+    def severity_zone_asset_pairs(
+        self, hazard_type: type[Hazard]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        zones = self.asset_zones[hazard_type]
+        return zones, np.arange(len(zones), dtype=np.int64)
+
+    def event_weights(
+        self, hazard_type: type[Hazard], inv_severities: np.ndarray
+    ) -> Optional[np.ndarray]:
+        return self.sampler.event_weights(hazard_type, inv_severities)
+
 
 class Events(object):
     def __init__(
@@ -726,15 +1800,174 @@ class Events(object):
     ):
         """Representation of events based on severity zones. This is a geographical area such that all assets within the area
         have the same severity for a given event.
+        Each element of the arrays gives the severity of an event in one severity zone; zones not listed for an event
+        are not affected by it. The arrays may be memory-mapped (see Events.load), in which case only the elements
+        needed are read.
 
         Args:
+            hazard_type (type[Hazard]): Hazard type of the events.
             event_id (np.ndarray): Array of integer event identifiers.
             event_start (np.ndarray): Starts of events as DateTime64 array.
             event_end (np.ndarray): Ends of events as DateTime64 array.
-            severities (List[np.ndarray]): List of arrays giving severities for each severity zone by hazard.
+            severity_zone (np.ndarray): Array of integer severity zone identifiers.
+            severity (np.ndarray): Array of severities, i.e. return periods in years.
         """
+        self.hazard_type = hazard_type
         self.event_id = event_id
         self.event_start = event_start
         self.event_end = event_end
         self.severity_zones = severity_zone
         self.severity = severity
+
+    def save(self, directory: str):
+        """Save the events as one numpy array file per column, sorted by event identifier."""
+        os.makedirs(directory, exist_ok=True)
+        order = np.argsort(self.event_id, kind="stable")
+        for name, values in [
+            ("event_id", self.event_id),
+            ("event_start", self.event_start),
+            ("event_end", self.event_end),
+            ("severity_zone", self.severity_zones),
+            ("severity", self.severity),
+        ]:
+            np.save(os.path.join(directory, f"{name}.npy"), np.asarray(values)[order])
+
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        hazard_type: type[Hazard],
+        mmap_mode: Optional[Literal["r", "r+", "w+", "c"]] = "r",
+    ) -> "Events":
+        """Load events saved by Events.save, by default memory-mapped rather than read into memory."""
+        return cls(
+            hazard_type,
+            **{
+                name: np.load(
+                    os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode
+                )
+                for name in [
+                    "event_id",
+                    "event_start",
+                    "event_end",
+                    "severity_zone",
+                    "severity",
+                ]
+            },
+        )
+
+
+@dataclass
+class EventSet:
+    """A catalogue of events of one or more hazard types, used in place of sampled severities by aggregate_impacts.
+    Each event identifier, an integer from 0 to n_events - 1, is one of n_events equally likely samples (e.g. a
+    simulated year); identifiers without events are samples with no impact. The severity zones of the events are
+    the H3 cells, as integers, at severity_zone_resolution; an asset has the severity of the cell containing it.
+    """
+
+    events: dict[type[Hazard], Events]
+    n_events: int
+    severity_zone_resolution: int
+
+    def save(self, directory: str):
+        """Save the event set as a directory containing a sub-directory of columns for each hazard type."""
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, "event_set.json"), "w") as f:
+            json.dump(
+                {
+                    "n_events": self.n_events,
+                    "severity_zone_resolution": self.severity_zone_resolution,
+                    "hazard_types": [h.__name__ for h in self.events],
+                },
+                f,
+            )
+        for hazard_type, events in self.events.items():
+            events.save(os.path.join(directory, hazard_type.__name__))
+
+    @classmethod
+    def load(
+        cls, directory: str, mmap_mode: Optional[Literal["r", "r+", "w+", "c"]] = "r"
+    ) -> "EventSet":
+        """Load an event set saved by EventSet.save, by default memory-mapped rather than read into memory."""
+        with open(os.path.join(directory, "event_set.json")) as f:
+            metadata = json.load(f)
+        events = {}
+        for name in metadata["hazard_types"]:
+            hazard_type = hazard_class(name)
+            events[hazard_type] = Events.load(
+                os.path.join(directory, name), hazard_type, mmap_mode
+            )
+        return cls(events, metadata["n_events"], metadata["severity_zone_resolution"])
+
+
+class EventSetSeverityProvider(EventSeverityProvider):
+    """Severities read from an event set rather than sampled. For a batch of events, the elements of the (sorted)
+    event arrays of each hazard type are located by binary search, so that memory-mapped event sets of millions of
+    events are read a batch at a time. The severity zones are the H3 cells of the event set that contain assets.
+    """
+
+    def __init__(
+        self,
+        event_set: EventSet,
+        assets_by_hazard: Mapping[type[Hazard], Sequence[Asset]],
+    ):
+        """Create provider.
+
+        Args:
+            event_set (EventSet): Event set; the events of each hazard type must be sorted by event identifier,
+                as saved by EventSet.save. This is checked on creation.
+            assets_by_hazard (Mapping[type[Hazard], Sequence[Asset]]): For each hazard type, the assets with non-zero
+                impact; asset indices are positions in these sequences.
+        """
+        self.event_set = event_set
+        self.cells: dict[type[Hazard], np.ndarray] = {}
+        self.asset_zones: dict[type[Hazard], np.ndarray] = {}
+        for hazard_type, assets in assets_by_hazard.items():
+            self.cells[hazard_type], self.asset_zones[hazard_type] = np.unique(
+                _h3_cells(assets, event_set.severity_zone_resolution),
+                return_inverse=True,
+            )
+            events = event_set.events.get(hazard_type)
+            # batches are located by binary search, which requires sorted event identifiers
+            if events is not None and np.any(
+                events.event_id[1:] < events.event_id[:-1]
+            ):
+                raise ValueError(
+                    f"events of {hazard_type.__name__} must be sorted by event identifier."
+                )
+
+    def next_inv_severities_in_batch(
+        self, n_events: int, generator: np.random.Generator, first_event: int = 0
+    ) -> Generator[tuple[type[Hazard], np.ndarray], None, None]:
+        for hazard_type, cells in self.cells.items():
+            # a severity of 1 year (inverse severity 1) is no impact
+            inv_severities = np.ones((len(cells), n_events))
+            events = self.event_set.events.get(hazard_type)
+            if events is not None and len(cells) > 0:
+                start, end = np.searchsorted(
+                    events.event_id, [first_event, first_event + n_events]
+                )
+                event_ids = np.asarray(events.event_id[start:end])
+                zones = np.searchsorted(cells, events.severity_zones[start:end])
+                zones = np.minimum(zones, len(cells) - 1)
+                in_zones = cells[zones] == events.severity_zones[start:end]
+                # the most severe, if an event has several severities in a zone
+                np.minimum.at(
+                    inv_severities,
+                    (zones[in_zones], event_ids[in_zones] - first_event),
+                    1.0 / np.asarray(events.severity[start:end])[in_zones],
+                )
+            yield hazard_type, inv_severities
+
+    def severity_zone_to_asset_indices(
+        self, hazard_type: type[Hazard]
+    ) -> list[list[int]]:
+        return _zone_to_asset_indices(
+            self.asset_zones[hazard_type], len(self.cells[hazard_type])
+        )
+
+    def severity_zone_asset_pairs(
+        self, hazard_type: type[Hazard]
+    ) -> tuple[np.ndarray, np.ndarray]:
+        zones = self.asset_zones[hazard_type].astype(np.int64)
+        return zones, np.arange(len(zones), dtype=np.int64)
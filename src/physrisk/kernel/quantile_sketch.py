@@ -0,0 +1,169 @@
+from typing import Optional
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Mergeable sketch of the distribution of a stream of (optionally weighted) samples, using memory
+    independent of the number of samples.
+
+    Quantiles are estimated from centroids, as in the merging t-digest: samples are merged into centroids
+    whose size is limited by the arcsine scale function, so that centroids are small in the tails of the
+    distribution. Each centroid records the weight, mean and sum of squared deviations of its samples.
+    Moments of the stream, used for the mean and its standard error, are accumulated exactly, relative to
+    a shift to limit loss of precision.
+    """
+
+    def __init__(self, compression: float = 1000.0):
+        """Create an empty sketch.
+
+        Args:
+            compression (float, optional): Scale of the sketch; the number of centroids is of order
+                compression. Defaults to 1000.0.
+        """
+        self.compression = compression
+        self._weights: np.ndarray = np.empty(0)
+        self._means: np.ndarray = np.empty(0)
+        self._m2s: np.ndarray = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+        self.count = 0
+        self.weighted = False
+        self._shift: Optional[float] = None
+        # sums of w, w (v - shift), w (v - shift)^2, w^2, w^2 (v - shift), w^2 (v - shift)^2
+        self._sums = np.zeros(6)
+
+    @classmethod
+    def from_values(
+        cls,
+        values: np.ndarray,
+        weights: Optional[np.ndarray] = None,
+        compression: float = 1000.0,
+    ) -> "QuantileSketch":
+        sketch = cls(compression)
+        sketch.add(values, weights)
+        return sketch
+
+    def add(self, values: np.ndarray, weights: Optional[np.ndarray] = None) -> None:
+        """Add samples to the sketch."""
+        if len(values) == 0:
+            return
+        w = np.ones(len(values)) if weights is None else np.asarray(weights, float)
+        if self._shift is None:
+            self._shift = float(np.mean(values))
+        y = values - self._shift
+        self._sums += [
+            np.sum(w),
+            np.sum(w * y),
+            np.sum(w * y**2),
+            np.sum(w**2),
+            np.sum(w**2 * y),
+            np.sum(w**2 * y**2),
+        ]
+        self.count += len(values)
+        self.weighted = self.weighted or weights is not None
+        self.min = min(self.min, float(np.min(values)))
+        self.max = max(self.max, float(np.max(values)))
+        self._compress(
+            np.concatenate([self._weights, w]),
+            np.concatenate([self._means, values]),
+            np.concatenate([self._m2s, np.zeros(len(values))]),
+        )
+
+    def merge(self, other: "QuantileSketch") -> None:
+        """Merge another sketch into this one."""
+        if other.count == 0:
+            return
+        if self._shift is None:
+            self._shift = other._shift
+        # re-express the sums of the other sketch relative to the shift of this one
+        d = float(other._shift) - float(self._shift)  # type: ignore
+        s0, s1, s2, t0, t1, t2 = other._sums
+        self._sums += [
+            s0,
+            s1 + d * s0,
+            s2 + 2 * d * s1 + d**2 * s0,
+            t0,
+            t1 + d * t0,
+            t2 + 2 * d * t1 + d**2 * t0,
+        ]
+        self.count += other.count
+        self.weighted = self.weighted or other.weighted
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress(
+            np.concatenate([self._weights, other._weights]),
+            np.concatenate([self._means, other._means]),
+            np.concatenate([self._m2s, other._m2s]),
+        )
+
+    def _compress(self, weights: np.ndarray, means: np.ndarray, m2s: np.ndarray):
+        order = np.argsort(means, kind="stable")
+        weights, means, m2s = weights[order], means[order], m2s[order]
+        cum_weights = np.cumsum(weights)
+        q = (cum_weights - weights / 2) / cum_weights[-1]
+        k = self.compression / (2 * np.pi) * np.arcsin(2 * q - 1)
+        groups = np.floor(k - k[0]).astype(np.int64)
+        # groups are non-decreasing: renumber consecutively
+        groups = np.cumsum(np.concatenate([[0], np.diff(groups) > 0]))
+        group_weights = np.bincount(groups, weights=weights)
+        group_means = np.bincount(groups, weights=weights * means) / group_weights
+        self._m2s = np.bincount(
+            groups, weights=m2s + weights * (means - group_means[groups]) ** 2
+        )
+        self._weights, self._means = group_weights, group_means
+
+    @property
+    def mean(self) -> float:
+        return float(self._shift + self._sums[1] / self._sums[0])  # type: ignore
+
+    @property
+    def effective_count(self) -> float:
+        """Effective number of samples, allowing for weights."""
+        return float(self._sums[0] ** 2 / self._sums[3])
+
+    def mean_standard_error(self) -> float:
+        if self.count < 2:
+            return np.inf
+        s0, s1, s2, t0, t1, t2 = self._sums
+        m = s1 / s0
+        if not self.weighted:
+            variance = (s2 - s0 * m**2) / (s0 - 1)
+            return float(np.sqrt(max(variance, 0.0) / s0))
+        return float(np.sqrt(max(t2 - 2 * m * t1 + m**2 * t0, 0.0)) / s0)
+
+    def quantile(self, quantiles: np.ndarray) -> np.ndarray:
+        """Estimated quantiles of the samples."""
+        cum_weights = np.cumsum(self._weights)
+        centres = (cum_weights - self._weights / 2) / cum_weights[-1]
+        return np.interp(
+            quantiles,
+            np.concatenate([[0.0], centres, [1.0]]),
+            np.concatenate([[self.min], self._means, [self.max]]),
+        )
+
+    def quantile_standard_errors(self, quantiles: np.ndarray) -> np.ndarray:
+        """Standard errors of the quantiles, estimated as half the spread of the quantiles within one
+        standard deviation of the rank of each quantile."""
+        if self.count < 2:
+            return np.full(len(quantiles), np.inf)
+        rank_error = np.sqrt(quantiles * (1.0 - quantiles) / self.effective_count)
+        upper = self.quantile(np.minimum(quantiles + rank_error, 1.0))
+        lower = self.quantile(np.maximum(quantiles - rank_error, 0.0))
+        return (upper - lower) / 2.0
+
+    def semi_standard_deviation(self) -> float:
+        """Root mean square deviation from the mean of the samples above the mean."""
+        mean = self.mean
+        above = self._means > mean
+        if not np.any(above):
+            return np.nan
+        return float(
+            np.sqrt(
+                np.sum(
+                    self._m2s[above]
+                    + self._weights[above] * (self._means[above] - mean) ** 2
+                )
+                / np.sum(self._weights[above])
+            )
+        )
@@ -68,6 +68,11 @@ class Quantity:
     exceedance_curve: ExceedanceCurve
     mean: float
     semi_standard_deviation: float
+    # Monte Carlo standard errors of the mean and of the exceedance curve values, if sampled
+    mean_standard_error: Optional[float] = None
+    exceedance_standard_error: Optional[npt.NDArray[np.floating[Any]]] = None
+    # weights of the values, if the events are not equally likely (importance sampling)
+    weights: Optional[npt.NDArray[np.floating[Any]]] = None
     # percentiles: npt.NDArray[np.floating[Any]]
     # percentile_values: npt.NDArray[np.floating[Any]]
 
@@ -148,7 +153,10 @@ class RiskModel:
     """
 
     def __init__(
-        self, hazard_model: HazardModel, vulnerability_models: VulnerabilityModels
+        self,
+        hazard_model: HazardModel,
+        vulnerability_models: VulnerabilityModels,
+        max_workers: Optional[int] = None,
     ):
         """Initialize a RiskModel instance.
 
@@ -156,10 +164,13 @@ class RiskModel:
         ---------
             hazard_model (HazardModel): The hazard model to be used for risk calculations.
             vulnerability_models (Optional[VulnerabilityModels]): Optional vulnerability models; if not provided, will use default.
+            max_workers (Optional[int]): Number of worker processes used to apply the vulnerability models;
+                see calculate_impacts. Defaults to None, in which case the calculation is in-process.
 
         """
         self._hazard_model = hazard_model
         self._vulnerability_models = vulnerability_models
+        self._max_workers = max_workers
 
     def calculate_risk_measures(
         self,
@@ -188,6 +199,7 @@ class RiskModel:
             self._vulnerability_models,
             scenarios=scenarios,
             years=years,
+            max_workers=self._max_workers,
         )
         return impact_results
 
@@ -274,6 +286,7 @@ class PortfolioRiskModel(RiskModel):
         vulnerability_models: VulnerabilityModels,
         measure_calculators: Dict[type[Asset], RiskMeasureCalculator],
         portfolio_measure_calculator: PortfolioRiskMeasureCalculator = NullAssetBasedPortfolioRiskMeasureCalculator(),
+        max_workers: Optional[int] = None,
     ):
         """Risk model that calculates risk measures at asset level and portfolio level.
 
@@ -283,8 +296,9 @@ class PortfolioRiskModel(RiskModel):
             vulnerability_models (VulnerabilityModels): Vulnerability models for asset types.
             measure_calculators (Dict[type, RiskMeasureCalculator]): Risk measure calculators for asset types.
             portfolio_measure_calculator (PortfolioRiskMeasureCalculator): Risk measure calculator for portfolio-level measures.
+            max_workers (Optional[int]): Number of worker processes used to apply the vulnerability models.
         """
-        super().__init__(hazard_model, vulnerability_models)
+        super().__init__(hazard_model, vulnerability_models, max_workers)
         self.asset_level_measures_required = (
             portfolio_measure_calculator.asset_level_measures_required
         )
@@ -1,6 +1,7 @@
-from typing import List, Union
+from typing import List, Optional, Union
 
 import numpy as np
+from scipy import sparse
 
 from physrisk.kernel.hazards import Hazard
 
@@ -10,13 +11,15 @@ from physrisk.kernel.hazards import Hazard
 
 
 class VulnerabilityDistrib:
-    """Vulnerability distribution as a discrete matrix."""
+    """Vulnerability distribution as a discrete matrix. The matrix may be dense, sparse (scipy.sparse)
+    or diagonal; in the last two cases the dense matrix is only created if requested."""
 
     __slots__ = [
         "_hazard_type",
         "_intensity_bins",
         "_impact_bins",
         "_prob_matrix",
+        "_diagonal",
         "_hazard_indicator_id",
     ]
 
@@ -25,21 +28,70 @@ class VulnerabilityDistrib:
         hazard_type: type[Hazard],
         intensity_bins: Union[List[float], np.ndarray],
         impact_bins: Union[List[float], np.ndarray],
-        prob_matrix: Union[List[List[float]], np.ndarray],
+        prob_matrix: Optional[
+            Union[List[List[float]], np.ndarray, sparse.spmatrix, sparse.sparray]
+        ],
         hazard_indicator_id: str,
+        diagonal: Optional[np.ndarray] = None,
     ):
         """Create a new vulnerability distribution.
         Args:
             event_type: type of event
             intensity_bins: non-decreasing intensity bin bounds
             impact_bins: non-decreasing impact bin bounds
-            prob_matrix: matrix of probabilities with size [len(intensity_bins) - 1, len(impact_bins) - 1]
+            prob_matrix: matrix of probabilities with size [len(intensity_bins) - 1, len(impact_bins) - 1];
+                may be a scipy.sparse matrix. If None, the matrix is diagonal.
+            diagonal: the diagonal of the matrix if prob_matrix is None; if also None, the matrix is the identity.
         """
         self._hazard_type = hazard_type
         self._hazard_indicator_id = hazard_indicator_id
         self._intensity_bins = np.array(intensity_bins)
         self._impact_bins = np.array(impact_bins)
-        self._prob_matrix = np.array(prob_matrix)
+        self._prob_matrix: Optional[
+            Union[np.ndarray, sparse.spmatrix, sparse.sparray]
+        ] = None
+        self._diagonal: Optional[np.ndarray] = None
+        if prob_matrix is None:
+            self._diagonal = (
+                np.ones(len(self._intensity_bins) - 1)
+                if diagonal is None
+                else np.array(diagonal)
+            )
+        elif diagonal is not None:
+            raise ValueError("only one of prob_matrix and diagonal may be specified")
+        elif sparse.issparse(prob_matrix):
+            self._prob_matrix = prob_matrix
+        else:
+            self._prob_matrix = np.array(prob_matrix)
+
+    @classmethod
+    def diagonal(
+        cls,
+        hazard_type: type[Hazard],
+        intensity_bins: Union[List[float], np.ndarray],
+        impact_bins: Union[List[float], np.ndarray],
+        hazard_indicator_id: str,
+        diagonal: Optional[np.ndarray] = None,
+    ) -> "VulnerabilityDistrib":
+        """Create a vulnerability distribution with a diagonal probability matrix. This is the case for
+        deterministic models: if the intensity falls within a certain bin, then the impact *will* fall within
+        the corresponding impact bin.
+
+        Args:
+            hazard_type: type of hazard.
+            intensity_bins: non-decreasing intensity bin bounds.
+            impact_bins: non-decreasing impact bin bounds.
+            hazard_indicator_id: hazard indicator identifier.
+            diagonal: the diagonal of the matrix; if None, the matrix is the identity.
+        """
+        return cls(
+            hazard_type,
+            intensity_bins,
+            impact_bins,
+            None,
+            hazard_indicator_id,
+            diagonal=diagonal,
+        )
 
     @property
     def event_type(self) -> type:
@@ -67,9 +119,35 @@ class VulnerabilityDistrib:
     def intensity_bins(self) -> np.ndarray:
         return self._intensity_bins
 
+    @property
+    def is_diagonal(self) -> bool:
+        return self._diagonal is not None
+
     @property
     def prob_matrix(self) -> np.ndarray:
-        return self._prob_matrix
+        """The (dense) probability matrix."""
+        if self._prob_matrix is None:
+            assert self._diagonal is not None
+            self._prob_matrix = np.diag(self._diagonal)
+        if isinstance(self._prob_matrix, np.ndarray):
+            return self._prob_matrix
+        return self._prob_matrix.toarray()
+
+    def impact_probabilities(self, event_probs: np.ndarray) -> np.ndarray:
+        """Probabilities of the impact bins given the probabilities of the intensity bins,
+        i.e. prob_matrix.T @ event_probs, avoiding dense calculation where possible.
+
+        Args:
+            event_probs (np.ndarray): Probabilities of the intensity bins.
+
+        Returns:
+            np.ndarray: Probabilities of the impact bins.
+        """
+        if self._diagonal is not None:
+            return self._diagonal * event_probs
+        if sparse.issparse(self._prob_matrix):
+            return np.asarray(self._prob_matrix.T @ event_probs).ravel()  # type: ignore
+        return self._prob_matrix.T @ event_probs  # type: ignore
 
 
 class EmptyVulnerabilityDistrib(VulnerabilityDistrib):
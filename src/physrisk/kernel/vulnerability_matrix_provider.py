@@ -1,6 +1,7 @@
 from typing import Callable, Sequence
 
 import numpy as np
+from scipy import special
 
 
 class Distribution:
@@ -50,11 +51,119 @@ class VulnMatrixProvider:
         """
         # construct a cdf probability matrix at each intensity point
         # the probability is the prob that the impact is greater than the specified
+        cdf_matrix = self.to_cdf_matrix(impact_bin_edges)
+
+        prob_matrix = cdf_matrix[:, 1:] - cdf_matrix[:, :-1]
+
+        return prob_matrix
+
+    def to_cdf_matrix(self, impact_bin_edges: np.ndarray) -> np.ndarray:
+        """Return matrix, c, with dimension (number intensity bins, number impact bin edges) where
+        c[i, j] is the probability that, given the intensity falls in bin i, the impact is less than
+        impact bin edge j.
+        """
         cdf_matrix = np.empty([len(self.intensity_bin_centres), len(impact_bin_edges)])
 
         for i, _ in enumerate(self.intensity_bin_centres):
             cdf_matrix[i, :] = self.impact_cdfs[i](impact_bin_edges)  # type: ignore
 
-        prob_matrix = cdf_matrix[:, 1:] - cdf_matrix[:, :-1]
+        return cdf_matrix
 
-        return prob_matrix
+
+class BetaVulnMatrixProvider(VulnMatrixProvider):
+    __slots__ = ["impact_means", "impact_stddevs", "scaling_factor"]
+
+    def __init__(
+        self,
+        intensity_bin_centres: np.ndarray,
+        impact_means: np.ndarray,
+        impact_stddevs: np.ndarray,
+        scaling_factor: float = 1.0,
+    ):
+        """VulnMatrixProvider where, for each intensity bin centre, the impact follows a beta distribution
+        with the specified mean and standard deviation. The whole CDF matrix is calculated in a single
+        vectorised call, rather than via one function per intensity bin centre.
+
+        Args:
+            intensity_bin_centres (np.ndarray): The centres of the intensity bins.
+            impact_means (np.ndarray): Mean impact for each intensity bin centre.
+            impact_stddevs (np.ndarray): Standard deviation of impact for each intensity bin centre.
+            scaling_factor (float, optional): Impacts are in range [0, scaling_factor]. Defaults to 1.0.
+        """
+        if not np.all(np.diff(intensity_bin_centres) >= 0):
+            raise ValueError("intensities must be sorted and increasing")
+
+        if len(intensity_bin_centres) != len(impact_means) or len(
+            intensity_bin_centres
+        ) != len(impact_stddevs):
+            raise ValueError(
+                "one impact mean and standard deviation expected for each intensity_bin_centre"
+            )
+
+        self.intensity_bin_centres = np.array(intensity_bin_centres)
+        self.impact_means = np.asarray(impact_means, dtype=float)
+        self.impact_stddevs = np.asarray(impact_stddevs, dtype=float)
+        self.scaling_factor = scaling_factor
+
+    @property
+    def impact_cdfs(self) -> Sequence[Callable[[np.ndarray], np.ndarray]]:  # type: ignore[override]
+        def row_cdf(i: int) -> Callable[[np.ndarray], np.ndarray]:
+            def cdf(x: np.ndarray) -> np.ndarray:
+                return self._cdf_matrix_rows(x, slice(i, i + 1))[0, :]
+
+            return cdf
+
+        return [row_cdf(i) for i in range(len(self.intensity_bin_centres))]
+
+    def to_cdf_matrix(self, impact_bin_edges: np.ndarray) -> np.ndarray:
+        return self._cdf_matrix_rows(impact_bin_edges, slice(None))
+
+    def _cdf_matrix_rows(self, impact_bin_edges: np.ndarray, rows: slice) -> np.ndarray:
+        return beta_cdf_matrix(
+            self.impact_means[rows],
+            self.impact_stddevs[rows],
+            impact_bin_edges,
+            self.scaling_factor,
+        )
+
+
+def beta_cdf_matrix(
+    means: np.ndarray,
+    stddevs: np.ndarray,
+    x: np.ndarray,
+    scaling_factor: float = 1.0,
+) -> np.ndarray:
+    """Vectorised cumulative distribution functions of beta distributions with the specified means and
+    standard deviations, scaled to range [0, scaling_factor]. As for checked_beta_distrib, where the
+    distribution is degenerate (zero standard deviation, mean at either end of the range, or parameters
+    that are not positive) a delta distribution at the mean is used instead.
+
+    Args:
+        means (np.ndarray): Means of the distributions.
+        stddevs (np.ndarray): Standard deviations of the distributions.
+        x (np.ndarray): Values at which CDFs are evaluated.
+        scaling_factor (float, optional): Scaling factor. Defaults to 1.0.
+
+    Returns:
+        np.ndarray: Matrix, c, with dimension (len(means), len(x)) where c[i, j] is the probability that the
+        random variable of distribution i is less than x[j].
+    """
+    means = np.asarray(means, dtype=float)
+    stddevs = np.asarray(stddevs, dtype=float)
+    x = np.asarray(x, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cv = stddevs / means
+        a = ((scaling_factor - means) / (cv * cv) - means) / scaling_factor
+        b = a * (scaling_factor - means) / means
+    delta = (
+        (stddevs == 0) | (means == 0) | (means == scaling_factor) | (a <= 0) | (b <= 0)
+    )
+    cdf_matrix = np.empty((len(means), len(x)))
+    cdf_matrix[delta, :] = np.where(x[None, :] < means[delta, None], 0.0, 1.0)
+    beta = ~delta
+    cdf_matrix[beta, :] = special.betainc(
+        a[beta, None],
+        b[beta, None],
+        np.clip(x / scaling_factor, 0.0, 1.0)[None, :],
+    )
+    return cdf_matrix
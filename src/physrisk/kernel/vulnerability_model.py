@@ -1,8 +1,10 @@
 import importlib.resources
 import json
+import logging
 from abc import ABC, abstractmethod
 from typing import (
     Dict,
+    List,
     Optional,
     Protocol,
     Sequence,
@@ -16,7 +18,12 @@ from scipy import stats
 
 import physrisk.data.static.vulnerability
 from physrisk.kernel.hazards import Hazard
-from physrisk.kernel.impact_distrib import EmptyImpactDistrib, ImpactDistrib, ImpactType
+from physrisk.kernel.impact_distrib import (
+    EmptyImpactDistrib,
+    EmptyReason,
+    ImpactDistrib,
+    ImpactType,
+)
 
 from ..api.v1.common import VulnerabilityCurve, VulnerabilityCurves
 from .assets import Asset
@@ -24,7 +31,9 @@ from .curve import ExceedanceCurve
 from .hazard_event_distrib import HazardEventDistrib
 from .hazard_model import HazardDataRequest, HazardDataResponse, HazardEventDataResponse
 from .vulnerability_distrib import EmptyVulnerabilityDistrib, VulnerabilityDistrib
-from .vulnerability_matrix_provider import VulnMatrixProvider
+from .vulnerability_matrix_provider import BetaVulnMatrixProvider, VulnMatrixProvider
+
+logger = logging.getLogger(__name__)
 
 PLUGINS = {}  # type:ignore
 
@@ -81,6 +90,11 @@ def beta_distrib(mean, std, scaling_factor):
     return lambda x, a=a, b=b: stats.beta.cdf(x / scaling_factor, a, b)
 
 
+ImpactDetails = Tuple[
+    ImpactDistrib, Optional[VulnerabilityDistrib], Optional[HazardEventDistrib]
+]
+
+
 class DataRequester(Protocol):
     def get_data_requests(
         self, asset: Asset, *, scenario: str, year: int
@@ -120,6 +134,33 @@ class VulnerabilityModelBase(ABC, DataRequester):
         self, asset: Asset, hazard_data: Sequence[HazardDataResponse]
     ) -> ImpactDistrib: ...
 
+    def get_impacts_batch(
+        self,
+        assets: Sequence[Asset],
+        hazard_data_matrix: Sequence[Sequence[HazardDataResponse]],
+    ) -> List[ImpactDetails]:
+        """Calculate the impacts of a number of assets in one call.
+
+        Models able to vectorise the calculation across assets can override this; by default
+        the impact of each asset is calculated in turn.
+
+        Args:
+        ----
+            assets: the assets.
+            hazard_data_matrix: for each asset, the responses to the requests made by get_data_requests,
+                in the same order.
+
+        Returns:
+        -------
+            List[ImpactDetails]: for each asset, the impact distribution together with the vulnerability
+            and hazard event distributions used to infer this, if available.
+
+        """
+        return [
+            (self.get_impact(asset, hazard_data), None, None)
+            for asset, hazard_data in zip(assets, hazard_data_matrix)
+        ]
+
 
 class VulnerabilityModels(Protocol):
     def vuln_model_for_asset_of_type(
@@ -188,6 +229,33 @@ class VulnerabilityModelAcuteBase(VulnerabilityModelBase):
         impact, _, _ = self.get_impact_details(asset, data_responses)
         return impact
 
+    def get_impacts_batch(
+        self,
+        assets: Sequence[Asset],
+        hazard_data_matrix: Sequence[Sequence[HazardDataResponse]],
+    ) -> List[ImpactDetails]:
+        return [
+            self.get_impact_details(asset, hazard_data)
+            for asset, hazard_data in zip(assets, hazard_data_matrix)
+        ]
+
+    def _get_impact_details_or_empty(
+        self, asset: Asset, data_responses: Sequence[HazardDataResponse]
+    ) -> ImpactDetails:
+        """Per-asset calculation for use within batch calculations, for assets that cannot be vectorised:
+        an exception for one asset results in an empty impact rather than failing the whole batch.
+        """
+        try:
+            return self.get_impact_details(asset, data_responses)
+        except Exception:
+            logger.exception(
+                "impact calculation failed for %s asset %s in %s",
+                type(asset).__name__,
+                asset.id,
+                type(self).__name__,
+            )
+            return EmptyImpactDistrib(empty_reason=EmptyReason.EXCEPTION), None, None
+
     def get_impact_details(
         self, asset: Asset, data_responses: Sequence[HazardDataResponse]
     ) -> Tuple[ImpactDistrib, VulnerabilityDistrib, HazardEventDistrib]:
@@ -202,7 +270,7 @@ class VulnerabilityModelAcuteBase(VulnerabilityModelBase):
         vulnerability_dist, event_dist = self.get_distributions(asset, data_responses)
         if isinstance(vulnerability_dist, EmptyVulnerabilityDistrib):
             return EmptyImpactDistrib(), vulnerability_dist, event_dist
-        impact_prob = vulnerability_dist.prob_matrix.T @ event_dist.prob
+        impact_prob = vulnerability_dist.impact_probabilities(event_dist.prob)
         return (
             ImpactDistrib(
                 vulnerability_dist.event_type,
@@ -300,11 +368,8 @@ class CurveBasedVulnerabilityModel(VulnerabilityModel):
         impact_stddevs = np.interp(
             intensity_bin_centres, curve.intensity, curve.impact_std
         )
-        return VulnMatrixProvider(
-            intensity_bin_centres,
-            impact_cdfs=[
-                checked_beta_distrib(m, s) for m, s in zip(impact_means, impact_stddevs)
-            ],
+        return BetaVulnMatrixProvider(
+            intensity_bin_centres, impact_means, impact_stddevs
         )
 
     @abstractmethod
@@ -381,11 +446,10 @@ class DeterministicVulnerabilityModel(VulnerabilityModelAcuteBase):
         # the vulnerability distribution probabilities are an identity matrix:
         # we assume that if the intensity falls within a certain bin then the impacts *will* fall within the
         # bin where the edges are obtained by applying the damage curve to the intensity bin edges.
-        vul = VulnerabilityDistrib(
+        vul = VulnerabilityDistrib.diagonal(
             self.hazard_type,
             intensity_bin_edges,
             impact_bins_edges,
-            np.eye(len(impact_bins_edges) - 1),
             hazard_indicator_id=self.indicator_id,
         )
         event = HazardEventDistrib(
@@ -396,3 +460,67 @@ class DeterministicVulnerabilityModel(VulnerabilityModelAcuteBase):
             event_data.units,
         )
         return vul, event
+
+    def get_impacts_batch(
+        self,
+        assets: Sequence[Asset],
+        hazard_data_matrix: Sequence[Sequence[HazardDataResponse]],
+    ) -> List[ImpactDetails]:
+        if (
+            type(self).get_distributions
+            is not DeterministicVulnerabilityModel.get_distributions
+        ):
+            return super().get_impacts_batch(assets, hazard_data_matrix)
+        results: List[Optional[ImpactDetails]] = [None] * len(assets)
+        # assets with hazard curves of the same return periods are processed together
+        groups: Dict[Tuple[float, ...], List[int]] = {}
+        for i, hazard_data in enumerate(hazard_data_matrix):
+            (event_data,) = hazard_data
+            assert isinstance(event_data, HazardEventDataResponse)
+            groups.setdefault(tuple(event_data.return_periods), []).append(i)
+        for return_periods, group in groups.items():
+            exceed_probs = 1.0 / np.array(return_periods)
+            intensities = np.stack(
+                [hazard_data_matrix[i][0].intensities for i in group]  # type: ignore
+            )
+            # rows that are not valid exceedance curves (or are single points) are left
+            # to the per-asset calculation, which deals with these cases
+            vectorisable = np.all(np.diff(intensities, axis=1) >= 0, axis=1)
+            if len(return_periods) < 2 or not np.all(np.diff(exceed_probs) <= 0):
+                vectorisable[:] = False
+            probs = exceed_probs[:-1] - exceed_probs[1:]
+            impact_bins_edges = np.interp(
+                intensities, self.damage_curve_intensities, self.damage_curve_impacts
+            )
+            # the vulnerability matrix is the identity, so impact probabilities are the
+            # intensity bin probabilities
+            for row, i in enumerate(group):
+                if not vectorisable[row]:
+                    results[i] = self._get_impact_details_or_empty(
+                        assets[i], hazard_data_matrix[i]
+                    )
+                    continue
+                event_data = hazard_data_matrix[i][0]  # type: ignore
+                vul = VulnerabilityDistrib.diagonal(
+                    self.hazard_type,
+                    intensities[row],
+                    impact_bins_edges[row],
+                    hazard_indicator_id=self.indicator_id,
+                )
+                event = HazardEventDistrib(
+                    self.hazard_type,
+                    intensities[row],
+                    probs,
+                    [event_data.path],
+                    event_data.units,
+                )
+                impact = ImpactDistrib(
+                    self.hazard_type,
+                    impact_bins_edges[row],
+                    probs,
+                    hazard_indicator_id=self.indicator_id,
+                    impact_type=self.impact_type,
+                    path=event.path,
+                )
+                results[i] = (impact, vul, event)
+        return results  # type: ignore
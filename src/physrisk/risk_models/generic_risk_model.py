@@ -33,10 +33,7 @@ from physrisk.kernel.impact_distrib import (
     ImpactDistrib,
 )
 from physrisk.kernel.risk import Measure, MeasureKey, RiskMeasureCalculator
-from pint import UnitRegistry
-from physrisk.utils.units import needs_conversion
-
-ureg = UnitRegistry()
+from physrisk.utils.units import convert_units, needs_conversion
 
 
 class UnderlingMeasure(Protocol):
@@ -447,7 +444,7 @@ class GenericScoreBasedRiskMeasures(RiskMeasureCalculator):
                     np.interp(return_period, resp.return_periods, resp.intensities)
                 )
                 if needs_conversion(resp.units, bounds.units):
-                    param = ureg.convert(param, resp.units, bounds.units)
+                    param = convert_units(param, resp.units, bounds.units)
             if math.isnan(param):
                 return Measure(
                     score=Category.NO_DATA,
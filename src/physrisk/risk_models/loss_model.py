@@ -34,7 +34,9 @@ class LossModel:
         self,
         hazard_model: Optional[HazardModel] = None,
         vulnerability_models: Optional[VulnerabilityModels] = None,
+        max_workers: Optional[int] = None,
     ):
+        self.max_workers = max_workers
         self.hazard_model = (
             get_default_hazard_model() if hazard_model is None else hazard_model
         )
@@ -70,6 +72,7 @@ class LossModel:
             self.vulnerability_models,
             scenarios=[scenario],
             years=[year],
+            max_workers=self.max_workers,
         )
         # the impacts in the results are either fractional damage or a fractional disruption
 
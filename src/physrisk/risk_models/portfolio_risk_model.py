@@ -1,4 +1,5 @@
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
 from typing import Optional, Sequence
 
@@ -15,7 +16,13 @@ from physrisk.kernel.assets import Asset
 from physrisk.kernel.financial_model import DefaultFinancialModel, FinancialDataProvider
 from physrisk.kernel.hazards import Hazard
 from physrisk.kernel.impact import AssetImpactResult, ImpactKey
-from physrisk.kernel.impact_aggregator import aggregate_impacts
+from physrisk.kernel.impact_aggregator import (
+    ConvergenceCriteria,
+    EventSet,
+    SeveritySampling,
+    aggregate_impacts,
+    weighted_quantile,
+)
 from physrisk.kernel.risk import (
     Measure,
     MeasureKey,
@@ -110,11 +117,32 @@ class CompanyRiskMeasureCalculator(PortfolioRiskMeasureCalculator):
     Financial data is applied to the relative quantities and a Monte Carlo-based approach is used
     to aggregate over assets and hazards.
     Finally, scores are assigned based on the aggregate quantities.
+    Scenario/year combinations, and the event batches of each, can be run concurrently over max_workers
+    threads; results for a given seed do not depend on max_workers. If convergence criteria are given, the
+    number of events is chosen adaptively rather than fixed at n_events; sampling selects how the severities
+    of events are sampled and, if given, severity_zone_resolution the H3 resolution of spatially correlated
+    severity zones. Alternatively, the severities can be read from an event set.
     """
 
-    def __init__(self, n_events: int = 50000, event_batch_sz: int = 1000):
+    def __init__(
+        self,
+        n_events: int = 50000,
+        event_batch_sz: int = 1000,
+        seed: int = 111,
+        max_workers: Optional[int] = None,
+        convergence: Optional[ConvergenceCriteria] = None,
+        sampling: SeveritySampling = SeveritySampling.PSEUDO_RANDOM,
+        severity_zone_resolution: Optional[int] = None,
+        event_set: Optional[EventSet] = None,
+    ):
         self._n_events = n_events
         self._event_batch_sz = event_batch_sz
+        self._seed = seed
+        self._max_workers = max_workers
+        self._convergence = convergence
+        self._sampling = sampling
+        self._severity_zone_resolution = severity_zone_resolution
+        self._event_set = event_set
         self._definition = ScoreBasedRiskMeasureDefinition(
             hazard_types=[],
             values=[],
@@ -154,15 +182,35 @@ class CompanyRiskMeasureCalculator(PortfolioRiskMeasureCalculator):
         all_portfolio_quantities: dict[
             tuple[str, int | None], dict[RiskQuantityKey, Quantity]
         ] = {}
-        for scenario, year in impacts_by_year_scen.keys():
-            portfolio_quantities = aggregate_impacts(
+        scenario_years = list(impacts_by_year_scen.keys())
+        max_workers = self._max_workers or 1
+        # threads not used for scenario/year combinations are shared out over event batches
+        batch_workers = max(1, max_workers // max(1, len(scenario_years)))
+
+        def aggregate(scenario_year: tuple[str, int | None]):
+            scenario, year = scenario_year
+            return aggregate_impacts(
                 impacts,
                 financial_model,
                 scenario,
                 year,
                 n_events=self._n_events,
                 event_batch_sz=self._event_batch_sz,
+                seed=self._seed,
+                max_workers=batch_workers,
+                convergence=self._convergence,
+                sampling=self._sampling,
+                severity_zone_resolution=self._severity_zone_resolution,
+                event_set=self._event_set,
             )
+
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, max(1, len(scenario_years)))
+        ) as executor:
+            quantities_by_year_scen = list(executor.map(aggregate, scenario_years))
+        for (scenario, year), portfolio_quantities in zip(
+            scenario_years, quantities_by_year_scen
+        ):
             all_portfolio_quantities[(scenario, year)] = portfolio_quantities
             damage, revenue_loss, costs_increase = (
                 portfolio_quantities[RiskQuantityKey(quantity=qt)]
@@ -173,7 +221,10 @@ class CompanyRiskMeasureCalculator(PortfolioRiskMeasureCalculator):
                 ]
             )
             score = self.calculate_scores(
-                damage.values, revenue_loss.values, costs_increase.values
+                damage.values,
+                revenue_loss.values,
+                costs_increase.values,
+                weights=damage.weights,
             )
             measures[MeasureKey(None, scenario, year, None, None)] = Measure(
                 score=Category(round(score)),
@@ -189,7 +240,11 @@ class CompanyRiskMeasureCalculator(PortfolioRiskMeasureCalculator):
         return False
 
     def calculate_scores(
-        self, damage: np.ndarray, revenue_loss: np.ndarray, costs_increase: np.ndarray
+        self,
+        damage: np.ndarray,
+        revenue_loss: np.ndarray,
+        costs_increase: np.ndarray,
+        weights: Optional[np.ndarray] = None,
     ):
         # very simple model
         # take as a parameter EBITDA / revenue = 0.2
@@ -213,5 +268,5 @@ class CompanyRiskMeasureCalculator(PortfolioRiskMeasureCalculator):
             (damage_shock, ebitda_shock), score_matrix
         )
         scores = interpolator(np.stack([damage, ebitda], axis=1))
-        final_score = np.quantile(scores, 0.99)
+        final_score = weighted_quantile(scores, np.array(0.99), weights)
         return final_score
@@ -1,3 +1,9 @@
+from functools import lru_cache
+from typing import Tuple, TypeVar, Union
+
+import numpy as np
+from pint import UnitRegistry
+
 UNITLESS = {"index", ""}
 
 
@@ -31,3 +37,55 @@ def needs_conversion(source_units: str, target_units: str | None) -> bool:
         )
 
     return True
+
+
+@lru_cache(maxsize=1)
+def unit_registry() -> UnitRegistry:
+    """Return the unit registry shared by physrisk; this is created on first use as creation is slow."""
+    return UnitRegistry()
+
+
+@lru_cache(maxsize=256)
+def conversion_factors(source_units: str, target_units: str) -> Tuple[float, float]:
+    """Return the scale and offset that convert values from source to target units.
+
+    Conversions are resolved using pint once per pair of units and thereafter served from
+    the cache. Units related by an offset (e.g. degC and degF) are supported as well as
+    purely multiplicative units.
+
+    Args:
+        source_units: Units of the values to convert.
+        target_units: Units to convert to.
+
+    Returns:
+        ``(scale, offset)`` such that ``target = scale * source + offset``.
+    """
+    registry = unit_registry()
+    offset = float(registry.convert(0.0, source_units, target_units))
+    if offset == 0.0:
+        return float(registry.convert(1.0, source_units, target_units)), 0.0
+    # with an offset, scale is taken over a wide interval to limit rounding error
+    span = 1000.0
+    scale = (float(registry.convert(span, source_units, target_units)) - offset) / span
+    return scale, offset
+
+
+T = TypeVar("T", bound=Union[float, np.ndarray])
+
+
+def convert_units(values: T, source_units: str, target_units: str) -> T:
+    """Convert values between units, as ``pint.UnitRegistry.convert`` but using cached
+    conversion factors applied as a numpy affine transform.
+
+    Args:
+        values: Value or array of values in source units.
+        source_units: Units of the values.
+        target_units: Units to convert to.
+
+    Returns:
+        Values in target units.
+    """
+    scale, offset = conversion_factors(source_units, target_units)
+    if offset == 0.0:
+        return values * scale  # type: ignore[return-value]
+    return values * scale + offset  # type: ignore[return-value]
@@ -1,15 +1,18 @@
+from collections import defaultdict
 from enum import Enum
 import logging
 from typing import (
+    Dict,
+    List,
+    Optional,
     Sequence,
     Tuple,
     Union,
 )
 
 import numpy as np
-from pint import UnitRegistry
 from physrisk.kernel.assets import Asset, HasStandardOfProtection
-from physrisk.kernel.curve import ExceedanceCurve
+from physrisk.kernel.curve import ExceedanceCurve, interp_rows
 from physrisk.kernel.hazard_event_distrib import (
     EmptyHazardEventDistrib,
     HazardEventDistrib,
@@ -26,12 +29,19 @@ from physrisk.kernel.hazards import (
     PluvialInundation,
     RiverineInundation,
 )
-from physrisk.kernel.impact_distrib import ImpactType
+from physrisk.kernel.impact_distrib import (
+    EmptyImpactDistrib,
+    ImpactDistrib,
+    ImpactType,
+)
 from physrisk.kernel.vulnerability_distrib import (
     EmptyVulnerabilityDistrib,
     VulnerabilityDistrib,
 )
-from physrisk.kernel.vulnerability_model import VulnerabilityModelAcuteBase
+from physrisk.kernel.vulnerability_model import (
+    ImpactDetails,
+    VulnerabilityModelAcuteBase,
+)
 from physrisk.vulnerability_models.config_based_impact_curves import ImpactCurve
 from physrisk.vulnerability_models.config_cdf_based_vuln_function import (
     CDFBasedVulnerabilityFunction,
@@ -39,9 +49,8 @@ from physrisk.vulnerability_models.config_cdf_based_vuln_function import (
 from physrisk.vulnerability_models.impact_function_selector import (
     ImpactFunctionSelector,
 )
-from physrisk.utils.units import needs_conversion
+from physrisk.utils.units import convert_units, needs_conversion
 
-ureg = UnitRegistry()
 logger = logging.getLogger(__name__)
 
 
@@ -153,11 +162,14 @@ class ConfigBasedVulnerabilityModelAcute(VulnerabilityModelAcuteBase):
                 "Future hazard curve is not monotonic; adjusting to ensure non-decreasing curve."
             )
 
-        conversion = needs_conversion(future.units, curve.indicator_units)
-        if conversion:
-            fut_intensities = ureg.convert(
-                fut_intensities, future.units, curve.indicator_units
-            )
+        # units to convert to, or None if no conversion is needed
+        target_units = (
+            curve.indicator_units
+            if needs_conversion(future.units, curve.indicator_units)
+            else None
+        )
+        if target_units is not None:
+            fut_intensities = convert_units(fut_intensities, future.units, target_units)
 
         intensity_curve = ExceedanceCurve(1.0 / future.return_periods, fut_intensities)
 
@@ -172,9 +184,9 @@ class ConfigBasedVulnerabilityModelAcute(VulnerabilityModelAcuteBase):
                     "Historical hazard curve is not monotonic; adjusting to ensure non-decreasing curve."
                 )
                 # can occur in case of API-based hazard models
-            if conversion:
-                histo_intensities = ureg.convert(
-                    histo_intensities, histo.units, curve.indicator_units
+            if target_units is not None:
+                histo_intensities = convert_units(
+                    histo_intensities, histo.units, target_units
                 )
 
             histo_curve = ExceedanceCurve(1.0 / histo.return_periods, histo_intensities)
@@ -199,18 +211,20 @@ class ConfigBasedVulnerabilityModelAcute(VulnerabilityModelAcuteBase):
 
         if isinstance(curve, ImpactCurve):
             impact_bin_edges = curve.get_impact(indicator_bin_edges)
-            prob_matrix = np.eye(len(probabilities))
+            vul = VulnerabilityDistrib.diagonal(
+                self.hazard_type,
+                indicator_bin_edges,
+                impact_bin_edges,
+                hazard_indicator_id=self.indicator_id,
+            )
         elif isinstance(curve, CDFBasedVulnerabilityFunction):
-            impact_bin_edges = curve.impact
-            prob_matrix = curve.prob_matrix_for_indicator_bins(indicator_bin_edges)
-
-        vul = VulnerabilityDistrib(
-            self.hazard_type,
-            indicator_bin_edges,
-            impact_bin_edges,
-            prob_matrix,
-            hazard_indicator_id=self.indicator_id,
-        )
+            vul = VulnerabilityDistrib(
+                self.hazard_type,
+                indicator_bin_edges,
+                curve.impact,
+                curve.prob_matrix_for_indicator_bins(indicator_bin_edges),
+                hazard_indicator_id=self.indicator_id,
+            )
         event = HazardEventDistrib(
             self.hazard_type,
             indicator_bin_edges,
@@ -220,6 +234,235 @@ class ConfigBasedVulnerabilityModelAcute(VulnerabilityModelAcuteBase):
         )
         return vul, event
 
+    def get_impacts_batch(
+        self,
+        assets: Sequence[Asset],
+        hazard_data_matrix: Sequence[Sequence[HazardDataResponse]],
+    ) -> List[ImpactDetails]:
+        """Batched version of get_impact_details. Assets are grouped by the curve returned by the
+        selector and by the number of hazard curve points; the standard-of-protection adjustment is
+        applied to each group as a whole and each curve is evaluated once per group for the stacked
+        intensity bin edges of its assets.
+        """
+        results: List[Optional[ImpactDetails]] = [None] * len(assets)
+        # curves are grouped by the number of points of future and historical hazard curves
+        groups: Dict[Tuple[int, int], List[_BatchItem]] = defaultdict(list)
+        for i, (asset, data_responses) in enumerate(zip(assets, hazard_data_matrix)):
+            item = self._batch_item(i, asset, data_responses)
+            if item is None:
+                results[i] = self._get_impact_details_or_empty(asset, data_responses)
+            elif item.curve is None:
+                results[i] = (
+                    EmptyImpactDistrib(),
+                    EmptyVulnerabilityDistrib(),
+                    EmptyHazardEventDistrib(),
+                )
+            else:
+                groups[
+                    (
+                        len(item.intensities),
+                        len(item.histo_intensities) if item.sop > 0 else 0,
+                    )
+                ].append(item)
+
+        # intensity bin edges and probabilities of each item, grouped by curve and number of bins
+        curve_groups: Dict[Tuple[int, int], List[Tuple[_BatchItem, np.ndarray]]] = (
+            defaultdict(list)
+        )
+        for items in groups.values():
+            for item, edges, probs in self._probability_bins_batch(items):
+                if edges is None:
+                    results[item.index] = self._get_impact_details_or_empty(
+                        assets[item.index], hazard_data_matrix[item.index]
+                    )
+                else:
+                    item.probabilities = probs
+                    curve_groups[(id(item.curve), len(edges))].append((item, edges))
+
+        for curve_items in curve_groups.values():
+            curve = curve_items[0][0].curve
+            indicator_bin_edges = np.stack([edges for _, edges in curve_items])
+            probabilities = np.stack([item.probabilities for item, _ in curve_items])
+            if isinstance(curve, ImpactCurve):
+                # note that the intensity bin edges may be capped by the curve
+                impact_bin_edges = curve.get_impact(indicator_bin_edges)
+                impact_probs = probabilities
+            else:
+                assert isinstance(curve, CDFBasedVulnerabilityFunction)
+                n_items, n_edges = indicator_bin_edges.shape
+                bin_edge_cdfs = curve.interpolate_cdfs(
+                    indicator_bin_edges.ravel()
+                ).reshape(n_items, n_edges, -1)
+                bin_centre_cdfs = (
+                    bin_edge_cdfs[:, 0:-1, :] + bin_edge_cdfs[:, 1:, :]
+                ) * 0.5
+                prob_matrices = bin_centre_cdfs[:, :, 1:] - bin_centre_cdfs[:, :, 0:-1]
+                impact_probs = np.einsum("kij,ki->kj", prob_matrices, probabilities)
+            for row, (item, _) in enumerate(curve_items):
+                data_responses = hazard_data_matrix[item.index]
+                if isinstance(curve, ImpactCurve):
+                    vul = VulnerabilityDistrib.diagonal(
+                        self.hazard_type,
+                        indicator_bin_edges[row],
+                        impact_bin_edges[row],
+                        hazard_indicator_id=self.indicator_id,
+                    )
+                else:
+                    vul = VulnerabilityDistrib(
+                        self.hazard_type,
+                        indicator_bin_edges[row],
+                        curve.impact,
+                        prob_matrices[row],
+                        hazard_indicator_id=self.indicator_id,
+                    )
+                event = HazardEventDistrib(
+                    self.hazard_type,
+                    indicator_bin_edges[row],
+                    probabilities[row],
+                    path=[data.path for data in data_responses],
+                    units=item.units,
+                )
+                impact = ImpactDistrib(
+                    vul.event_type,
+                    vul.impact_bins,
+                    impact_probs[row],
+                    hazard_indicator_id=vul.hazard_indicator_id,
+                    impact_type=self.impact_type,
+                    path=event.path,
+                )
+                results[item.index] = (impact, vul, event)
+        return results  # type: ignore
+
+    def _batch_item(
+        self, index: int, asset: Asset, data_responses: Sequence[HazardDataResponse]
+    ) -> Optional["_BatchItem"]:
+        """Prepare the hazard curves of an asset for the batched calculation, or return None
+        if the asset is to be processed individually."""
+        standard_of_protection = 0.0
+        histo: Optional[HazardDataResponse] = None
+        if len(data_responses) == 3:
+            (future, histo, sop) = data_responses
+            if not isinstance(sop, HazardParameterDataResponse):
+                return None
+            standard_of_protection = sop.parameter
+        elif len(data_responses) == 2:
+            (future, histo) = data_responses
+        elif len(data_responses) == 1:
+            (future,) = data_responses
+        else:
+            return None
+        if not isinstance(future, HazardEventDataResponse):
+            return None
+        curve = self.selector.select(
+            asset, self.hazard_type, self.indicator_id, self.impact_type
+        )
+        if curve is None:
+            return _BatchItem(index, None, future.units)
+        if not isinstance(curve, (ImpactCurve, CDFBasedVulnerabilityFunction)):
+            return None
+        standard_of_protection = self._asset_specific_sop(asset, standard_of_protection)
+        item = _BatchItem(index, curve, future.units)
+        target_units = (
+            curve.indicator_units
+            if needs_conversion(future.units, curve.indicator_units)
+            else None
+        )
+        item.exceed_probs = 1.0 / future.return_periods
+        item.intensities = self._non_decreasing(future.intensities, "Future")
+        if target_units is not None:
+            item.intensities = convert_units(
+                item.intensities, future.units, target_units
+            )
+        if standard_of_protection > 0:
+            if not isinstance(histo, HazardEventDataResponse):
+                return None
+            item.sop = standard_of_protection
+            item.histo_exceed_probs = 1.0 / histo.return_periods
+            item.histo_intensities = self._non_decreasing(
+                histo.intensities, "Historical"
+            )
+            if target_units is not None:
+                item.histo_intensities = convert_units(
+                    item.histo_intensities, histo.units, target_units
+                )
+        return item
+
+    @staticmethod
+    def _non_decreasing(intensities: np.ndarray, description: str):
+        if not np.all(np.diff(intensities) >= 0):
+            logging.warning(
+                f"{description} hazard curve is not monotonic; adjusting to ensure non-decreasing curve."
+            )
+            return np.maximum.accumulate(intensities)
+        return intensities
+
+    def _probability_bins_batch(self, items: Sequence["_BatchItem"]):
+        """For items with hazard curves of the same number of points, apply the standard of protection
+        and convert the exceedance curves into intensity bin edges and probabilities (as
+        ExceedanceCurve.get_probability_bins with include_last=True). Yields the item with its bin edges
+        and probabilities, or with None if the item must be processed individually.
+        """
+        values = np.stack([item.intensities for item in items])
+        probs = np.stack([item.exceed_probs for item in items])
+        # the checks of ExceedanceCurve
+        valid = np.all(np.diff(probs, axis=1) <= 0, axis=1) & np.all(
+            np.diff(values, axis=1) >= 0, axis=1
+        )
+        sop = np.array([item.sop for item in items])
+        protected_depth = np.zeros(len(items))
+        has_sop = sop > 0
+        if np.any(has_sop):
+            histo_values = np.stack(
+                [item.histo_intensities for item in items if item.sop > 0]
+            )
+            histo_probs = np.stack(
+                [item.histo_exceed_probs for item in items if item.sop > 0]
+            )
+            valid[has_sop] &= np.all(
+                np.diff(histo_probs, axis=1) <= 0, axis=1
+            ) & np.all(np.diff(histo_values, axis=1) >= 0, axis=1)
+            if self.sop_type == StandardOfProtection.CONSTANT_RETURN:
+                protected_depth[has_sop] = interp_rows(
+                    1.0 / sop[has_sop],
+                    probs[has_sop, ::-1],
+                    values[has_sop, ::-1],
+                )
+            else:
+                protected_depth[has_sop] = interp_rows(
+                    1.0 / sop[has_sop], histo_probs[:, ::-1], histo_values[:, ::-1]
+                )
+        # where protected depth is positive, this is assumed in the future scenario: the point
+        # (protected depth, interpolated probability) is added to the curve and points of lower value removed
+        n = values.shape[1]
+        start = np.count_nonzero(values < protected_depth[:, None], axis=1)
+        rows = np.arange(len(items))
+        upper = np.minimum(start, n - 1)
+        lower = np.maximum(start - 1, 0)
+        exists = (start < n) & (values[rows, upper] == protected_depth)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            protected_prob = np.where(
+                (start == 0) | (start == n),
+                probs[rows, upper],
+                probs[rows, lower]
+                + (protected_depth - values[rows, lower])
+                * (probs[rows, upper] - probs[rows, lower])
+                / (values[rows, upper] - values[rows, lower]),
+            )
+        add_point = (protected_depth > 0) & ~exists
+        start[protected_depth <= 0] = 0
+        for row, item in enumerate(items):
+            if not valid[row]:
+                yield item, None, None
+                continue
+            item_values = values[row, start[row] :]
+            item_probs = probs[row, start[row] :]
+            if add_point[row]:
+                item_values = np.insert(item_values, 0, protected_depth[row])
+                item_probs = np.insert(item_probs, 0, protected_prob[row])
+            edges = np.append(item_values, item_values[-1])
+            bin_probs = np.append(item_probs[:-1] - item_probs[1:], item_probs[-1])
+            yield item, edges, bin_probs
+
     def _asset_specific_sop(self, asset: Asset, standard_of_protection: float) -> float:
         if isinstance(asset, HasStandardOfProtection):
             asset_sop = asset.get_protection_return_period(self.hazard_type)
@@ -239,3 +482,35 @@ class ConfigBasedVulnerabilityModelAcute(VulnerabilityModelAcuteBase):
             f"{type(self).__name__}(hazard_class={self.hazard_type.__name__},"
             f"indicator_id='{self.indicator_id}',impact_type={self.impact_type})"
         )
+
+
+class _BatchItem:
+    """Hazard curves of a single asset within a batched calculation."""
+
+    __slots__ = [
+        "index",
+        "curve",
+        "units",
+        "intensities",
+        "exceed_probs",
+        "sop",
+        "histo_intensities",
+        "histo_exceed_probs",
+        "probabilities",
+    ]
+
+    def __init__(
+        self,
+        index: int,
+        curve: Optional[Union[ImpactCurve, CDFBasedVulnerabilityFunction]],
+        units: str,
+    ):
+        self.index = index
+        self.curve = curve
+        self.units = units
+        self.intensities = np.empty(0)
+        self.exceed_probs = np.empty(0)
+        self.sop = 0.0
+        self.histo_intensities = np.empty(0)
+        self.histo_exceed_probs = np.empty(0)
+        self.probabilities = np.empty(0)
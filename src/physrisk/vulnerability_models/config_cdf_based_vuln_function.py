@@ -2,7 +2,7 @@ from typing import Optional, Protocol
 from numba import njit
 import numpy as np
 
-from physrisk.kernel.vulnerability_model import checked_beta_distrib
+from physrisk.kernel.vulnerability_matrix_provider import beta_cdf_matrix
 
 
 class UncertainVulnerabilityFunction(Protocol):
@@ -148,10 +148,7 @@ class CDFBasedVulnerabilityFunction(UncertainVulnerabilityFunction):
     ):
         if kind == "beta":
             # this is done just once for curve
-            cdfs = np.zeros(shape=(len(impact_mean), len(impact_grid)))
-            for i, m, s in zip(range(len(impact_mean)), impact_mean, impact_stddev):
-                cdfs[i, :] = checked_beta_distrib(m, s)(impact_grid)
-            return cdfs
+            return beta_cdf_matrix(impact_mean, impact_stddev, impact_grid)
         else:
             # TODO add support for "truncated_gaussian"
             raise NotImplementedError()
@@ -185,6 +185,16 @@ class MultiIntervalMatcher:
         # holding a reference to self in the cache itself.
         self._match_cached = lru_cache(maxsize=1024)(self._match_impl)
 
+    def __getstate__(self):
+        # the per-instance cache cannot be pickled (e.g. to send to worker processes): recreated on unpickling
+        state = self.__dict__.copy()
+        del state["_match_cached"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._match_cached = lru_cache(maxsize=1024)(self._match_impl)
+
     @property
     def attributes(self) -> set[str]:
         return set(self._attr_data.keys()) | set(self._str_attr_data.keys())
@@ -279,6 +279,16 @@ class OEDHazusMapper:
             slice(5350, 5399),  # "mobile home"
         ]
 
+    def __getstate__(self):
+        # the per-instance cache cannot be pickled (e.g. to send to worker processes): recreated on unpickling
+        state = self.__dict__.copy()
+        del state["_get_cached"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._get_cached = lru_cache(maxsize=1000)(self._get)
+
     def hazard_types(self):
         return [RiverineInundation, CoastalInundation, PluvialInundation]
 
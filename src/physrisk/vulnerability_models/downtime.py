@@ -35,10 +35,14 @@ class ConfigBasedDowntimeModel(DowntimeModelBase):
         )
 
     def get_impact(self, asset: Asset, frac_damage: np.ndarray) -> np.ndarray:
-        curve = self.curves[
+        curve = self.curve_for_asset(asset)
+        return np.interp(frac_damage, curve.points_x, curve.points_y)
+
+    def curve_for_asset(self, asset: Asset) -> DowntimeConfigItem:
+        """The downtime curve applicable to the asset."""
+        return self.curves[
             ImpactCurveKey.get(asset, self.asset_attributes, self.curves.keys())
         ]
-        return np.interp(frac_damage, curve.points_x, curve.points_y)
 
 
 class DowntimeModels:
@@ -7,11 +7,10 @@ from physrisk.kernel.hazard_model import HazardDataRequest, HazardDataResponse
 from physrisk.kernel.hazards import Fire
 
 from ..kernel.impact_distrib import ImpactDistrib, ImpactType, PlaceholderImpactDistrib
-from ..kernel.vulnerability_matrix_provider import VulnMatrixProvider
+from ..kernel.vulnerability_matrix_provider import BetaVulnMatrixProvider
 from ..kernel.vulnerability_model import (
     VulnerabilityModel,
     VulnerabilityModelBase,
-    checked_beta_distrib,
 )
 
 
@@ -38,12 +37,7 @@ class ExampleCdfBasedVulnerabilityModel(VulnerabilityModel):
         # we interpolate the mean and standard deviation and use this to construct distributions
         impact_means = np.interp(intensities, self.intensities, self.impact_means)
         impact_stddevs = np.interp(intensities, self.intensities, self.impact_stddevs)
-        return VulnMatrixProvider(
-            intensities,
-            impact_cdfs=[
-                checked_beta_distrib(m, s) for m, s in zip(impact_means, impact_stddevs)
-            ],
-        )
+        return BetaVulnMatrixProvider(intensities, impact_means, impact_stddevs)
 
 
 class PlaceholderVulnerabilityModel(VulnerabilityModelBase):
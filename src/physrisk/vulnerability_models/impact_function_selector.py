@@ -1,11 +1,12 @@
 # selects impact curve based on asset properties
 
 import collections
+import threading
 from dataclasses import dataclass
 from importlib import import_module
 
 from importlib.resources import files
-from typing import NamedTuple, Protocol, Sequence
+from typing import Hashable, NamedTuple, Optional, Protocol, Sequence
 
 import pandas as pd
 import physrisk.data.static.vulnerability.oed_hazus
@@ -44,6 +45,10 @@ from physrisk.vulnerability_models.configuration.oed_hazus_mapping import (
 # Sentinel values that mean "unknown" for a given OED attribute.
 _UNKNOWN_SENTINELS: dict[str, int] = {"occupancy_code": 1000, "construction_code": 5000}
 
+default_selection_cache_max_items = 4096
+
+_MISSING = object()
+
 
 class ImpactFunctionSelector(Protocol):
     """Selects a vulnerability function based on asset properties. Instances are used, for example, within
@@ -92,8 +97,29 @@ class GroupLookup:
     has_oed_codes: bool  # True if any key constrains occupancy_code
 
 
+@dataclass
+class SelectionCacheStats:
+    hits: int
+    misses: int
+    evictions: int
+    items: int
+    max_items: int
+
+
 class ConfigBasedImpactFunctionSelector(ImpactFunctionSelector):
-    def __init__(self, config_items: Sequence[VulnerabilityConfigItem]):
+    def __init__(
+        self,
+        config_items: Sequence[VulnerabilityConfigItem],
+        cache_max_items: int = default_selection_cache_max_items,
+    ):
+        """Selects impact functions from configuration, matching on asset attributes.
+
+        Args:
+            config_items (Sequence[VulnerabilityConfigItem]): Vulnerability config.
+            cache_max_items (int, optional): Maximum number of selections to memoise. Selections depend only on
+                the asset class and the asset attributes used in matching, so portfolios of many assets typically
+                have few distinct selections. 0 disables memoisation. Defaults to 4096.
+        """
         physrisk_assets = import_module("physrisk.kernel.assets")
         physrisk_hazards = import_module("physrisk.kernel.hazards")
         grouped_items: dict[VulnModelKey, list[VulnerabilityConfigItem]] = (
@@ -160,6 +186,19 @@ class ConfigBasedImpactFunctionSelector(ImpactFunctionSelector):
             t: [a for a in t.mro() if a not in [t, object]] for t in all_asset_types
         }
 
+        # the asset attributes on which any selection can depend
+        self._asset_attributes = tuple(
+            sorted(set().union(*(g.asset_attributes for g in self._groups.values())))
+        )
+        self._cache: collections.OrderedDict[Hashable, Optional[_CurveType]] = (
+            collections.OrderedDict()
+        )
+        self._cache_lock = threading.Lock()
+        self._cache_max_items = cache_max_items
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._cache_evictions = 0
+
     def _get_indicator_id(self, indicator_id: str) -> str:
         if any(
             indicator_id.startswith(prefix) for prefix in ["flood_depth", "max_speed"]
@@ -210,6 +249,20 @@ class ConfigBasedImpactFunctionSelector(ImpactFunctionSelector):
         group = self._groups[oed_key]
         if not group.has_oed_codes:
             return None
+        return self._cached_select(
+            "oed", self._match_oed, asset, hazard_type, indicator_id, impact_type
+        )
+
+    def _match_oed(
+        self,
+        asset: Asset,
+        hazard_type: type[Hazard],
+        indicator_id: str,
+        impact_type: ImpactType,
+    ):
+        group = self._groups[
+            VulnModelKey(Asset, hazard_type, indicator_id, impact_type)
+        ]
         query = self._build_query(asset, group)
         matches = group.matcher.match(frozenset({"occupancy_code"}), **query)
         return group.curves[matches[0]] if matches else None
@@ -228,6 +281,22 @@ class ConfigBasedImpactFunctionSelector(ImpactFunctionSelector):
         returned early; if it didn't, the same occupancy_code value (or its
         absence) will continue to exclude it here via the matcher logic.
         """
+        return self._cached_select(
+            "type_location",
+            self._match_type_location,
+            asset,
+            hazard_type,
+            indicator_id,
+            impact_type,
+        )
+
+    def _match_type_location(
+        self,
+        asset: Asset,
+        hazard_type: type[Hazard],
+        indicator_id: str,
+        impact_type: ImpactType,
+    ):
         indicator_id = self._get_indicator_id(indicator_id)
         for asset_type in [type(asset)] + self._ancestors[type(asset)]:
             key = VulnModelKey(asset_type, hazard_type, indicator_id, impact_type)
@@ -240,6 +309,72 @@ class ConfigBasedImpactFunctionSelector(ImpactFunctionSelector):
                 return group.curves[matches[0]]
         return None
 
+    def _cached_select(
+        self,
+        phase: str,
+        select,
+        asset: Asset,
+        hazard_type: type[Hazard],
+        indicator_id: str,
+        impact_type: ImpactType,
+    ):
+        """Memoise a selection, keyed by the asset class and the values of the asset attributes
+        used in matching."""
+        if self._cache_max_items <= 0:
+            return select(asset, hazard_type, indicator_id, impact_type)
+        key = (
+            phase,
+            type(asset),
+            tuple(getattr(asset, attr, _MISSING) for attr in self._asset_attributes),
+            hazard_type,
+            indicator_id,
+            impact_type,
+        )
+        try:
+            with self._cache_lock:
+                result = self._cache.get(key, _MISSING)
+                if result is not _MISSING:
+                    self._cache.move_to_end(key)
+                    self._cache_hits += 1
+                    return result
+                self._cache_misses += 1
+        except TypeError:
+            # unhashable attribute values: selection is not memoised
+            return select(asset, hazard_type, indicator_id, impact_type)
+        result = select(asset, hazard_type, indicator_id, impact_type)
+        with self._cache_lock:
+            self._cache[key] = result
+            while len(self._cache) > self._cache_max_items:
+                self._cache.popitem(last=False)
+                self._cache_evictions += 1
+        return result
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
+    def __getstate__(self):
+        # the cache and its lock are not sent with the selector (e.g. to worker processes)
+        state = self.__dict__.copy()
+        del state["_cache_lock"]
+        state["_cache"] = collections.OrderedDict()
+        state["_cache_hits"] = state["_cache_misses"] = state["_cache_evictions"] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._cache_lock = threading.Lock()
+
+    def cache_stats(self) -> SelectionCacheStats:
+        with self._cache_lock:
+            return SelectionCacheStats(
+                hits=self._cache_hits,
+                misses=self._cache_misses,
+                evictions=self._cache_evictions,
+                items=len(self._cache),
+                max_items=self._cache_max_items,
+            )
+
     def _build_query(
         self,
         asset: Asset,
@@ -91,12 +91,12 @@ class InundationModel(VulnerabilityModelAcuteBase):
         # but this general version allows model uncertainties to be added
         probs_protected = np.where(depth_bins[1:] <= protection_depth, 0.0, 1.0)
 
-        vul = VulnerabilityDistrib(
+        vul = VulnerabilityDistrib.diagonal(
             RiverineInundation,
             depth_bins,
             impact_bins,
-            np.diag(probs_protected),
             hazard_indicator_id=self.indicator_id,
+            diagonal=probs_protected,
         )
         event = HazardEventDistrib(
             RiverineInundation, depth_bins, probs, [future.path], future.units
@@ -13,7 +13,10 @@ from physrisk.kernel.hazard_model import (
     HazardParameterDataResponse,
 )
 from physrisk.kernel.impact_distrib import ImpactDistrib, ImpactType
-from physrisk.kernel.vulnerability_matrix_provider import VulnMatrixProvider
+from physrisk.kernel.vulnerability_matrix_provider import (
+    BetaVulnMatrixProvider,
+    VulnMatrixProvider,
+)
 from physrisk.kernel.vulnerability_model import VulnerabilityModel
 
 from ..kernel.hazards import (
@@ -27,7 +30,6 @@ from ..kernel.vulnerability_model import (
     DeterministicVulnerabilityModel,
     VulnerabilityModelBase,
     applies_to_events,
-    checked_beta_distrib,
     get_vulnerability_curves_from_resource,
 )
 
@@ -136,11 +138,8 @@ class RealEstateInundationModel(VulnerabilityModel):
             intensity_bin_centres, std_curve.intensity, std_curve.impact_std
         )
 
-        return VulnMatrixProvider(
-            intensity_bin_centres,
-            impact_cdfs=[
-                checked_beta_distrib(m, s) for m, s in zip(impact_means, impact_stddevs)
-            ],
+        return BetaVulnMatrixProvider(
+            intensity_bin_centres, impact_means, impact_stddevs
         )
 
     def closest_curve_of_type(
@@ -200,11 +200,10 @@ class ThermalPowerGenerationInundationModel(DeterministicVulnerabilityModel):
         else:
             impact_bins = [0.0 for _ in intensity_bins]
 
-        vul = VulnerabilityDistrib(
+        vul = VulnerabilityDistrib.diagonal(
             self.hazard_type,
             intensity_bins,
             impact_bins,
-            np.eye(len(probability_bins)),
             hazard_indicator_id=self.indicator_id,
         )
         event = HazardEventDistrib(
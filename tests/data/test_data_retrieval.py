@@ -1,6 +1,7 @@
 from collections import defaultdict
 import logging
 import os
+import threading
 import time
 import pytest
 from typing import List, Optional, Sequence, Type
@@ -11,7 +12,7 @@ import numpy.testing
 import scipy.interpolate
 import zarr
 from fsspec.implementations.memory import MemoryFileSystem
-from shapely import Polygon
+from shapely import Point, Polygon
 
 from physrisk.api.v1.hazard_data import (
     HazardAvailabilityRequest,
@@ -26,12 +27,18 @@ from physrisk.data.hazard_data_provider import (
     ScenarioYear,
     SourcePaths,
 )
+from physrisk.data.chunk_cache import ChunkCache, DiskCacheStore
 from physrisk.data.inventory import EmbeddedInventory, Inventory
 from physrisk.data.inventory_reader import InventoryReader
+from physrisk.data import pregenerated_hazard_model
 from physrisk.data.pregenerated_hazard_model import ZarrHazardModel
-from physrisk.data.zarr_reader import ZarrReader
-from physrisk.kernel.hazard_model import HazardDataFailedResponse, HazardDataRequest
-from physrisk.kernel.hazards import Hazard, RiverineInundation, Wind
+from physrisk.data.zarr_reader import ChunkReadPlan, ZarrReader
+from physrisk.kernel.hazard_model import (
+    HazardDataBatch,
+    HazardDataFailedResponse,
+    HazardDataRequest,
+)
+from physrisk.kernel.hazards import Fire, Hazard, RiverineInundation, Wind
 from physrisk.requests import _get_hazard_data_availability
 
 # from pathlib import PurePosixPath
@@ -182,6 +189,202 @@ def test_zarr_bilinear_with_bad_data():
     numpy.testing.assert_allclose(candidate_min, expected_min, rtol=1e-6)
 
 
+def test_zarr_chunk_read_plan():
+    # array with chunked index dimension, edge chunks and one uninitialized chunk
+    rng = np.random.default_rng(seed=111)
+    store = zarr.storage.MemoryStore()
+    z = zarr.open(
+        store=store, mode="w", shape=(5, 10, 11), chunks=(2, 3, 4), dtype="f4"
+    )
+    data = rng.uniform(size=(5, 10, 11)).astype("f4")
+    data[:, 3:6, 4:8] = 0.0  # chunk (., 1, 1) never written, so fill value
+    z[:, 0:3, :] = data[:, 0:3, :]
+    z[:, 3:6, 0:4] = data[:, 3:6, 0:4]
+    z[:, 3:6, 8:] = data[:, 3:6, 8:]
+    z[:, 6:, :] = data[:, 6:, :]
+    iy = rng.integers(-10, 10, 200)
+    ix = rng.integers(0, 11, 200)
+    plan = ChunkReadPlan.create(z.shape, z.chunks, iy, ix)
+    assert len(plan.chunk_coords) == len(np.unique(plan.chunk_coords, axis=0))
+
+    class CountingStore(zarr.storage.KVStore):
+        def __init__(self, mutablemapping):
+            super().__init__(mutablemapping)
+            self.keys_read = []
+
+        def __getitem__(self, key):
+            self.keys_read.append(key)
+            return super().__getitem__(key)
+
+    counting_store = CountingStore(store)
+    z_counting = zarr.open(store=counting_store, mode="r")
+    values = ZarrReader._get_pixel_values(z_counting, iy, ix)
+    expected = data[:, iy, ix].T
+    numpy.testing.assert_equal(values, expected)
+    # each chunk is read once (and the uninitialized chunk not at all)
+    chunk_keys = [k for k in counting_store.keys_read if not k.startswith(".")]
+    assert len(chunk_keys) == len(set(chunk_keys))
+    assert len(chunk_keys) == (len(plan.chunk_coords) - 1) * 3
+    with pytest.raises(IndexError):
+        ZarrReader._get_pixel_values(z, np.array([10]), np.array([0]))
+
+
+def test_chunk_cache_lru():
+    cache = ChunkCache(max_bytes=3 * 800)
+    chunks = {i: np.full((10, 10), float(i)) for i in range(4)}  # 800 bytes each
+    for i in range(3):
+        cache.put(("ns", "path", (0, 0, i)), chunks[i])
+    assert cache.get(("ns", "path", (0, 0, 0))) is not None  # 0 now most recently used
+    cache.put(("ns", "path", (0, 0, 3)), chunks[3])
+    assert cache.get(("ns", "path", (0, 0, 1))) is None
+    assert not cache.get(("ns", "path", (0, 0, 3))).flags.writeable
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions) == (2, 1, 1)
+    assert (stats.items, stats.bytes) == (3, 3 * 800)
+    cache.max_bytes = 800
+    assert cache.stats().items == 1
+    assert cache.get(("ns", "path", (0, 0, 3))) is not None
+
+
+def test_zarr_reader_chunk_cache():
+    mocker = ZarrStoreMocker()
+    lons = [1.1, -0.31, 32.5]
+    lats = [47.0, 52.0, 16.0]
+    mocker.add_curves_global(
+        "test_set_world", lons, lats, [10.0, 100.0, 1000.0], [1.0, 2.0, 3.0]
+    )
+    cache = ChunkCache()
+    reader = ZarrReader(mocker.store, chunk_cache=cache)
+    curves1, _, _, _ = reader.get_curves("test_set_world", lons, lats)
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.items) == (0, 3, 3)
+    curves2, _, _, _ = reader.get_curves("test_set_world", lons, lats)
+    assert cache.stats().hits == 3
+    numpy.testing.assert_equal(curves1, curves2)
+    numpy.testing.assert_almost_equal(curves1[0, :], [1.0, 2.0, 3.0])
+    # readers with different (non-fsspec) stores must not share entries
+    other = ZarrStoreMocker()
+    other.add_curves_global(
+        "test_set_world", lons, lats, [10.0, 100.0, 1000.0], [4.0, 5.0, 6.0]
+    )
+    curves3, _, _, _ = ZarrReader(other.store, chunk_cache=cache).get_curves(
+        "test_set_world", lons, lats
+    )
+    numpy.testing.assert_almost_equal(curves3[0, :], [4.0, 5.0, 6.0])
+    # regions are assembled from cached chunks
+    z = reader.all_data("test_set_world")
+    numpy.testing.assert_equal(
+        reader.get_region(z, 1, slice(4900, 6100), slice(21300, 22500)),
+        z[1, 4900:6100, 21300:22500],
+    )
+
+
+def test_disk_cache_store(tmp_path, monkeypatch):
+    # a local directory store stands in for S3
+    source_root = zarr.open(
+        store=zarr.storage.DirectoryStore(str(tmp_path / "hazard.zarr")), mode="w"
+    )
+    z = source_root.create_dataset(
+        "test_array", shape=(3, 40, 40), chunks=(3, 10, 10), dtype="f4"
+    )
+    z[:, :, :] = np.arange(3 * 40 * 40, dtype="f4").reshape(3, 40, 40)
+    z.attrs["transform_mat3x3"] = [1.0, 0.0, 0.0, 0.0, -1.0, 40.0, 0.0, 0.0, 1.0]
+    z.attrs["index_values"] = [10.0, 100.0, 1000.0]
+
+    class CountingMapping(dict):
+        def __init__(self, path):
+            super().__init__()
+            self.directory_store = zarr.storage.DirectoryStore(path)
+            self.reads = 0
+
+        def __getitem__(self, key):
+            if not key.split("/")[-1].startswith("."):
+                self.reads += 1  # count chunk reads only
+            return self.directory_store[key]
+
+        def __contains__(self, key):
+            return key in self.directory_store
+
+    source = CountingMapping(str(tmp_path / "hazard.zarr"))
+    cache_dir = str(tmp_path / "cache")
+    store = DiskCacheStore(source, cache_dir, max_bytes=3 * (3 * 10 * 10 * 4 + 100))
+    lons, lats = [1.5, 11.5, 21.5], [38.5, 38.5, 38.5]  # 3 different chunks
+
+    def curves(store):
+        reader = ZarrReader(store, chunk_cache=ChunkCache(max_bytes=0))
+        return reader.get_curves("test_array", lons, lats)[0]
+
+    expected = z.get_coordinate_selection(
+        ([0, 1, 2] * 3, [1] * 9, [1] * 3 + [11] * 3 + [21] * 3)
+    )
+    numpy.testing.assert_equal(curves(store), expected.reshape(3, 3))
+    reads = source.reads
+    # chunks are now served from disk, also for a new store instance on the same directory
+    numpy.testing.assert_equal(
+        curves(DiskCacheStore(source, cache_dir)), expected.reshape(3, 3)
+    )
+    assert source.reads == reads
+    # corrupted files are discarded and fetched again
+    files = [f for f in (tmp_path / "cache").glob("*/*")]
+    assert len(files) == 3
+    files[0].write_bytes(files[0].read_bytes()[:-1] + b"x")
+    store = DiskCacheStore(source, cache_dir)
+    reads = source.reads
+    numpy.testing.assert_equal(curves(store), expected.reshape(3, 3))
+    assert source.reads - reads == 1
+    assert store.misses == 1
+    # size cap
+    total_bytes = sum(f.stat().st_size for f in (tmp_path / "cache").glob("*/*"))
+    store = DiskCacheStore(source, cache_dir, max_bytes=total_bytes - 1)
+    assert len([f for f in (tmp_path / "cache").glob("*/*")]) == 2
+    # failures to write to the cache do not fail the read
+    store.clear_cache()
+
+    def no_space(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr("physrisk.data.chunk_cache.tempfile.mkstemp", no_space)
+    numpy.testing.assert_equal(curves(store), expected.reshape(3, 3))
+    assert len([f for f in (tmp_path / "cache").glob("*/*")]) == 0
+
+
+def test_zarr_reader_array_info_cached():
+    mocker = ZarrStoreMocker()
+    lons = [1.1, -0.31]
+    lats = [47.0, 52.0]
+    mocker._add_curves(
+        "test_set_europe_only",
+        lons,
+        lats,
+        "epsg:3035",
+        [3, 39420, 38371],
+        [100.0, 0.0, 2648100.0, 0.0, -100.0, 5404500],
+        [10.0, 100.0, 1000.0],
+        [1.0, 2.0, 3.0],
+    )
+
+    class CountingStore(zarr.storage.KVStore):
+        def __init__(self, mutablemapping):
+            super().__init__(mutablemapping)
+            self.metadata_reads = 0
+
+        def __getitem__(self, key):
+            if key.split("/")[-1].startswith("."):
+                self.metadata_reads += 1
+            return super().__getitem__(key)
+
+    store = CountingStore(mocker.store)
+    reader = ZarrReader(store)
+    reader.in_bounds("test_set_europe_only", lons, lats)
+    metadata_reads = store.metadata_reads
+    curves, _, _, _ = reader.get_curves("test_set_europe_only", lons, lats)
+    reader.get_curves("test_set_europe_only", lons, lats, interpolation="linear")
+    numpy.testing.assert_almost_equal(curves[0, :], [1.0, 2.0, 3.0])
+    assert store.metadata_reads == metadata_reads
+    info = reader.array_info("test_set_europe_only")
+    assert info.transformer is not None and not info.longitude_0_360
+
+
 def test_zarr_geomax_on_grid():
     lons_ = np.array([3.92783])
     lats_ = np.array([50.882394])
@@ -282,6 +485,48 @@ def test_zarr_geomax():
     )
 
 
+def test_zarr_geomax_batch():
+    """Maxima of a batch of mixed shapes (points, polygons and a shape smaller than a pixel)
+    match those obtained shape by shape."""
+    store = zarr.storage.MemoryStore()
+    root = zarr.open(store=store, mode="w")
+    z = root.create_dataset(
+        "test_set", shape=(3, 200, 300), chunks=(3, 64, 64), dtype="f4"
+    )
+    rng = np.random.default_rng(seed=11)
+    data = rng.uniform(size=(3, 200, 300)).astype("f4")
+    data[:, 50:60, 50:60] = np.nan
+    z[:] = data
+    z.attrs["transform_mat3x3"] = [0.01, 0.0, 0.0, 0.0, -0.01, 2.0, 0.0, 0.0, 1.0]
+    z.attrs["index_values"] = [10, 100, 1000]
+    z.attrs["crs"] = "epsg:4326"
+    shapes = [
+        Point(0.513, 1.204).buffer(0.05),
+        Point(1.005, 0.731),
+        Point(0.553, 1.447).buffer(0.04),  # partially covers NaN region
+        Point(2.102, 0.331).buffer(0.002),  # smaller than a pixel
+        Polygon(((0.2, 0.2), (0.4, 0.2), (0.4, 0.25))),
+    ]
+    zarr_reader = ZarrReader(store, chunk_cache=ChunkCache(0))
+    for interpolation in ["floor", "linear", "max"]:
+        curves_max, _, _ = zarr_reader.get_max_curves(
+            "test_set", shapes, interpolation=interpolation
+        )
+        assert curves_max.shape == (len(shapes), 3)
+        for i, shape in enumerate(shapes):
+            expected, _, _ = zarr_reader.get_max_curves(
+                "test_set", [shape], interpolation=interpolation
+            )
+            numpy.testing.assert_equal(curves_max[i, :], expected[0, :])
+    curves_max, _, _ = zarr_reader.get_max_curves(
+        "test_set", shapes[1:2], interpolation="floor"
+    )
+    curves, _, _, _ = zarr_reader.get_curves(
+        "test_set", np.array([1.005]), np.array([0.731]), interpolation="floor"
+    )
+    numpy.testing.assert_equal(curves_max, curves)
+
+
 def test_reproject():
     """Test adding data in a non-ESPG-4326 coordinate reference system. Check that the round tip yields
     the correct results."""
@@ -508,6 +753,261 @@ def test_cascade():
     np.testing.assert_almost_equal(response[requests[15]].intensities, [1.0, 2.0, 3.0])
 
 
+def test_hazard_data_batch():
+    """Columnar responses are consistent with the Mapping view and with responses created
+    via HazardDataBatch.from_responses."""
+    mocker = ZarrStoreMocker()
+    # Europe, Europe, not Europe
+    lons = [1.1, -0.31, 32.5]
+    lats = [47.0, 52.0, 16.0]
+    mocker._add_curves(
+        "test_set_europe_only",
+        lons[0:2],
+        lats[0:2],
+        "epsg:3035",
+        [3, 39420, 38371],
+        [100.0, 0.0, 2648100.0, 0.0, -100.0, 5404500],
+        [10.0, 100.0, 1000.0],
+        np.array([[1.0, 2.0, 3.0], [1.0, float("nan"), 3.0]]),
+    )
+    requests = [
+        HazardDataRequest(
+            hazard_type=RiverineInundation,
+            longitude=float(lon),
+            latitude=float(lat),
+            indicator_id="flood_depth",
+            scenario="ssp585",
+            year=year,
+        )
+        for year in [2050, 2080]
+        for lat, lon in zip(lats, lons)
+    ]
+    source_paths = SourcePathsTest(cascade=False)
+    hazard_model = ZarrHazardModel(source_paths=source_paths, store=mocker.store)
+    batch = hazard_model.get_hazard_data_batch(requests)
+    np.testing.assert_equal(batch.coverage_mask, [True, True, False] * 2)
+    np.testing.assert_equal(batch.lengths, [3, 2, 0] * 2)
+    np.testing.assert_almost_equal(batch.values_2d[1, 0:2], [1.0, 3.0])
+    np.testing.assert_almost_equal(batch.indices[1, 0:2], [10.0, 1000.0])
+    assert batch.failures[batch.failure_codes[2]].reason == "out of bounds"
+    assert len(batch) == len(requests)
+    for i, req in enumerate(requests):
+        assert batch[req] is batch.response(i)
+    assert list(batch.values()) == [batch.response(i) for i in range(len(requests))]
+    np.testing.assert_almost_equal(batch[requests[0]].intensities, [1.0, 2.0, 3.0])
+    np.testing.assert_almost_equal(batch[requests[4]].return_periods, [10.0, 1000.0])
+    assert batch[requests[0]].units == "m"
+    assert isinstance(batch[requests[5]], HazardDataFailedResponse)
+
+    from_responses = HazardDataBatch.from_responses(requests, dict(batch))
+    np.testing.assert_equal(from_responses.kinds, batch.kinds)
+    np.testing.assert_equal(from_responses.lengths, batch.lengths)
+    np.testing.assert_equal(from_responses.values_2d, batch.values_2d)
+    assert [from_responses.paths[c] for c in from_responses.path_codes[0:2]] == [
+        batch.paths[c] for c in batch.path_codes[0:2]
+    ]
+
+
+async def test_async_hazard_data_and_shared_threads(monkeypatch):
+    mocker = ZarrStoreMocker()
+    lons = [1.1, -0.31]
+    lats = [47.0, 52.0]
+    mocker.add_curves_global(
+        "test_set_europe_only", lons, lats, [10.0, 100.0], [4.0, 5.0]
+    )
+    requests = [
+        HazardDataRequest(
+            hazard_type=RiverineInundation,
+            longitude=float(lon),
+            latitude=float(lat),
+            indicator_id="flood_depth",
+            scenario="ssp585",
+            year=2050,
+        )
+        for lat, lon in zip(lats, lons)
+    ]
+    hazard_model = ZarrHazardModel(
+        source_paths=SourcePathsTest(cascade=False), store=mocker.store
+    )
+    # called from within a running event loop
+    batch = await hazard_model.aget_hazard_data(requests)
+    np.testing.assert_almost_equal(batch[requests[1]].intensities, [4.0, 5.0])
+    response = hazard_model.get_hazard_data(requests)
+    np.testing.assert_almost_equal(response[requests[0]].intensities, [4.0, 5.0])
+    # models, e.g. created per API request, share the IO loop and thread pool
+    for _ in range(20):
+        other_model = ZarrHazardModel(
+            source_paths=SourcePathsTest(cascade=False), store=mocker.store
+        )
+        other_model.get_hazard_data(requests)
+        assert other_model._get_loop() is hazard_model._get_loop()
+    physrisk_threads = [
+        t for t in threading.enumerate() if t.name.startswith("physrisk")
+    ]
+    # the IO loop thread plus at most the pool's workers
+    assert len(physrisk_threads) <= hazard_model.zarr_max_workers + 1
+
+    # shutting down releases the pool's threads; a new pool is sized by the next model
+    pregenerated_hazard_model.shutdown()
+    assert not any(t.name.startswith("physrisk-hazard") for t in threading.enumerate())
+    warnings: List[str] = []
+    monkeypatch.setattr(
+        pregenerated_hazard_model.logger, "warning", lambda msg: warnings.append(msg)
+    )
+    small_model = ZarrHazardModel(
+        source_paths=SourcePathsTest(cascade=False),
+        store=mocker.store,
+        zarr_max_workers=2,
+    )
+    small_model.get_hazard_data(requests)
+    assert not warnings
+    # the pool is not resized for a model with different zarr_max_workers, but a warning is logged once
+    hazard_model.get_hazard_data(requests)
+    hazard_model.get_hazard_data(requests)
+    assert len(warnings) == 1 and "zarr_max_workers of 32 ignored" in warnings[0]
+    physrisk_threads = [
+        t for t in threading.enumerate() if t.name.startswith("physrisk-hazard")
+    ]
+    assert len(physrisk_threads) <= 2
+    pregenerated_hazard_model.shutdown()
+
+
+class SourcePathsByHazard(SourcePaths):
+    """Source paths with an array per hazard type and scenario."""
+
+    def hazard_types(self):
+        return [RiverineInundation, Fire]
+
+    def resource_paths(
+        self,
+        hazard_type: Type[Hazard],
+        indicator_id: str,
+        scenarios: Sequence[str],
+        hint: Optional[HazardDataHint] = None,
+    ) -> List[ResourcePaths]:
+        name = hazard_type.__name__
+        return [
+            ResourcePaths(
+                resource_path=name,
+                scenarios={
+                    "ssp585": ScenarioPaths(
+                        years=[2050], path=lambda y: f"{name}_ssp585"
+                    ),
+                    "historical": ScenarioPaths(
+                        years=[-1], path=lambda y: f"{name}_historical"
+                    ),
+                },
+                units="default",
+            )
+        ]
+
+
+def test_unpack_hazard_data():
+    mocker = ZarrStoreMocker()
+    # the last location is outside of the Europe-only flood arrays
+    lons = [1.1, -0.31, 1.15, -84.0]
+    lats = [47.0, 52.0, 47.1, 38.0]
+    for scenario, offset in [("ssp585", 0.0), ("historical", -0.5)]:
+        mocker._add_curves(
+            f"RiverineInundation_{scenario}",
+            lons[0:3],
+            lats[0:3],
+            "epsg:3035",
+            [3, 39420, 38371],
+            [100.0, 0.0, 2648100.0, 0.0, -100.0, 5404500],
+            [10.0, 100.0, 1000.0],
+            np.array(
+                [
+                    [1.0, 2.0, 3.0],
+                    [np.nan, 2.0, 3.0],
+                    [np.nan, np.nan, np.nan],
+                ]
+            )
+            + offset,
+        )
+        mocker.add_curves_global(
+            f"Fire_{scenario}",
+            lons,
+            lats,
+            [0],
+            np.array([[0.1], [np.nan], [-0.2], [0.3]]) + offset,
+        )
+
+    def request(hazard_type, indicator_id, lat, lon, scenario):
+        return HazardDataRequest(
+            hazard_type=hazard_type,
+            longitude=lon,
+            latitude=lat,
+            indicator_id=indicator_id,
+            scenario=scenario,
+            year=2050,
+        )
+
+    # scenarios interleaved, so that the rows of each scenario/year are not contiguous
+    flood_requests = [
+        request(RiverineInundation, "flood_depth", lat, lon, scenario)
+        for lat, lon in zip(lats, lons)
+        for scenario in ["ssp585", "historical"]
+    ]
+    fire_requests = [
+        request(Fire, "fire_probability", lat, lon, scenario)
+        for lat, lon in zip(lats, lons)
+        for scenario in ["ssp585", "historical"]
+    ]
+    requests = flood_requests + fire_requests
+    source_paths = SourcePathsByHazard()
+
+    # by default, NaN fire probabilities are zero and negative ones are floored at zero
+    responses = ZarrHazardModel(
+        source_paths=source_paths, store=mocker.store
+    ).get_hazard_data(requests)
+    for i, offset in enumerate([0.0, -0.5]):
+        # NaN event intensities are removed; if none remain, the intensity is zero
+        np.testing.assert_allclose(
+            responses[flood_requests[i]].intensities, np.array([1.0, 2.0, 3.0]) + offset
+        )
+        np.testing.assert_allclose(
+            responses[flood_requests[i]].return_periods, [10.0, 100.0, 1000.0]
+        )
+        np.testing.assert_allclose(
+            responses[flood_requests[2 + i]].intensities,
+            np.array([2.0, 3.0]) + offset,
+        )
+        np.testing.assert_allclose(
+            responses[flood_requests[2 + i]].return_periods, [100.0, 1000.0]
+        )
+        np.testing.assert_allclose(responses[flood_requests[4 + i]].intensities, [0.0])
+        assert responses[flood_requests[6 + i]].reason == "out of bounds"
+    np.testing.assert_allclose(
+        [responses[req].parameters[0] for req in fire_requests],
+        [0.1, 0.0, 0.0, 0.0, 0.0, 0.0, 0.3, 0.0],
+    )
+
+    # otherwise, a NaN fire probability is a failed response, without affecting the others
+    responses = ZarrHazardModel(
+        source_paths=source_paths,
+        store=mocker.store,
+        nan_is_zero=set(),
+        nan_is_no_data={(Fire, "fire_probability")},
+    ).get_hazard_data(requests)
+    for i in [2, 3]:
+        assert responses[fire_requests[i]].reason == "unexpected nan"
+    np.testing.assert_allclose(
+        [responses[fire_requests[i]].parameters[0] for i in [0, 1, 4, 5, 6, 7]],
+        [0.1, -0.4, -0.2, -0.7, 0.3, -0.2],
+    )
+    assert [responses[req].path for req in fire_requests] == [
+        "Fire",
+        "Fire",
+        "",
+        "",
+        "Fire",
+        "Fire",
+        "Fire",
+        "Fire",
+    ]
+
+
 def test_error_cases():
     mocker = ZarrStoreMocker()
     # Europe, Europe, not Europe, not Europe, Europe
@@ -693,6 +1193,57 @@ def test_end_to_end_interpolation_years():
     np.testing.assert_almost_equal(response[requests[2]].intensities, expected_2090)
 
 
+def test_projection_reused_across_years(monkeypatch):
+    mocker = ZarrStoreMocker()
+    lons = [1.1, -0.31, 32.5]
+    lats = [47.0, 52.0, 16.0]
+    filenames = ["test_set_europe_only_historical"] + [
+        f"test_set_europe_only_{year}" for year in [2030, 2050, 2080]
+    ]
+    for i, filename in enumerate(filenames):
+        mocker._add_curves(
+            filename,
+            lons[0:2],
+            lats[0:2],
+            "epsg:3035",
+            [3, 39420, 38371],
+            [100.0, 0.0, 2648100.0, 0.0, -100.0, 5404500],
+            [10.0, 100.0, 1000.0],
+            np.array([[1.0, 1.5, 2.0], [1.0, 1.5, 2.0]]) + i,
+        )
+    requests = [
+        HazardDataRequest(
+            hazard_type=RiverineInundation,
+            longitude=float(lon),
+            latitude=float(lat),
+            indicator_id="flood_depth",
+            scenario=scenario,
+            year=year,
+        )
+        for lat, lon in zip(lats, lons)
+        for scenario, year in [("historical", -1), ("ssp585", 2040), ("ssp585", 2080)]
+    ]
+    n_projections = [0]
+    get_coordinates = ZarrReader._get_coordinates
+
+    def counting_get_coordinates(*args, **kwargs):
+        n_projections[0] += 1
+        return get_coordinates(*args, **kwargs)
+
+    monkeypatch.setattr(ZarrReader, "_get_coordinates", counting_get_coordinates)
+    hazard_model = ZarrHazardModel(
+        source_paths=SourcePathsYearsInterpolationTest(),
+        store=mocker.store,
+        interpolate_years=True,
+    )
+    response = hazard_model.get_hazard_data(requests)
+    assert n_projections[0] == 1
+    np.testing.assert_almost_equal(response[requests[0]].intensities, [1.0, 1.5, 2.0])
+    np.testing.assert_almost_equal(response[requests[1]].intensities, [2.5, 3.0, 3.5])
+    np.testing.assert_almost_equal(response[requests[5]].intensities, [4.0, 4.5, 5.0])
+    assert isinstance(response[requests[6]], HazardDataFailedResponse)
+
+
 def test_interpolation_monotonic():
     mocker = ZarrStoreMocker()
     # Europe, Europe, not Europe, not Europe, Europe
@@ -862,3 +1413,27 @@ def test_buffer_integration():
         response[requests[0]].intensities,
         [1.0, 2.0, 3.0],  # Europe
     )
+
+
+def test_buffered_shapes():
+    """Buffered geometries created for all points at once match those created point by point."""
+    rng = np.random.default_rng(seed=3)
+    longitudes = rng.uniform(-180, 180, size=50)
+    latitudes = np.concatenate([rng.uniform(-89, 89, size=49), [90.0]])
+    for buffer in [0, 10, 1000]:
+        shapes = HazardDataProvider._buffered_shapes(longitudes, latitudes, buffer)
+        for shape, longitude, latitude in zip(shapes, longitudes, latitudes):
+            expected = (
+                Point(longitude, latitude)
+                if buffer == 0
+                else Point(longitude, latitude).buffer(
+                    float(
+                        ZarrReader._get_equivalent_buffer_in_arc_degrees(
+                            latitude, buffer
+                        )
+                    )
+                )
+            )
+            assert shape.equals_exact(expected, 0)
+    with pytest.raises(Exception, match="between 0 and 1000"):
+        HazardDataProvider._buffered_shapes(longitudes, latitudes, 1001)
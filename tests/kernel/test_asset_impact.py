@@ -3,6 +3,7 @@
 import pytest
 
 import numpy as np
+from scipy import sparse
 
 from physrisk.kernel.assets import RealEstateAsset
 from physrisk.kernel.curve import ExceedanceCurve
@@ -11,6 +12,11 @@ from physrisk.kernel.hazard_model import HazardDataRequest
 from physrisk.kernel.hazards import RiverineInundation
 from physrisk.kernel.impact import ImpactDistrib
 from physrisk.kernel.vulnerability_distrib import VulnerabilityDistrib
+from physrisk.kernel.vulnerability_matrix_provider import (
+    BetaVulnMatrixProvider,
+    VulnMatrixProvider,
+)
+from physrisk.kernel.vulnerability_model import checked_beta_distrib
 from physrisk.vulnerability_models.real_estate_models import (
     RealEstateCoastalInundationModel,
     RealEstateRiverineInundationModel,
@@ -57,6 +63,29 @@ def test_impact_curve():
     assert mean == pytest.approx(4.8453897)
 
 
+def test_beta_vuln_matrix_provider():
+    """Vectorised beta distribution probability matrix agrees with the per-intensity CDFs,
+    including the degenerate cases where a delta distribution is used."""
+    intensity_bin_centres = np.array([0.0, 0.1, 0.2, 0.3, 0.4, 0.5, 0.6])
+    impact_means = np.array([0.0, 0.2, 0.3, 1.0, 0.5, 0.9, 0.4])
+    impact_stddevs = np.array([0.1, 0.0, 0.1, 0.2, 0.45, 0.05, 0.2])
+    impact_bin_edges = np.array([0, 0.01, 0.1, 0.2, 0.3, 0.5, 0.8, 1.0])
+    expected = VulnMatrixProvider(
+        intensity_bin_centres,
+        impact_cdfs=[
+            checked_beta_distrib(m, s) for m, s in zip(impact_means, impact_stddevs)
+        ],
+    ).to_prob_matrix(impact_bin_edges)
+    provider = BetaVulnMatrixProvider(
+        intensity_bin_centres, impact_means, impact_stddevs
+    )
+    np.testing.assert_allclose(provider.to_prob_matrix(impact_bin_edges), expected)
+    np.testing.assert_allclose(
+        provider.impact_cdfs[2](impact_bin_edges),
+        checked_beta_distrib(impact_means[2], impact_stddevs[2])(impact_bin_edges),
+    )
+
+
 def test_standard_deviations():
     impact_bins = np.array([0.0, 0.5, 1.0, 1.5])
     probs = np.array([0.1, 0.2, 0.15])
@@ -237,6 +266,61 @@ def test_single_asset_impact():
     assert mean == pytest.approx(4.8453897)
 
 
+def test_diagonal_and_sparse_vulnerability_distrib():
+    intensity_bins = np.array([0.0, 0.5, 1.0, 2.0])
+    impact_bins = np.array([0.0, 0.2, 0.5, 0.9])
+    event_probs = np.array([0.1, 0.05, 0.01])
+    diagonal = np.array([0.0, 1.0, 1.0])
+    dense = VulnerabilityDistrib(
+        RiverineInundation,
+        intensity_bins,
+        impact_bins,
+        np.diag(diagonal),
+        hazard_indicator_id="flood_depth",
+    )
+    vul = VulnerabilityDistrib.diagonal(
+        RiverineInundation,
+        intensity_bins,
+        impact_bins,
+        hazard_indicator_id="flood_depth",
+        diagonal=diagonal,
+    )
+    assert vul.is_diagonal and not dense.is_diagonal
+    np.testing.assert_allclose(
+        vul.impact_probabilities(event_probs), dense.impact_probabilities(event_probs)
+    )
+    # dense matrix is created on request
+    np.testing.assert_array_equal(vul.prob_matrix, dense.prob_matrix)
+    identity = VulnerabilityDistrib.diagonal(
+        RiverineInundation, intensity_bins, impact_bins, hazard_indicator_id=""
+    )
+    np.testing.assert_array_equal(
+        identity.impact_probabilities(event_probs), event_probs
+    )
+    np.testing.assert_array_equal(identity.prob_matrix, np.eye(3))
+    sparse_vul = VulnerabilityDistrib(
+        RiverineInundation,
+        intensity_bins,
+        impact_bins,
+        sparse.csr_matrix(np.diag(diagonal)),
+        hazard_indicator_id="flood_depth",
+    )
+    np.testing.assert_allclose(
+        sparse_vul.impact_probabilities(event_probs),
+        dense.impact_probabilities(event_probs),
+    )
+    np.testing.assert_array_equal(sparse_vul.prob_matrix, dense.prob_matrix)
+    with pytest.raises(ValueError):
+        VulnerabilityDistrib(
+            RiverineInundation,
+            intensity_bins,
+            impact_bins,
+            np.diag(diagonal),
+            hazard_indicator_id="flood_depth",
+            diagonal=diagonal,
+        )
+
+
 def test_performance_hazardlookup():
     asset_requests = {}
     import time
@@ -0,0 +1,55 @@
+"""Test quantile sketches."""
+
+import numpy as np
+
+from physrisk.kernel.quantile_sketch import QuantileSketch
+
+
+def test_sketch_matches_samples():
+    rng = np.random.default_rng(42)
+    values = rng.lognormal(0.0, 1.5, 200000)
+    weights = rng.uniform(0.5, 1.5, len(values))
+    quantiles = np.array([0.5, 0.9, 0.99, 0.999])
+    for w in [None, weights]:
+        sketch = QuantileSketch()
+        for batch in np.array_split(np.arange(len(values)), 100):
+            sketch.merge(
+                QuantileSketch.from_values(
+                    values[batch], None if w is None else w[batch]
+                )
+            )
+        assert sketch.count == len(values)
+        assert len(sketch._weights) < 1000
+        np.testing.assert_allclose(
+            sketch.mean, np.average(values, weights=w), rtol=1e-12
+        )
+        if w is None:
+            expected = np.quantile(values, quantiles)
+            np.testing.assert_allclose(
+                sketch.mean_standard_error(),
+                np.std(values, ddof=1) / np.sqrt(len(values)),
+                rtol=1e-9,
+            )
+            np.testing.assert_allclose(sketch.quantile(quantiles), expected, rtol=0.02)
+        np.testing.assert_allclose(
+            sketch.quantile(np.array([0.0, 1.0])), [np.min(values), np.max(values)]
+        )
+
+
+def test_merge_equivalent_to_add():
+    rng = np.random.default_rng(1)
+    a, b = rng.exponential(size=5000), rng.exponential(size=7000) + 1.0
+    merged = QuantileSketch.from_values(a)
+    merged.merge(QuantileSketch.from_values(b))
+    added = QuantileSketch.from_values(a)
+    added.add(b)
+    assert merged.count == added.count == 12000
+    np.testing.assert_allclose(merged.mean, added.mean, rtol=1e-12)
+    np.testing.assert_allclose(
+        merged.mean_standard_error(), added.mean_standard_error(), rtol=1e-9
+    )
+    np.testing.assert_allclose(
+        merged.quantile(np.array([0.5, 0.99])),
+        np.quantile(np.concatenate([a, b]), [0.5, 0.99]),
+        rtol=0.02,
+    )
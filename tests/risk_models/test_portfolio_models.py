@@ -2,7 +2,10 @@ import logging
 from typing import Dict, Optional
 
 from dependency_injector import providers
+import h3
 import numpy as np
+import pytest
+from scipy.stats import qmc
 
 from physrisk.api.v1.common import Asset as APIAsset, Assets
 from physrisk.api.v1.impact_req_resp import (
@@ -16,6 +19,7 @@ from physrisk.container import Container
 from physrisk.data.pregenerated_hazard_model import ZarrHazardModel
 from physrisk.hazard_models.core_hazards import get_default_source_paths
 from physrisk.kernel.assets import Asset, ManufacturingAsset
+from physrisk.kernel.calculation import DefaultMeasuresFactory
 from physrisk.kernel.financial_model import (
     DefaultFinancialModel,
     FinancialDataProvider,
@@ -31,9 +35,27 @@ from physrisk.kernel.hazards import (
     Wind,
 )
 from physrisk.kernel.impact import AssetImpactResult, ImpactKey
-from physrisk.kernel.impact_aggregator import aggregate_impacts
+from physrisk.kernel.curve import ExceedanceCurve
+from physrisk.kernel.impact_aggregator import (
+    AggregationMethod,
+    ConvergenceCriteria,
+    Events,
+    EventSet,
+    H3EventSeverityProvider,
+    ImportanceSamplingEventSeverityProvider,
+    LatinHypercubeEventSeverityProvider,
+    SeveritySampling,
+    SobolEventSeverityProvider,
+    _LossConverter,
+    _PackedExceedanceCurves,
+    aggregate_impacts,
+)
 from physrisk.kernel.impact_distrib import ImpactDistrib
 from physrisk.kernel.risk import QuantityType, RiskQuantityKey
+from physrisk.risk_models.portfolio_risk_model import CompanyRiskMeasureCalculator
+from physrisk.vulnerability_models.config_based_impact_curves import (
+    DowntimeConfigItem,
+)
 from physrisk.vulnerability_models.vulnerability import VulnerabilityModelsFactory
 from tests.data.test_hazard_model_store import ZarrStoreMocker
 from tests.vulnerability_models.test_config_based_vulnerability import create_store
@@ -123,10 +145,529 @@ def test_impact_aggregation():
     logger.info(
         f"Mean damage aggregating all assets and hazards using exact calculation: {mean_damage_exact}"
     )
-    np.testing.assert_allclose(mean_damage_mc, 0.000260859179)
+    np.testing.assert_allclose(mean_damage_mc, 0.000260729044)
     np.testing.assert_allclose(mean_damage_mc, mean_damage_exact, rtol=0.02)
 
 
+def test_vectorised_sampling_and_loss_conversion():
+    rng = np.random.default_rng(seed=42)
+    curves = [
+        ExceedanceCurve(
+            np.array([0.1, 0.02, 0.01, 0.001]), np.sort(rng.uniform(size=4))
+        ),
+        ExceedanceCurve(np.array([0.5, 0.1]), np.array([0.0, 0.3])),
+        ExceedanceCurve(np.array([0.01, 0.01, 0.0]), np.array([0.2, 0.4, 0.4])),
+    ]
+    uniforms = rng.random(size=(2, 1000), dtype=np.float32)
+    zones = np.array([0, 1, 1, 0])
+    curve_indices = np.array([2, 0, 1, 0])
+    samples = _PackedExceedanceCurves(curves).get_samples(
+        1.0 - uniforms, zones, curve_indices
+    )
+    for row, (zone, curve) in enumerate(zip(zones, curve_indices)):
+        np.testing.assert_array_equal(
+            samples[row], curves[curve].get_samples(1.0 - uniforms[zone])
+        )
+
+    downtime_config = [
+        DowntimeConfigItem(
+            asset_class="Asset",
+            asset_identifier="type=Generic,location=Generic",
+            points_x=[0.0, 0.1, 0.5],
+            points_y=[0.0, 0.0, 1.0],
+        )
+    ]
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=downtime_config
+    )
+    assets = [
+        ManufacturingAsset(id=f"asset_{i}", latitude=0.0, longitude=0.0)
+        for i in range(len(zones))
+    ]
+    converter = _LossConverter(
+        financial_model,
+        assets,
+        {a: 100.0 for a in assets},
+        {a: 200.0 for a in assets},
+    )
+    damage, revenue_loss = converter.convert(samples)
+    for row, asset in enumerate(assets):
+        expected_damage, expected_revenue_loss = (
+            financial_model.frac_damage_to_restoration_cost_and_revenue_loss(
+                asset, samples[row], "EUR"
+            )
+        )
+        np.testing.assert_allclose(damage[row], expected_damage)
+        np.testing.assert_allclose(revenue_loss[row], expected_revenue_loss)
+    assert np.any(revenue_loss > 0)
+
+    class DoubleDamageFinancialModel(DefaultFinancialModel):
+        def frac_damage_to_restoration_cost_and_revenue_loss(
+            self, asset, frac_damage, currency
+        ):
+            damage, revenue_loss = (
+                super().frac_damage_to_restoration_cost_and_revenue_loss(
+                    asset, frac_damage, currency
+                )
+            )
+            return 2 * damage, revenue_loss
+
+    converter = _LossConverter(
+        DoubleDamageFinancialModel(
+            data_provider=TestFinancialDataProvider(),
+            downtime_config=downtime_config,
+        ),
+        assets,
+        {a: 100.0 for a in assets},
+        {a: 200.0 for a in assets},
+    )
+    assert not converter.vectorised
+    np.testing.assert_allclose(converter.convert(samples)[0], 2 * damage)
+
+
+def wind_and_fire_impacts(n_assets: int = 20):
+    rng = np.random.default_rng(seed=42)
+    assets = [
+        ManufacturingAsset(id=f"asset_{i}", latitude=0.0, longitude=0.0)
+        for i in range(n_assets)
+    ]
+    impacts: Dict[ImpactKey, list[AssetImpactResult]] = {}
+    for asset in assets:
+        for hazard_type in [Wind, Fire]:
+            impacts[
+                ImpactKey(
+                    asset=asset,
+                    hazard_type=hazard_type,
+                    scenario="ssp585",
+                    key_year=2050,
+                )
+            ] = [
+                AssetImpactResult(
+                    impact=ImpactDistrib(
+                        hazard_type,
+                        np.array([0.0, 0.2, 0.5, 1.0]),
+                        rng.uniform(0.0, 0.05, size=3),
+                        "",
+                    )
+                )
+            ]
+    return impacts
+
+
+def test_impact_aggregation_independent_of_workers():
+    impacts = wind_and_fire_impacts()
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=[]
+    )
+
+    def aggregate(**kwargs):
+        return aggregate_impacts(
+            impacts,
+            financial_model,
+            "ssp585",
+            2050,
+            n_events=5000,
+            event_batch_sz=300,
+            **kwargs,
+        )
+
+    serial = aggregate()
+    for results in [aggregate(max_workers=4), aggregate(seed=111, max_workers=2)]:
+        assert results.keys() == serial.keys()
+        for key, quantity in serial.items():
+            assert results[key].mean == quantity.mean
+            if quantity.values is not None:
+                np.testing.assert_array_equal(results[key].values, quantity.values)
+    damage = RiskQuantityKey(quantity=QuantityType.DAMAGE)
+    assert aggregate(seed=1, max_workers=4)[damage].mean != serial[damage].mean
+
+
+def test_impact_aggregation_adaptive():
+    impacts = wind_and_fire_impacts()
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=[]
+    )
+
+    def aggregate(convergence: ConvergenceCriteria, **kwargs):
+        return aggregate_impacts(
+            impacts,
+            financial_model,
+            "ssp585",
+            2050,
+            event_batch_sz=500,
+            convergence=convergence,
+            **kwargs,
+        )
+
+    damage = RiskQuantityKey(quantity=QuantityType.DAMAGE)
+    criteria = ConvergenceCriteria(
+        mean_rtol=0.02, quantile_rtol=0.05, min_events=2000, max_events=500000
+    )
+    results = aggregate(criteria)
+    n_events = len(results[damage].values)
+    assert criteria.min_events <= n_events < criteria.max_events
+    quantity = results[damage]
+    assert quantity.mean_standard_error <= 0.02 * quantity.mean
+    # return periods of the exceedance curve are 10, 20, 50, 100, 200, 500 and 1000 years
+    assert (
+        quantity.exceedance_standard_error[4]
+        <= 0.05 * quantity.exceedance_curve.values[4]
+    )
+
+    # the events are those of the non-adaptive simulation, independent of the number of workers
+    fixed = aggregate_impacts(
+        impacts,
+        financial_model,
+        "ssp585",
+        2050,
+        n_events=n_events,
+        event_batch_sz=500,
+    )
+    np.testing.assert_array_equal(fixed[damage].values, quantity.values)
+    np.testing.assert_array_equal(
+        aggregate(criteria, max_workers=3)[damage].values, quantity.values
+    )
+
+    tighter = aggregate(
+        ConvergenceCriteria(
+            mean_rtol=0.01, quantile_rtol=0.02, min_events=2000, max_events=500000
+        )
+    )
+    assert len(tighter[damage].values) > n_events
+    capped = aggregate(ConvergenceCriteria(mean_rtol=1e-6, max_events=3000))
+    assert len(capped[damage].values) == 3000
+
+
+def test_impact_aggregation_streaming():
+    impacts = wind_and_fire_impacts()
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=[]
+    )
+
+    def aggregate(**kwargs):
+        return aggregate_impacts(
+            impacts,
+            financial_model,
+            "ssp585",
+            2050,
+            n_events=20000,
+            event_batch_sz=1000,
+            **kwargs,
+        )
+
+    exact = aggregate()
+    streamed = aggregate(streaming=True)
+    assert list(streamed.keys()) == list(exact.keys())
+    for key, quantity in exact.items():
+        if key.asset is not None:
+            continue
+        result = streamed[key]
+        assert result.values is None
+        np.testing.assert_allclose(result.mean, quantity.mean, rtol=1e-9, atol=1e-15)
+        np.testing.assert_allclose(
+            result.mean_standard_error,
+            quantity.mean_standard_error,
+            rtol=1e-6,
+            atol=1e-15,
+        )
+        # exceedance curves are approximate, but within their standard errors
+        np.testing.assert_allclose(
+            result.exceedance_curve.values,
+            quantity.exceedance_curve.values,
+            atol=1e-15,
+            rtol=0.05,
+        )
+    damage = RiskQuantityKey(quantity=QuantityType.DAMAGE)
+    assert (
+        aggregate(streaming=True, max_workers=3)[damage].mean == streamed[damage].mean
+    )
+    adaptive = aggregate(
+        streaming=True,
+        convergence=ConvergenceCriteria(
+            mean_rtol=0.02, quantile_rtol=0.05, min_events=2000
+        ),
+    )
+    assert adaptive[damage].mean_standard_error <= 0.02 * adaptive[damage].mean
+
+
+def test_severity_providers():
+    generator = np.random.default_rng(seed=42)
+    n_zones, n_events = 5, 1000
+    lhs = LatinHypercubeEventSeverityProvider({Wind: n_zones})
+    _, inv_severities = next(lhs.next_inv_severities_in_batch(n_events, generator))
+    assert inv_severities.shape == (n_zones, n_events)
+    # one event in each stratum for each severity zone
+    for zone_inv_severities in inv_severities:
+        np.testing.assert_array_equal(
+            np.sort(np.floor(zone_inv_severities * n_events)), np.arange(n_events)
+        )
+    sobol = SobolEventSeverityProvider({Wind: n_zones})
+    _, inv_severities = next(sobol.next_inv_severities_in_batch(n_events, generator))
+    assert inv_severities.shape == (n_zones, n_events)
+    assert np.all((inv_severities >= 0.0) & (inv_severities < 1.0))
+    assert sobol.event_weights(Wind, inv_severities) is None
+    # beyond the dimensions supported by Sobol sequences, Latin hypercube sampling is used
+    many_zones, few_events = qmc.Sobol.MAXDIM + 1, 16
+    sobol = SobolEventSeverityProvider({Wind: many_zones})
+    _, inv_severities = next(sobol.next_inv_severities_in_batch(few_events, generator))
+    assert inv_severities.shape == (many_zones, few_events)
+    np.testing.assert_array_equal(
+        np.sort(np.floor(inv_severities * few_events), axis=1),
+        np.tile(np.arange(few_events), (many_zones, 1)),
+    )
+
+    importance = ImportanceSamplingEventSeverityProvider(
+        {Wind: n_zones}, tail_probability=0.01, tail_fraction=0.5
+    )
+    _, inv_severities = next(importance.next_inv_severities_in_batch(200000, generator))
+    weights = importance.event_weights(Wind, inv_severities)
+    # rare severities are oversampled, with weights correcting the probabilities
+    assert np.mean(inv_severities[0] < 0.01) > 5 * 0.01
+    np.testing.assert_allclose(np.mean(weights), 1.0, rtol=0.01)
+    np.testing.assert_allclose(
+        np.mean(weights * (inv_severities[0] < 0.005)), 0.005, rtol=0.05
+    )
+
+
+def test_h3_severity_provider():
+    # two assets in central London, one in Paris
+    assets = [
+        ManufacturingAsset(latitude=51.507, longitude=-0.128),
+        ManufacturingAsset(latitude=48.857, longitude=2.352),
+        ManufacturingAsset(latitude=51.508, longitude=-0.127),
+    ]
+    provider = H3EventSeverityProvider({Wind: assets}, resolution=5)
+    zones, asset_indices = provider.severity_zone_asset_pairs(Wind)
+    np.testing.assert_array_equal(asset_indices, [0, 1, 2])
+    assert zones[0] == zones[2] != zones[1]
+    assert sorted(provider.severity_zone_to_asset_indices(Wind)) == [[0, 2], [1]]
+    _, inv_severities = next(
+        provider.next_inv_severities_in_batch(1000, np.random.default_rng(42))
+    )
+    # one severity per zone, rather than per asset
+    assert inv_severities.shape == (2, 1000)
+    fine = H3EventSeverityProvider({Wind: assets}, resolution=15)
+    assert len(fine.severity_zone_to_asset_indices(Wind)) == 3
+
+
+def test_impact_aggregation_correlated():
+    # assets are all at the same location, so in a single severity zone per hazard
+    impacts = wind_and_fire_impacts()
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=[]
+    )
+    damage = RiskQuantityKey(quantity=QuantityType.DAMAGE)
+    uncorrelated, correlated = (
+        aggregate_impacts(
+            impacts,
+            financial_model,
+            "ssp585",
+            2050,
+            n_events=20000,
+            severity_zone_resolution=resolution,
+        )[damage]
+        for resolution in [None, 7]
+    )
+    np.testing.assert_allclose(correlated.mean, uncorrelated.mean, rtol=0.05)
+    # 1-in-200 year loss
+    assert (
+        correlated.exceedance_curve.values[4]
+        > 2 * uncorrelated.exceedance_curve.values[4]
+    )
+
+
+def test_impact_aggregation_event_set(tmp_path):
+    impacts = wind_and_fire_impacts()
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=[]
+    )
+    damage = RiskQuantityKey(quantity=QuantityType.DAMAGE)
+    # all assets are in the same H3 cell, which is the only severity zone of the event set
+    zone = h3.str_to_int(h3.latlng_to_cell(0.0, 0.0, 7))
+    rng = np.random.default_rng(42)
+    n_events = 20000
+
+    def events(hazard_type, event_id, severity):
+        start = np.full(len(event_id), np.datetime64("2050-01-01"))
+        return Events(
+            hazard_type, event_id, start, start, np.full(len(event_id), zone), severity
+        )
+
+    fire_severity = 1.0 / rng.uniform(size=n_events)
+    # fire events of severity below 2 years are omitted, which is the same as a severity of 1 year
+    fire_ids = np.flatnonzero(fire_severity >= 2.0)
+    sparse = EventSet(
+        {
+            Wind: events(
+                Wind, rng.permutation(n_events), 1.0 / rng.uniform(size=n_events)
+            ),
+            Fire: events(Fire, fire_ids[::-1], fire_severity[fire_ids[::-1]]),
+        },
+        n_events,
+        7,
+    )
+    sparse.save(str(tmp_path / "event_set"))
+    loaded = EventSet.load(str(tmp_path / "event_set"))
+    assert isinstance(loaded.events[Wind].event_id, np.memmap)
+    dense = EventSet(
+        {
+            Wind: loaded.events[Wind],
+            Fire: events(
+                Fire,
+                np.arange(n_events),
+                np.where(fire_severity >= 2.0, fire_severity, 1.0),
+            ),
+        },
+        n_events,
+        7,
+    )
+
+    def aggregate(event_set, **kwargs):
+        return aggregate_impacts(
+            impacts, financial_model, "ssp585", 2050, event_set=event_set, **kwargs
+        )
+
+    results = aggregate(loaded, event_batch_sz=1000)
+    assert len(results[damage].values) == n_events
+    for result in [
+        aggregate(loaded, event_batch_sz=777, max_workers=3),
+        aggregate(dense, event_batch_sz=5000),
+    ]:
+        np.testing.assert_array_equal(result[damage].values, results[damage].values)
+    with pytest.raises(ValueError):
+        # events must be sorted by identifier, as saved
+        aggregate(sparse)
+    streamed = aggregate(loaded, streaming=True)
+    np.testing.assert_allclose(streamed[damage].mean, results[damage].mean, rtol=1e-9)
+
+    # with a single severity zone, the distribution is that of the fully correlated simulation
+    correlated = aggregate_impacts(
+        impacts,
+        financial_model,
+        "ssp585",
+        2050,
+        n_events=n_events,
+        severity_zone_resolution=7,
+    )[damage]
+    np.testing.assert_allclose(results[damage].mean, correlated.mean, rtol=0.05)
+    np.testing.assert_allclose(
+        results[damage].exceedance_curve.values[:4],
+        correlated.exceedance_curve.values[:4],
+        rtol=0.1,
+    )
+
+
+def test_impact_aggregation_severity_sampling():
+    impacts = wind_and_fire_impacts(5)
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(), downtime_config=[]
+    )
+    damage = RiskQuantityKey(quantity=QuantityType.DAMAGE)
+    exact = aggregate_impacts(
+        impacts,
+        financial_model,
+        "ssp585",
+        2050,
+        method=AggregationMethod.CONVOLUTION,
+    )[damage]
+    for sampling in SeveritySampling:
+        results = aggregate_impacts(
+            impacts, financial_model, "ssp585", 2050, n_events=20000, sampling=sampling
+        )
+        quantity = results[damage]
+        assert (quantity.weights is not None) == (
+            sampling == SeveritySampling.IMPORTANCE
+        )
+        if quantity.weights is not None:
+            np.testing.assert_allclose(
+                quantity.mean, np.average(quantity.values, weights=quantity.weights)
+            )
+        np.testing.assert_allclose(quantity.mean, exact.mean, rtol=0.03)
+        # 1-in-200 year loss
+        np.testing.assert_allclose(
+            quantity.exceedance_curve.values[4],
+            exact.exceedance_curve.values[4],
+            rtol=0.05,
+        )
+
+
+def test_impact_aggregation_convolution():
+    """The convolution method gives exact means and agrees with Monte Carlo, including where the per-asset
+    caps apply (asset_0 can be damaged by wind and flood in excess of its TIV) and for chronic impacts and
+    revenue loss from downtime."""
+    scenario, key_year = "ssp585", 2050
+    a = [
+        ManufacturingAsset(id=f"asset_{i}", latitude=0.0, longitude=0.0)
+        for i in range(4)
+    ]
+
+    def air(hazard_type, edges, probs):
+        return [
+            AssetImpactResult(
+                impact=ImpactDistrib(hazard_type, np.array(edges), np.array(probs), "")
+            )
+        ]
+
+    impacts: Dict[ImpactKey, list[AssetImpactResult]] = {
+        ImpactKey(a[0], Wind, scenario, key_year): air(Wind, [0.0, 0.6], [0.1]),
+        ImpactKey(a[1], Wind, scenario, key_year): air(Wind, [0.0, 0.6], [0.1]),
+        ImpactKey(a[0], RiverineInundation, scenario, key_year): air(
+            RiverineInundation, [0.0, 0.2, 0.8], [0.1, 0.05]
+        ),
+        ImpactKey(a[2], Fire, scenario, key_year): air(Fire, [0.0, 1.0], [0.05]),
+        ImpactKey(a[3], Fire, scenario, key_year): air(Fire, [0.0, 0.0], [0.0]),
+        ImpactKey(a[1], ChronicHeat, scenario, key_year): air(
+            ChronicHeat, [0.0, 0.2], [0.5]
+        ),
+        ImpactKey(a[1], ChronicHeat, "historical", None): air(
+            ChronicHeat, [0.0, 0.1], [0.4]
+        ),
+    }
+    financial_model = DefaultFinancialModel(
+        data_provider=TestFinancialDataProvider(),
+        downtime_config=[
+            DowntimeConfigItem(
+                asset_class="Asset",
+                asset_identifier="type=Generic,location=Generic",
+                points_x=[0.0, 0.1, 0.5],
+                points_y=[0.0, 0.0, 1.0],
+            )
+        ],
+    )
+    monte_carlo = aggregate_impacts(
+        impacts, financial_model, scenario, key_year, n_events=200000
+    )
+    convolution = aggregate_impacts(
+        impacts,
+        financial_model,
+        scenario,
+        key_year,
+        method=AggregationMethod.CONVOLUTION,
+    )
+    assert convolution.keys() == monte_carlo.keys()
+
+    # means of uncapped damage are exact: TIV = 100 per asset
+    for hazard_type, expected in [
+        (Wind, 2 * 100 * 0.3 * 0.1 / 400),
+        (RiverineInundation, 100 * (0.1 * 0.1 + 0.5 * 0.05) / 400),
+        (Fire, 100 * 0.5 * 0.05 / 400),
+    ]:
+        key = RiskQuantityKey(quantity=QuantityType.DAMAGE, hazard_type=hazard_type)
+        np.testing.assert_allclose(convolution[key].mean, expected, rtol=1e-9)
+    for key, quantity in convolution.items():
+        if key.asset is not None:
+            continue
+        assert quantity.values is None
+        np.testing.assert_allclose(
+            quantity.mean, monte_carlo[key].mean, rtol=0.02, atol=1e-5
+        )
+        np.testing.assert_allclose(
+            quantity.exceedance_curve.values,
+            monte_carlo[key].exceedance_curve.values,
+            atol=0.02,
+        )
+
+
 def test_impact_aggregation_end_to_end():
     """Mocked test that aggregates riverine inundation over assets and calculates
     portfolio level scores.
@@ -197,7 +738,8 @@ def test_impact_aggregation_end_to_end_multi_hazard():
 
     Uses AssetFinancialDrilldown to get analytical per-asset AALs alongside the Monte Carlo
     portfolio means produced by CompanyRiskMeasureCalculator.  The two code paths are
-    independent; convergence (5 % rtol) verifies both.
+    independent; convergence (5 % rtol) verifies both. 2 million events are simulated so that the
+    Monte Carlo error of the mean of the rare Fire damage is ~1 %.
 
     Asset layout: assets 0-1 carry flood risk; all 6 share wind, fire and chronic-heat exposure.
     FinancialDataStore default (no financial data supplied): TIV = revenue = 100 per asset.
@@ -400,6 +942,14 @@ def test_impact_aggregation_end_to_end_multi_hazard():
             config=VulnerabilityModelsFactory.embedded_vulnerability_config(),
         )
     )
+
+    class TestMeasuresFactory(DefaultMeasuresFactory):
+        def portfolio_calculator(self, use_case_id: str):
+            return CompanyRiskMeasureCalculator(n_events=2000000)
+
+    container.override_providers(
+        measures_factory=providers.Factory(TestMeasuresFactory)
+    )
     requester = container.requester()
 
     assets = Assets(
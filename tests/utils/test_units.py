@@ -0,0 +1,26 @@
+"""Test unit conversion."""
+
+import numpy as np
+
+from physrisk.utils.units import conversion_factors, convert_units, unit_registry
+
+
+def test_cached_unit_conversion():
+    registry = unit_registry()
+    values = np.array([0.0, 0.5, 12.0, 30.0])
+    for source, target in [
+        ("m", "ft"),
+        ("km/h", "m/s"),
+        ("degC", "degF"),
+        ("K", "degC"),
+    ]:
+        np.testing.assert_allclose(
+            convert_units(values, source, target),
+            registry.convert(values, source, target),
+            rtol=1e-12,
+        )
+    conversion_factors.cache_clear()
+    convert_units(values, "m", "ft")
+    convert_units(values, "m", "ft")
+    info = conversion_factors.cache_info()
+    assert (info.hits, info.misses) == (1, 1)
@@ -34,7 +34,10 @@ from physrisk.kernel.hazards import (
     RiverineInundation,
     Wind,
 )
-from physrisk.kernel.hazard_model import HazardEventDataResponse
+from physrisk.kernel.hazard_model import (
+    HazardEventDataResponse,
+    HazardParameterDataResponse,
+)
 from physrisk.kernel.impact_distrib import ImpactType
 from physrisk.vulnerability_models.config_based_impact_curves import (
     PiecewiseLinearImpactCurve,
@@ -849,6 +852,93 @@ def test_config_based_vulnerability_accepts_index_units():
     assert event.units == "index"
 
 
+@pytest.mark.parametrize("points_kind", [None, "beta"])
+def test_config_based_acute_model_batch(points_kind):
+    """The batched calculation should give the same results as the per-asset calculation."""
+    config_items = [
+        VulnerabilityConfigItem(
+            hazard_class="RiverineInundation",
+            asset_class="RealEstateAsset",
+            asset_identifier=f"type=Buildings/Residential,location={location}",
+            indicator_id="flood_depth",
+            indicator_units="metres",
+            impact_id="damage",
+            impact_units=None,
+            curve_type="indicator/piecewise_linear",
+            points_x=[0.0, 0.5, 1.0, 1.5, 2.0, 3.0, 4.0, 5.0, 6.0],
+            points_y=np.array(
+                [0.0, 0.327, 0.494, 0.617, 0.721, 0.870, 0.931, 0.984, 1.0]
+            )
+            * scale,
+            points_z=[0.0, 0.25, 0.22, 0.21, 0.21, 0.17, 0.12, 0.048, 0.0]
+            if points_kind
+            else None,
+            points_kind=points_kind,
+            cap_of_points_x=None if points_kind else 2.5,
+        )
+        for location, scale in [("Europe", 1.0), ("Asia", 0.8)]
+    ]
+    factory = VulnerabilityModelsFactory(config=config_items)
+    model = next(
+        m
+        for m in factory.vulnerability_models().vuln_model_for_asset_of_type(
+            RealEstateAsset
+        )
+        if m.hazard_type == RiverineInundation
+    )
+    return_periods = np.array([2.0, 5.0, 10.0, 25.0, 50.0, 100.0, 250.0, 500.0, 1000.0])
+    histo = np.array([0.0, 0.2, 0.6, 1.1, 1.5, 1.9, 2.3, 2.6, 2.9])
+    # future curves, including one which is not monotonic
+    futures = [
+        histo,
+        histo * 1.2,
+        np.array([0.0, 0.39, 0.85, 1.39, 1.75, 2.09, 2.51, 2.48, 3.12]),
+        np.zeros(9),
+    ]
+    assets = []
+    hazard_data_matrix = []
+    for location in ["Europe", "Asia"]:
+        for future in futures:
+            for sop in [0.0, 1.5, 10.0, 100.0, 2000.0]:
+                assets.append(
+                    RealEstateAsset(
+                        location=location,
+                        latitude=0.0,
+                        longitude=0.0,
+                        type="Buildings/Residential",
+                    )
+                )
+                hazard_data_matrix.append(
+                    [
+                        HazardEventDataResponse(return_periods, future, "metres", "f"),
+                        HazardEventDataResponse(return_periods, histo, "metres", "h"),
+                        HazardParameterDataResponse(np.array([sop]), path="sop"),
+                    ]
+                )
+    batch = model.get_impacts_batch(assets, hazard_data_matrix)
+    for asset, hazard_data, (impact, vul, event) in zip(
+        assets, hazard_data_matrix, batch
+    ):
+        expected_impact, expected_vul, expected_event = model.get_impact_details(
+            asset, hazard_data
+        )
+        np.testing.assert_allclose(
+            event.intensity_bin_edges, expected_event.intensity_bin_edges
+        )
+        np.testing.assert_allclose(event.prob, expected_event.prob, atol=1e-12)
+        np.testing.assert_allclose(vul.impact_bins, expected_vul.impact_bins)
+        np.testing.assert_allclose(
+            vul.prob_matrix, expected_vul.prob_matrix, atol=1e-12
+        )
+        np.testing.assert_allclose(
+            impact.impact_bin_edges, expected_impact.impact_bin_edges
+        )
+        np.testing.assert_allclose(
+            impact.probabilities, expected_impact.probabilities, atol=1e-12
+        )
+        assert event.path == expected_event.path
+
+
 @pytest.mark.skip("example, not test")
 def test_read_write_utilities(tmp_path):
     config = basic_vulnerability_config()
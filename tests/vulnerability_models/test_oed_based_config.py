@@ -636,3 +636,61 @@ def test_type_preferred_over_location_in_type_location_path():
         location_curve_y,
         err_msg="location= entry should win when type is absent",
     )
+
+
+def _flood_config_item(
+    asset_identifier: str, points_y: list
+) -> VulnerabilityConfigItem:
+    return VulnerabilityConfigItem.model_validate(
+        {
+            "hazard_class": "RiverineInundation",
+            "asset_class": "RealEstateAsset",
+            "asset_identifier": asset_identifier,
+            "indicator_id": "flood_depth",
+            "indicator_units": "metres",
+            "impact_id": "damage",
+            "curve_type": "indicator/piecewise_linear",
+            "points_x": [0.0, 1.0, 2.0],
+            "points_y": points_y,
+        }
+    )
+
+
+def test_config_based_selector_memoisation():
+    """Selections are memoised by asset class and matching attributes; assets with the same
+    attributes share a cache entry, and the cache is bounded."""
+
+    selector = ConfigBasedImpactFunctionSelector(
+        [
+            _flood_config_item("location=Europe", [0.2, 0.6, 1.0]),
+            _flood_config_item("type=Buildings/Residential", [0.1, 0.5, 1.0]),
+        ],
+        cache_max_items=1,
+    )
+    assets = [
+        RealEstateAsset(
+            latitude=51.5 + 0.1 * i,
+            longitude=-0.1,
+            type="Buildings/Residential",
+            location="Europe",
+        )
+        for i in range(10)
+    ]
+    curves = [
+        selector.select(asset, RiverineInundation, "flood_depth", ImpactType.damage)
+        for asset in assets
+    ]
+    assert all(curve is curves[0] for curve in curves)
+    np.testing.assert_allclose(curves[0].points_y, [0.1, 0.5, 1.0])
+    stats = selector.cache_stats()
+    assert stats.misses == 1 and stats.hits == 9 and stats.items == 1
+
+    asset_location_only = RealEstateAsset(
+        latitude=51.5, longitude=-0.1, location="Europe"
+    )
+    curve = selector.select(
+        asset_location_only, RiverineInundation, "flood_depth", ImpactType.damage
+    )
+    np.testing.assert_allclose(curve.points_y, [0.2, 0.6, 1.0])
+    stats = selector.cache_stats()
+    assert stats.misses == 2 and stats.items == 1 and stats.evictions == 1
@@ -286,3 +286,49 @@ def test_commercial_real_estate_model_details():
         ),
         rtol=2e-6,
     )
+
+
+def test_real_estate_model_parallel():
+    curve = np.array([0.0596, 0.333, 0.505, 0.715, 0.864, 1.003, 1.149, 1.163, 1.163])
+    store = mock_hazard_model_store_inundation(
+        TestData.longitudes, TestData.latitudes, curve
+    )
+    hazard_model = ZarrHazardModel(source_paths=get_default_source_paths(), store=store)
+    assets = [
+        RealEstateAsset(
+            latitude=lat, longitude=lon, location="Asia", type="Buildings/Industrial"
+        )
+        for lon, lat in zip(TestData.longitudes, TestData.latitudes)
+    ]
+    vulnerability_models = DictBasedVulnerabilityModels(
+        {
+            RealEstateAsset: [
+                RealEstateRiverineInundationModel(),
+                RealEstateCoastalInundationModel(),
+            ]
+        }
+    )
+    kwargs = {"scenarios": ["historical", "rcp8p5"], "years": [2080]}
+    serial = calculate_impacts(assets, hazard_model, vulnerability_models, **kwargs)
+    parallel = calculate_impacts(
+        assets,
+        hazard_model,
+        vulnerability_models,
+        max_workers=2,
+        chunk_size=4,
+        **kwargs,
+    )
+    assert list(parallel.keys()) == list(serial.keys())
+    for key, serial_results in serial.items():
+        for s, p in zip(serial_results, parallel[key]):
+            assert type(p.impact) is type(s.impact)
+            assert [hd.path for hd in p.hazard_data] == [
+                hd.path for hd in s.hazard_data
+            ]
+            if s.event is not None:
+                np.testing.assert_array_equal(
+                    p.impact.probabilities, s.impact.probabilities
+                )
+                np.testing.assert_array_equal(
+                    p.event.intensity_bin_edges, s.event.intensity_bin_edges
+                )
@@ -135,3 +135,32 @@ def test_wind_real_estate_model():
     impact_distrib = results[key][0].impact
     mean_impact = impact_distrib.mean_impact()
     np.testing.assert_allclose(mean_impact, mean_check)
+
+
+def test_wind_real_estate_model_batch():
+    """The vectorised batch calculation agrees with the per-asset calculation."""
+    hazard_model, scenario, year, _, _ = hazard_model_setup()
+    assets = [
+        RealEstateAsset(
+            latitude=lat, longitude=lon, location="Asia", type="Buildings/Industrial"
+        )
+        for lon, lat in zip(TestData.longitudes, TestData.latitudes)
+    ]
+    model = GenericTropicalCycloneModel()
+    requests = [
+        model.get_data_requests(asset, scenario=scenario, year=year) for asset in assets
+    ]
+    responses = hazard_model.get_hazard_data(requests)
+    hazard_data_matrix = [[responses[req]] for req in requests]
+    batch = model.get_impacts_batch(assets, hazard_data_matrix)
+    assert len(batch) == len(assets)
+    for asset, hazard_data, (impact, vul, event) in zip(
+        assets, hazard_data_matrix, batch
+    ):
+        impact_check, vul_check, event_check = model.get_impact_details(
+            asset, hazard_data
+        )
+        np.testing.assert_allclose(impact.mean_impact(), impact_check.mean_impact())
+        np.testing.assert_allclose(vul.prob_matrix, vul_check.prob_matrix)
+        np.testing.assert_allclose(event.prob, event_check.prob)
+        assert impact.path == impact_check.path